@@ -0,0 +1,179 @@
+# Async Firestore Router
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# The Firestore endpoints of main.py as native coroutines on the Firestore AsyncClient,
+# so a single worker keeps many Firestore calls in flight instead of one per threadpool slot.
+import asyncio
+
+from fastapi import APIRouter, Depends, Query, Request
+from datetime import datetime
+from typing import Annotated, List, Optional
+
+from models.request import Medication, Frequency, Setting, Appointment, EmergencyContact, Notification, EmergencyDeleteRequest, ListQuery
+from services.codec import list_body, list_body_schema
+from services.repository import get_repository
+from services.responses import http_errors, list_result, stream_result, data_result, added_result, updated_result, bulk_result, deleted_result, bulk_deleted_result, emergency_ids, schedule_window
+from services.schedule import schedule_index
+from services.summary import notification_summary_async
+from services.metrics import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+SNAPSHOT_COLLECTIONS = ["settings", "frequencies", "medications", "appointments", "emergencies", "notifications"]
+
+
+async def read_snapshot(user_id: str, since: Optional[datetime] = None) -> dict:
+    """Read every collection of a user concurrently, reporting a status per collection."""
+    results = await asyncio.gather(
+        *(get_repository().list_page_async(collection, user_id, since=since) for collection in SNAPSHOT_COLLECTIONS),
+        return_exceptions=True,
+    )
+
+    snapshot = {}
+    for collection, result in zip(SNAPSHOT_COLLECTIONS, results):
+        if isinstance(result, Exception):
+            print(f"Snapshot read of {collection} failed: {result}")
+            snapshot[collection] = {"code": -1, "message": str(result), "data": [], "deleted": [], "watermark": since}
+        else:
+            snapshot[collection] = {"code": 0, **result}
+    return snapshot
+
+
+async def list_response(request: Request, collection: str, user_id: str, query: ListQuery):
+    with http_errors():
+        if query.format == "ndjson":
+            return stream_result(get_repository().stream_page_async(collection, user_id, **query.page()))
+        return list_result(request, await get_repository().list_page_async(collection, user_id, **query.page()), collection)
+
+
+@router.get("/medication/{user_id}")
+async def get_medication_list(request: Request, user_id: str, query: Annotated[ListQuery, Query()]):
+    return await list_response(request, "medications", user_id, query)
+
+@router.put("/medication/add")
+async def add_medication(medication: Medication):
+    with http_errors(bad_request=False):
+        return added_result(await get_repository().upsert_async("medications", medication.model_dump()))
+
+@router.put("/medication/update")
+async def update_medication(medication: Medication):
+    with http_errors(bad_request=False):
+        return updated_result("Medication", await get_repository().upsert_async("medications", medication.model_dump()))
+
+@router.put("/medication/update/list", openapi_extra=list_body_schema(Medication))
+async def update_medication_list(medications: Annotated[List[Medication], Depends(list_body(Medication))], user_id: str):
+    with http_errors(bad_request=False):
+        return bulk_result(await get_repository().bulk_upsert_async("medications", user_id, medications), "medications")
+
+@router.delete("/medication/{user_id}/{medication_id}")
+async def delete_medication(user_id: str, medication_id: int):
+    with http_errors(bad_request=False):
+        return deleted_result(await get_repository().delete_async("medications", user_id, medication_id), "Medication")
+
+@router.get("/medication/frequency/{user_id}")
+async def get_frequency_list(request: Request, user_id: str, query: Annotated[ListQuery, Query()]):
+    return await list_response(request, "frequencies", user_id, query)
+
+@router.put("/medication/frequency/add")
+async def add_frequency(frequency: Frequency):
+    with http_errors(bad_request=False):
+        return added_result(await get_repository().upsert_async("frequencies", frequency.model_dump()))
+
+@router.put("/medication/frequency/update")
+async def update_medication_frequency(frequency: Frequency):
+    with http_errors(bad_request=False):
+        return updated_result("Frequency", await get_repository().upsert_async("frequencies", frequency.model_dump()))
+
+@router.put("/medication/frequency/update/list", openapi_extra=list_body_schema(Frequency))
+async def update_medication_frequency_list(frequencies: Annotated[List[Frequency], Depends(list_body(Frequency))], user_id: str):
+    with http_errors(bad_request=False):
+        return bulk_result(await get_repository().bulk_upsert_async("frequencies", user_id, frequencies), "frequencies")
+
+@router.delete("/medication/frequency/{user_id}/{frequency_id}")
+async def delete_frequency(user_id: str, frequency_id: int):
+    with http_errors(bad_request=False):
+        return deleted_result(await get_repository().delete_async("frequencies", user_id, frequency_id), "frequency")
+
+@router.get("/schedule/{user_id}")
+async def get_schedule(request: Request, user_id: str, start: Annotated[Optional[datetime], Query(alias="from")] = None,
+                       end: Annotated[Optional[datetime], Query(alias="to")] = None):
+    with http_errors():
+        return data_result(request, await schedule_index.query_async(get_repository(), user_id, *schedule_window(start, end)))
+
+@router.get("/schedule/{user_id}/next")
+async def get_next_doses(request: Request, user_id: str, start: Annotated[Optional[datetime], Query(alias="from")] = None):
+    with http_errors():
+        return data_result(request, await schedule_index.query_async(get_repository(), user_id, start or datetime.now(), first_only=True))
+
+@router.get("/appointment/{user_id}")
+async def get_appointment_list(request: Request, user_id: str, query: Annotated[ListQuery, Query()]):
+    return await list_response(request, "appointments", user_id, query)
+
+@router.post("/appointment")
+async def add_appointment(appointment: Appointment):
+    with http_errors(bad_request=False):
+        return added_result(await get_repository().upsert_async("appointments", appointment.model_dump()))
+
+@router.put("/appointment")
+async def update_appointment(appointment: Appointment):
+    with http_errors(bad_request=False):
+        return updated_result("Appointment", await get_repository().upsert_async("appointments", appointment.model_dump()))
+
+@router.put("/appointment/list", openapi_extra=list_body_schema(Appointment))
+async def update_appointment_list(appointments: Annotated[List[Appointment], Depends(list_body(Appointment))], user_id: str):
+    with http_errors(bad_request=False):
+        return bulk_result(await get_repository().bulk_upsert_async("appointments", user_id, appointments), "appointments")
+
+@router.delete("/appointment/{user_id}/{appointment_id}")
+async def delete_appointment(user_id: str, appointment_id: int):
+    with http_errors(bad_request=False):
+        return deleted_result(await get_repository().delete_async("appointments", user_id, appointment_id), "appointment")
+
+@router.get("/user/setting/{user_id}")
+async def get_setting_list(request: Request, user_id: str, query: Annotated[ListQuery, Query()]):
+    return await list_response(request, "settings", user_id, query)
+
+@router.put("/user/setting")
+async def update_setting(setting: Setting):
+    with http_errors(bad_request=False):
+        return updated_result("Setting", await get_repository().upsert_async("settings", setting.model_dump()), with_id=True)
+
+@router.get("/emergency/contact/{user_id}")
+async def get_emergency_list(request: Request, user_id: str, query: Annotated[ListQuery, Query()]):
+    return await list_response(request, "emergencies", user_id, query)
+
+@router.put("/emergency/contact/update")
+async def update_emergency(emergency: EmergencyContact):
+    with http_errors(bad_request=False):
+        return updated_result("Emergency contact", await get_repository().upsert_async("emergencies", emergency.model_dump()), with_id=True)
+
+@router.put("/emergency/contact/update/list", openapi_extra=list_body_schema(EmergencyContact))
+async def update_emergency_list(emergencies: Annotated[List[EmergencyContact], Depends(list_body(EmergencyContact))], user_id: str):
+    with http_errors(bad_request=False):
+        return bulk_result(await get_repository().bulk_upsert_async("emergencies", user_id, emergencies), "emergency contacts")
+
+@router.delete("/emergency/contact/{user_id}")
+async def delete_emergency(user_id: str, request: EmergencyDeleteRequest):
+    with http_errors(bad_request=False):
+        return bulk_deleted_result(await get_repository().bulk_delete_async("emergencies", user_id, emergency_ids(request)), "emergencies")
+
+@router.get("/notification/{user_id}")
+async def get_notification_list(request: Request, user_id: str, query: Annotated[ListQuery, Query()]):
+    return await list_response(request, "notifications", user_id, query)
+
+@router.get("/notification/{user_id}/summary")
+async def get_notification_summary(request: Request, user_id: str):
+    with http_errors(bad_request=False):
+        return data_result(request, await notification_summary_async(get_repository(), user_id))
+
+@router.put("/notification/update")
+async def update_notification(notification: Notification):
+    with http_errors(bad_request=False):
+        return added_result(await get_repository().upsert_async("notifications", notification.model_dump()))
+
+@router.put("/notification/update/list", openapi_extra=list_body_schema(Notification))
+async def update_notification_list(notifications: Annotated[List[Notification], Depends(list_body(Notification))], user_id: str):
+    with http_errors(bad_request=False):
+        return bulk_result(await get_repository().bulk_upsert_async("notifications", user_id, notifications), "notifications")
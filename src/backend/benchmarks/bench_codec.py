@@ -0,0 +1,84 @@
+# Codec Benchmark
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Server CPU per request spent decoding a 1k-item bulk body and encoding the bulk report and a
+# 1k-item list response, before (json module + FastAPI's validation and jsonable_encoder) and
+# after (pydantic-core JSON validation and orjson).
+#
+#   python -m benchmarks.bench_codec
+#   python -m benchmarks.bench_codec --items 5000
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from models.request import Medication  # noqa: E402
+from services import encoding  # noqa: E402
+from services.codec import list_adapter  # noqa: E402
+
+
+def medications(count: int) -> list:
+    return [
+        {
+            "id": item_id, "user_id": "bench-user", "name": f"Medication {item_id}", "image": "",
+            "stock": 30, "start_date": "2026-10-01", "end_date": "2026-12-31", "stock_date": "2026-10-18",
+            "threshold": 5, "push_alert": "on", "email_alert": "off",
+        }
+        for item_id in range(count)
+    ]
+
+
+def p50_ms(action: Callable, repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        action()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+def json_module(body) -> bytes:
+    return json.dumps(jsonable_encoder(body), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare request decoding and response encoding paths.")
+    parser.add_argument("--items", type=int, default=1000, help="items per body")
+    parser.add_argument("--repeat", type=int, default=50, help="runs per measurement")
+    args = parser.parse_args()
+    if encoding.orjson is None:
+        sys.exit("orjson is not installed")
+
+    items = medications(args.items)
+    body = json.dumps(items).encode()
+    adapter = list_adapter(Medication)
+    now = datetime(2026, 10, 18, tzinfo=timezone.utc)
+    report = {"code": 0, "message": "Medications updated successfully!", "report": {"updated": args.items, "items": [{"id": item["id"], "status": "updated"} for item in items]}}
+    listing = {"code": 0, "data": [{**item, "updated_at": now - timedelta(seconds=item["id"])} for item in items], "deleted": [], "watermark": now}
+
+    cases = [
+        ("decode bulk body", lambda: adapter.validate_python(json.loads(body)), lambda: adapter.validate_json(body)),
+        ("encode bulk report", lambda: json_module(report), lambda: encoding.render(report, encoding.JSON)),
+        ("encode list", lambda: json_module(listing), lambda: encoding.render(listing, encoding.JSON)),
+    ]
+    print(f"{'step':<22}{'before ms':>11}{'after ms':>10}{'speedup':>9}")
+    total_before = total_after = 0.0
+    for name, before, after in cases:
+        before_ms, after_ms = p50_ms(before, args.repeat), p50_ms(after, args.repeat)
+        total_before, total_after = total_before + before_ms, total_after + after_ms
+        print(f"{name:<22}{before_ms:>11.2f}{after_ms:>10.2f}{before_ms / after_ms:>8.1f}x")
+    print(f"{'total':<22}{total_before:>11.2f}{total_after:>10.2f}{total_before / total_after:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
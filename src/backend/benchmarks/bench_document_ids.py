@@ -0,0 +1,87 @@
+# Document Key Benchmark
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Compares Firestore RPCs per request for lookup-then-write handlers and keyed writes.
+#
+#   python -m benchmarks.bench_document_ids
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_firestore import FakeFirestore  # noqa: E402
+from models.request import Medication  # noqa: E402
+from services.bulk import bulk_upsert  # noqa: E402
+from services.documents import delete_document, upsert_document  # noqa: E402
+
+USER_ID = "bench-user"
+
+
+def medication(item_id: int) -> Medication:
+    return Medication(
+        id=item_id, user_id=USER_ID, name=f"Medication {item_id}", image="", stock=30,
+        start_date="2025-04-01", end_date="2025-04-30", stock_date="2025-03-31",
+        threshold=5, push_alert="on", email_alert="on",
+    )
+
+
+# The handlers as they were before documents were keyed by `{user_id}_{id}`
+def legacy_update(db, item: Medication):
+    medications_ref = db.collection("medications")
+    query = medications_ref.where("user_id", "==", item.user_id).where("id", "==", item.id).limit(1).stream()
+    medication_doc = next(query, None)
+    if medication_doc:
+        medication_doc.reference.update(item.model_dump())
+    else:
+        medications_ref.add(item.model_dump())
+
+
+def legacy_delete(db, item_id: int):
+    query = db.collection("medications").where("user_id", "==", USER_ID).where("id", "==", item_id).limit(1).stream()
+    medication_doc = next(query, None)
+    if medication_doc:
+        medication_doc.reference.delete()
+
+
+def legacy_update_list(db, items):
+    for item in items:
+        legacy_update(db, item)
+
+
+def measure(seed, action) -> int:
+    db = FakeFirestore()
+    seed(db)
+    db.reset_counters()
+    action(db)
+    return db.rpc_count
+
+
+def main():
+    existing = [medication(i) for i in range(200)]
+    fresh = [medication(i) for i in range(200, 400)]
+
+    def seed_legacy(db):
+        for item in existing:
+            db.collection("medications").add(item.model_dump())
+
+    def seed_keyed(db):
+        for item in existing:
+            upsert_document(db, "medications", item.model_dump())
+
+    cases = [
+        ("update existing", lambda db: legacy_update(db, existing[0]), lambda db: upsert_document(db, "medications", existing[0].model_dump())),
+        ("update missing (insert)", lambda db: legacy_update(db, fresh[0]), lambda db: upsert_document(db, "medications", fresh[0].model_dump())),
+        ("delete", lambda db: legacy_delete(db, 0), lambda db: delete_document(db, "medications", USER_ID, 0)),
+        ("update/list x200", lambda db: legacy_update_list(db, existing), lambda db: bulk_upsert(db, "medications", USER_ID, existing)),
+        ("update/list x400 mixed", lambda db: legacy_update_list(db, existing + fresh), lambda db: bulk_upsert(db, "medications", USER_ID, existing + fresh)),
+    ]
+
+    print(f"{'request':<26}{'lookup RPCs':>14}{'keyed RPCs':>14}")
+    for name, legacy, keyed in cases:
+        print(f"{name:<26}{measure(seed_legacy, legacy):>14}{measure(seed_keyed, keyed):>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Sync Encoding Benchmark
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Bytes on the wire and client-side decode time of one user's medication list per encoding.
+#
+#   python -m benchmarks.bench_encoding
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import msgpack  # noqa: E402
+
+from services.encoding import JSON, MSGPACK, brotli, compress, render  # noqa: E402
+
+
+def payload(count: int = 200) -> dict:
+    now = datetime(2026, 10, 18, tzinfo=timezone.utc)
+    data = [
+        {
+            "id": item_id, "user_id": "bench-user", "name": f"Medication {item_id}", "image": "",
+            "stock": 30, "start_date": "2026-10-01", "end_date": "2026-12-31", "stock_date": "2026-10-18",
+            "threshold": 5, "push_alert": "on", "email_alert": "off", "updated_at": now - timedelta(minutes=item_id),
+        }
+        for item_id in range(count)
+    ]
+    return {"code": 0, "data": data, "deleted": [], "watermark": now}
+
+
+def decode(body: bytes, media_type: str, encoding):
+    if encoding == "br":
+        body = brotli.decompress(body)
+    elif encoding == "gzip":
+        body = gzip.decompress(body)
+    return msgpack.unpackb(body) if media_type == MSGPACK else json.loads(body)
+
+
+def main():
+    body = payload()
+    encodings = [None, "gzip"] + (["br"] if brotli else [])
+    print(f"{'representation':<22}{'bytes':>10}{'decode us':>12}")
+    for media_type in (JSON, MSGPACK):
+        rendered = render(body, media_type)
+        for encoding in encodings:
+            wire = compress(rendered, encoding)
+            started = time.perf_counter()
+            for _ in range(200):
+                decode(wire, media_type, encoding)
+            micros = (time.perf_counter() - started) / 200 * 1e6
+            label = f"{media_type.split('/')[1]}{'+' + encoding if encoding else ''}"
+            print(f"{label:<22}{len(wire):>10}{micros:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# Endpoint Load Benchmark
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Drives every route of the app in process against the in-memory Firestore with injected
+# per-RPC latency, and reports throughput, p50/p95/p99 latency and Firestore RPCs per request.
+# `--save` writes the results and `--baseline` fails the run when a route needs more RPCs or
+# its p95 grew past the tolerance, so hot-path regressions show up without a Firebase project.
+#
+#   python -m benchmarks.bench_endpoints
+#   python -m benchmarks.bench_endpoints --mode async --latency-ms 10 --concurrency 32
+#   python -m benchmarks.bench_endpoints --only medication --save baseline.json
+#   python -m benchmarks.bench_endpoints --baseline baseline.json
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+from benchmarks.fake_firestore import AsyncFakeFirestore, FakeFirestore  # noqa: E402
+
+IMAGE = "x" * 2048  # pictures are stored inline as base64
+DELETE_BASE = 100000  # ids seeded for the delete routes, one per request
+
+
+class Scenario(NamedTuple):
+    name: str
+    method: str
+    path: str  # route template, filled from the request's values
+    body: Optional[Callable[[Dict[str, Any]], Any]] = None
+    collection: Optional[str] = None  # seeded with DELETE_BASE + n before a delete route runs
+    has_async: bool = False  # also served under /async
+
+
+def medication(user_id: str, item_id: int) -> Dict[str, Any]:
+    return {
+        "id": item_id, "user_id": user_id, "name": f"Medication {item_id}", "image": IMAGE, "stock": 30,
+        "start_date": "2026-10-01", "end_date": "2027-03-31", "stock_date": "2026-10-18", "threshold": 5,
+        "push_alert": "on", "email_alert": "on",
+    }
+
+
+def frequency(user_id: str, item_id: int) -> Dict[str, Any]:
+    return {"id": item_id, "medication_id": item_id, "user_id": user_id, "dosage": 1, "dosage_unit": 0, "cycle": 1, "times": ["08:00", "20:00"]}
+
+
+def appointment(user_id: str, item_id: int) -> Dict[str, Any]:
+    return {
+        "id": item_id, "user_id": user_id, "name": f"Dr. {item_id}", "phone": "+15555550100", "image": IMAGE,
+        "scheduled_time": "2026-11-02T09:30", "description": "Follow-up visit", "location": "Main St. Clinic",
+    }
+
+
+def contact(user_id: str, item_id: int) -> Dict[str, Any]:
+    return {"id": item_id, "user_id": user_id, "name": f"Contact {item_id}", "phone": "+15555550101", "image": IMAGE, "type": "family"}
+
+
+def notification(user_id: str, item_id: int) -> Dict[str, Any]:
+    return {"id": item_id, "user_id": user_id, "type": 1, "var1": "Medication", "var2": "08:00", "var3": "", "status": 0, "target_id": item_id}
+
+
+def setting(user_id: str) -> Dict[str, Any]:
+    return {"user_id": user_id, "push": "on", "theme": "light", "font": "medium"}
+
+
+# Per-user collection sizes and how items are built
+COLLECTIONS = {
+    "medications": (30, medication),
+    "frequencies": (30, frequency),
+    "appointments": (20, appointment),
+    "emergencies": (5, contact),
+    "notifications": (200, notification),
+}
+
+
+def scenarios(batch: int) -> List[Scenario]:
+    listing = lambda build: (lambda v: [build(v["user_id"], v["n"] * batch + index) for index in range(batch)])
+    return [
+        Scenario("live", "GET", "/live"),
+        Scenario("ready", "GET", "/ready"),
+        Scenario("users", "GET", "/?limit=100"),
+        Scenario("user lookup", "GET", "/users/lookup?uid={user_id}"),
+        Scenario("sync", "GET", "/sync/{user_id}"),
+        Scenario("medications", "GET", "/medication/{user_id}", has_async=True),
+        Scenario("medications page", "GET", "/medication/{user_id}?limit=10&fields=id,name,stock", has_async=True),
+        Scenario("frequencies", "GET", "/medication/frequency/{user_id}", has_async=True),
+        Scenario("appointments", "GET", "/appointment/{user_id}", has_async=True),
+        Scenario("settings", "GET", "/user/setting/{user_id}", has_async=True),
+        Scenario("contacts", "GET", "/emergency/contact/{user_id}", has_async=True),
+        Scenario("notifications", "GET", "/notification/{user_id}", has_async=True),
+        Scenario("medication add", "PUT", "/medication/add", lambda v: medication(v["user_id"], v["n"]), has_async=True),
+        Scenario("medication update", "PUT", "/medication/update", lambda v: medication(v["user_id"], v["n"] % 30), has_async=True),
+        Scenario("medication list", "PUT", "/medication/update/list?user_id={user_id}", listing(medication), has_async=True),
+        Scenario("frequency add", "PUT", "/medication/frequency/add", lambda v: frequency(v["user_id"], v["n"]), has_async=True),
+        Scenario("frequency update", "PUT", "/medication/frequency/update", lambda v: frequency(v["user_id"], v["n"] % 30), has_async=True),
+        Scenario("frequency list", "PUT", "/medication/frequency/update/list?user_id={user_id}", listing(frequency), has_async=True),
+        Scenario("appointment add", "POST", "/appointment", lambda v: appointment(v["user_id"], v["n"]), has_async=True),
+        Scenario("appointment update", "PUT", "/appointment", lambda v: appointment(v["user_id"], v["n"] % 20), has_async=True),
+        Scenario("appointment list", "PUT", "/appointment/list?user_id={user_id}", listing(appointment), has_async=True),
+        Scenario("setting update", "PUT", "/user/setting", lambda v: setting(v["user_id"]), has_async=True),
+        Scenario("contact update", "PUT", "/emergency/contact/update", lambda v: contact(v["user_id"], v["n"] % 5), has_async=True),
+        Scenario("contact list", "PUT", "/emergency/contact/update/list?user_id={user_id}", listing(contact), has_async=True),
+        Scenario("notification update", "PUT", "/notification/update", lambda v: notification(v["user_id"], v["n"] % 200), has_async=True),
+        Scenario("notification list", "PUT", "/notification/update/list?user_id={user_id}", listing(notification), has_async=True),
+        Scenario("send emergency", "POST", "/sendEmergency", lambda v: {"emergencyData": ["+1 555 555 0101", "+1 555 555 0102"], "currentAddress": ["1 Main St."]}),
+        Scenario("send email", "POST", "/medication/sendEmail", lambda v: {"user_name": "Bench", "to_email": f"{v['user_id']}@example.com", "medication_name": "Medication"}),
+        Scenario("outbox stats", "GET", "/outbox/stats"),
+        Scenario("cache stats", "GET", "/cache/stats"),
+        Scenario("medication delete", "DELETE", "/medication/{user_id}/{item_id}", collection="medications", has_async=True),
+        Scenario("frequency delete", "DELETE", "/medication/frequency/{user_id}/{item_id}", collection="frequencies", has_async=True),
+        Scenario("appointment delete", "DELETE", "/appointment/{user_id}/{item_id}", collection="appointments", has_async=True),
+        Scenario("contact delete", "DELETE", "/emergency/contact/{user_id}", lambda v: {"contactList": str(v["item_id"])}, "emergencies", has_async=True),
+        # Whole-collection jobs, run rarely in production; a few requests show their cost
+        Scenario("forecast run", "POST", "/forecast/run"),
+        Scenario("compact dry run", "POST", "/notification/compact?dry_run=true"),
+    ]
+
+
+def seed(db: FakeFirestore, user_ids: List[str]):
+    from services.documents import document_id, stamp
+
+    for user_id in user_ids:
+        db.collection("settings").document(document_id(user_id))._apply_set(stamp(setting(user_id)))
+        for collection, (count, build) in COLLECTIONS.items():
+            for item_id in range(count):
+                db.collection(collection).document(document_id(user_id, item_id))._apply_set(stamp(build(user_id, item_id)))
+
+
+def seed_deletes(db: FakeFirestore, collection: str, user_ids: List[str], count: int):
+    from services.documents import document_id, stamp
+
+    build = COLLECTIONS[collection][1]
+    for n in range(count):
+        user_id, item_id = user_ids[n % len(user_ids)], DELETE_BASE + n
+        db.collection(collection).document(document_id(user_id, item_id))._apply_set(stamp(build(user_id, item_id)))
+
+
+def percentile(values: List[float], pct: int) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1] if len(values) > 1 else values[0]
+
+
+async def drive(client: httpx.AsyncClient, scenario: Scenario, prefix: str, user_ids: List[str], count: int, concurrency: int, clients) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    pending = iter(range(count))
+
+    async def worker():
+        nonlocal errors
+        for n in pending:
+            values = {"n": n, "user_id": user_ids[n % len(user_ids)], "item_id": DELETE_BASE + n}
+            body = scenario.body(values) if scenario.body else None
+            started = time.perf_counter()
+            response = await client.request(scenario.method, prefix + scenario.path.format(**values), json=body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    for db in clients:
+        db.reset_counters()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, count))))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "route": f"{scenario.method} {prefix}{scenario.path}",
+        "requests": count,
+        "errors": errors,
+        "throughput": count / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rpc_per_request": sum(db.rpc_count for db in clients) / count,
+    }
+
+
+async def run(args) -> List[Dict[str, Any]]:
+    import main
+    import services.clients
+    from models.response import User
+    from services.directory import user_directory
+
+    latency = args.latency_ms / 1000
+    db = FakeFirestore(latency=latency)
+    async_db = AsyncFakeFirestore.sharing(db)
+    user_ids = [f"bench-user-{index:04d}" for index in range(args.users)]
+    seed(db, user_ids)
+
+    # The app's clients are replaced before the lifespan starts, so nothing reaches Firebase
+    services.clients._db = db
+    services.clients._async_db = async_db
+    user_directory.loader = lambda: [User(email=f"{user_id}@example.com", id=user_id, name=user_id) for user_id in user_ids]
+
+    selected = [scenario for scenario in scenarios(args.batch) if not args.only or args.only in scenario.name]
+    prefixes = {"sync": [""], "async": ["/async"], "both": ["", "/async"]}[args.mode]
+    results = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app), httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for scenario in selected:
+            for prefix in prefixes:
+                if prefix and not scenario.has_async:
+                    continue
+                count = args.requests if scenario.name not in ("forecast run", "compact dry run") else max(args.requests // 20, 2)
+                if scenario.collection:
+                    seed_deletes(db, scenario.collection, user_ids, count)
+                result = await drive(client, scenario, prefix, user_ids, count, args.concurrency, [db, async_db])
+                results.append(result)
+                print(
+                    f"{result['route']:<62}{result['throughput']:>9.0f}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}"
+                    f"{result['p99_ms']:>9.1f}{result['rpc_per_request']:>8.2f}{result['errors']:>7}"
+                )
+    return results
+
+
+def regressions(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    previous = {result["route"]: result for result in baseline}
+    found = []
+    for result in results:
+        before = previous.get(result["route"])
+        if before is None:
+            continue
+        if result["rpc_per_request"] > before["rpc_per_request"] + 1e-9:
+            found.append(f"{result['route']}: {before['rpc_per_request']:.2f} -> {result['rpc_per_request']:.2f} RPCs per request")
+        # A 1 ms floor keeps scheduler noise on the fastest routes from failing the run
+        if result["p95_ms"] > max(before["p95_ms"] * (1 + tolerance), before["p95_ms"] + 1.0):
+            found.append(f"{result['route']}: p95 {before['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms")
+        if result["errors"] > before["errors"]:
+            found.append(f"{result['route']}: {before['errors']} -> {result['errors']} errors")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test every route against the in-memory Firestore.")
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both", help="threadpool routes, /async routes or both")
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="latency added to every Firestore RPC")
+    parser.add_argument("--users", type=int, default=50, help="seeded users")
+    parser.add_argument("--batch", type=int, default=20, help="items per list update")
+    parser.add_argument("--only", help="run the routes whose name contains this")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="fail on regressions against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 growth over the baseline")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    # Queued messages go to a throwaway outbox and are "sent" by the fake providers
+    os.environ.setdefault("OUTBOX_PATH", os.path.join(directory, "outbox.db"))
+    os.environ.setdefault("OUTBOX_PROVIDERS", "fake")
+    os.environ.setdefault("USER_DIRECTORY_REFRESH", "0")
+    # The workload is seeded into the in-memory Firestore; bench_storage compares the engines
+    os.environ["STORAGE_BACKEND"] = "firestore"
+
+    print(f"{'route':<62}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'rpc/req':>8}{'errors':>7}")
+    results = asyncio.run(run(args))
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            found = regressions(results, json.load(file), args.tolerance)
+        for line in found:
+            print(f"Regression: {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
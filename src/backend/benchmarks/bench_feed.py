@@ -0,0 +1,128 @@
+# Change Feed Benchmark
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# One user with several devices and a stream of writes to their medications, against the
+# in-memory Firestore with latency on every RPC. Compares devices polling the delta endpoint
+# with devices subscribed to the change feed: Firestore reads per write, reads per minute while
+# nothing changes, and how long a write takes to reach every device.
+#
+#   python -m benchmarks.bench_feed
+#   python -m benchmarks.bench_feed --devices 5 --poll-s 2
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from contextlib import aclosing
+from datetime import datetime, timezone
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Every read must reach Firestore, or the cache would hide what each approach costs
+os.environ["LIST_CACHE_COLLECTIONS"] = ""
+
+from benchmarks.fake_firestore import AsyncFakeFirestore, FakeFirestore  # noqa: E402
+from services.feed import change_feed  # noqa: E402
+from services.repository import FirestoreRepository, set_repository  # noqa: E402
+
+USER_ID = "bench-user"
+
+
+def medication(item_id: int) -> Dict:
+    return {"id": item_id, "user_id": USER_ID, "name": f"Medication {item_id}", "stock": 30}
+
+
+async def write_all(repository, writes: int, interval: float) -> Dict[int, float]:
+    written = {}
+    for item_id in range(writes):
+        written[item_id] = time.perf_counter()
+        await repository.upsert_async("medications", medication(item_id))
+        await asyncio.sleep(interval)
+    return written
+
+
+async def poll_device(repository, seen: Dict[int, float], until: asyncio.Event, poll: float):
+    since = datetime.now(timezone.utc)
+    while not until.is_set():
+        page = await repository.list_page_async("medications", USER_ID, since=since)
+        since = page["watermark"] or since
+        for item in page["data"]:
+            seen.setdefault(item["id"], time.perf_counter())
+        await asyncio.sleep(poll)
+
+
+async def feed_device(seen: Dict[int, float], ready: asyncio.Event):
+    async with aclosing(change_feed.subscribe(USER_ID)) as events:
+        ready.set()
+        async for event in events:
+            for item in event.get("data", []):
+                seen.setdefault(item["id"], time.perf_counter())
+
+
+async def run(mode: str, args) -> Dict[str, float]:
+    db = FakeFirestore(latency=args.latency_ms / 1000)
+    async_db = AsyncFakeFirestore.sharing(db)
+    repository = FirestoreRepository(lambda: db, lambda: async_db)
+    set_repository(repository)
+    change_feed.start()
+
+    devices: List[Dict[int, float]] = [{} for _ in range(args.devices)]
+    until = asyncio.Event()
+    if mode == "polling":
+        tasks = [asyncio.create_task(poll_device(repository, seen, until, args.poll_s)) for seen in devices]
+    else:
+        readies = [asyncio.Event() for _ in devices]
+        tasks = [asyncio.create_task(feed_device(seen, ready)) for seen, ready in zip(devices, readies)]
+        await asyncio.gather(*(ready.wait() for ready in readies))
+    await asyncio.sleep(0.05)
+
+    db.reset_counters()
+    async_db.reset_counters()
+    await asyncio.sleep(args.idle_s)
+    idle = db.rpc_count + async_db.rpc_count
+
+    db.reset_counters()
+    async_db.reset_counters()
+    written = await write_all(repository, args.writes, args.interval_s)
+    # Long enough for the last poll to come round
+    await asyncio.sleep(args.poll_s + 0.5 if mode == "polling" else 0.5)
+    rpcs = db.rpc_count + async_db.rpc_count - args.writes
+
+    until.set()
+    change_feed.stop()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    delays = [seen[item_id] - started for seen in devices for item_id, started in written.items() if item_id in seen]
+    return {
+        "reads_per_write": rpcs / args.writes,
+        "idle_per_minute": idle * 60 / args.idle_s,
+        "delivered": len(delays) / (args.writes * args.devices),
+        "p50_ms": statistics.median(delays) * 1000,
+        "max_ms": max(delays) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare delta polling with the change feed.")
+    parser.add_argument("--devices", type=int, default=3, help="devices of the user")
+    parser.add_argument("--writes", type=int, default=20, help="medication writes")
+    parser.add_argument("--interval-s", type=float, default=0.25, help="time between writes")
+    parser.add_argument("--poll-s", type=float, default=1.0, help="polling interval of each device")
+    parser.add_argument("--idle-s", type=float, default=3.0, help="time measured without writes")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="latency added to every Firestore RPC")
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'reads/write':>12}{'idle reads/min':>16}{'delivered':>11}{'p50 ms':>9}{'max ms':>9}")
+    for mode in ("polling", "feed"):
+        result = asyncio.run(run(mode, args))
+        print(f"{mode:<10}{result['reads_per_write']:>12.2f}{result['idle_per_minute']:>16.0f}{result['delivered']:>11.0%}{result['p50_ms']:>9.1f}{result['max_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
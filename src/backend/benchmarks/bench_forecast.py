@@ -0,0 +1,83 @@
+# Stock Forecast Benchmark
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Times the vectorized forecast against a per-record loop over the same medications.
+#
+#   python -m benchmarks.bench_forecast [count]
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from services.forecast import forecast  # noqa: E402
+
+TODAY = date(2026, 10, 18)
+
+
+def generate(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    medications, frequencies = [], []
+    for index in range(count):
+        user_id = f"user-{index // 8}"
+        start = TODAY - timedelta(days=rng.randint(0, 90))
+        stock_date = "" if rng.random() < 0.2 else (start + timedelta(days=rng.randint(0, 30))).isoformat()
+        medications.append({
+            "id": index, "user_id": user_id, "name": f"Medication {index}", "stock": rng.randint(0, 200),
+            "start_date": start.isoformat(), "end_date": (start + timedelta(days=rng.randint(7, 180))).isoformat(),
+            "stock_date": stock_date, "threshold": rng.randint(1, 20), "email_alert": "on",
+        })
+        frequencies.append({
+            "medication_id": index, "user_id": user_id, "dosage": rng.randint(1, 3), "cycle": rng.randint(1, 3),
+            "times": ["08:00", "20:00"][: rng.randint(1, 2)],
+        })
+        if rng.random() < 0.1:
+            frequencies.append({"medication_id": index, "user_id": user_id, "dosage": 1, "cycle": 7, "times": ["12:00"]})
+    return medications, frequencies
+
+
+# The same projection one record at a time, as the mobile stock check does it
+def forecast_loop(medications, frequencies, today: date):
+    daily_use = {}
+    for frequency in frequencies:
+        key = (frequency["user_id"], frequency["medication_id"])
+        daily_use[key] = daily_use.get(key, 0) + frequency["dosage"] * len(frequency["times"]) / frequency["cycle"]
+    below = []
+    for item in medications:
+        start = datetime.strptime(item["start_date"], "%Y-%m-%d").date()
+        end = datetime.strptime(item["end_date"], "%Y-%m-%d").date()
+        base = datetime.strptime(item["stock_date"], "%Y-%m-%d").date() if item["stock_date"] else start
+        daily = daily_use.get((item["user_id"], item["id"]), 0)
+        elapsed = max((min(today, end) - base).days, 0)
+        projected = item["stock"] - elapsed * daily
+        below.append(start <= today <= end and projected < item["threshold"])
+    return below
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    medications, frequencies = generate(count)
+
+    started = time.perf_counter()
+    expected = forecast_loop(medications, frequencies, TODAY)
+    loop_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = forecast(medications, frequencies, TODAY)
+    vector_seconds = time.perf_counter() - started
+
+    assert np.array_equal(result["below_threshold"], np.array(expected)), "forecasts disagree"
+    print(f"{count} medications, {int(result['below_threshold'].sum())} below threshold")
+    print(f"{'per-record loop':<18}{loop_seconds * 1000:>10.1f} ms")
+    print(f"{'numpy':<18}{vector_seconds * 1000:>10.1f} ms")
+    print(f"{'speedup':<18}{loop_seconds / vector_seconds:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
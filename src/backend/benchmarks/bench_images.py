@@ -0,0 +1,90 @@
+# Image Offload Benchmark
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Compares a user's medication list with pictures stored inline as base64 and with pictures
+# offloaded to the blob store: list payload size, list read + JSON encode time, and list
+# upsert time (the first upload hashes and makes thumbnails, repeats are deduplicated).
+#
+#   python -m benchmarks.bench_images
+#   python -m benchmarks.bench_images --items 50 --image-px 1600
+import argparse
+import base64
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("LIST_CACHE_COLLECTIONS", "")
+
+from benchmarks.fake_firestore import FakeFirestore  # noqa: E402
+from models.request import Medication  # noqa: E402
+from services.blobs import LocalBlobStore, set_blob_store  # noqa: E402
+from services.encoding import JSON, render  # noqa: E402
+from services.images import ImageRepository  # noqa: E402
+from services.repository import FirestoreRepository, Repository  # noqa: E402
+
+USER_ID = "bench-user"
+
+
+def photo(index: int, pixels: int) -> str:
+    from PIL import Image
+
+    output = io.BytesIO()
+    # Noise keeps JPEG from compressing the picture to nothing, like a real photo
+    Image.effect_noise((pixels, pixels * 3 // 4), 40 + index).convert("RGB").save(output, "JPEG", quality=85)
+    return base64.b64encode(output.getvalue()).decode()
+
+
+def medications(images: List[str]) -> List[Medication]:
+    return [
+        Medication(
+            id=item_id, user_id=USER_ID, name=f"Medication {item_id}", image=image, stock=30,
+            start_date="2026-10-01", end_date="2027-03-31", stock_date="2026-10-18", threshold=5,
+            push_alert="on", email_alert="on",
+        )
+        for item_id, image in enumerate(images)
+    ]
+
+
+def p50_ms(action: Callable, repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        action()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+def measure(name: str, repository: Repository, items: List[Medication], repeat: int):
+    first = p50_ms(lambda: repository.bulk_upsert("medications", USER_ID, items), 1)
+    again = p50_ms(lambda: repository.bulk_upsert("medications", USER_ID, items), repeat)
+    payload = render(repository.list_page("medications", USER_ID), JSON)
+    listing = p50_ms(lambda: render(repository.list_page("medications", USER_ID), JSON), repeat)
+    print(f"{name:<11}{len(payload) / 1024:>12.1f}{listing:>14.2f}{first:>15.1f}{again:>15.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare inline and offloaded medication pictures.")
+    parser.add_argument("--items", type=int, default=30, help="medications with a picture")
+    parser.add_argument("--image-px", type=int, default=800, help="width of each picture")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per measurement")
+    args = parser.parse_args()
+
+    set_blob_store(LocalBlobStore(tempfile.mkdtemp()))
+    items = medications([photo(index, args.image_px) for index in range(args.items)])
+
+    print(f"{'images':<11}{'list KiB':>12}{'list+json ms':>14}{'upsert 1st ms':>15}{'upsert ms':>15}")
+    inline, offloaded = FakeFirestore(), FakeFirestore()
+    measure("inline", FirestoreRepository(lambda: inline, lambda: None), items, args.repeat)
+    measure("offloaded", ImageRepository(FirestoreRepository(lambda: offloaded, lambda: None)), items, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
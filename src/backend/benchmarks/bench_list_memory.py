@@ -0,0 +1,70 @@
+# List Memory Benchmark
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Peak Python memory of one list request as the collection grows: a full read against
+# NDJSON streaming and 100-document pages. What little the streamed columns still grow is
+# the in-memory fake sorting its matches; Firestore itself streams them.
+#
+#   python -m benchmarks.bench_list_memory
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["LIST_CACHE_COLLECTIONS"] = ""  # measure the reads, not the cache
+
+from benchmarks.fake_firestore import FakeFirestore  # noqa: E402
+from services.delta import list_changes  # noqa: E402
+from services.pages import list_page, stream_page  # noqa: E402
+
+USER_ID = "bench-user"
+IMAGE = "x" * 4096  # medications carry their picture inline
+
+
+def seed(count: int) -> FakeFirestore:
+    db = FakeFirestore()
+    for item_id in range(count):
+        db.collection("medications").document(f"{USER_ID}_{item_id:06d}").set({
+            "id": item_id, "user_id": USER_ID, "name": f"Medication {item_id}", "image": IMAGE, "stock": 30,
+        })
+    return db
+
+
+def full_read(db):
+    return list_changes(db, "medications", USER_ID)
+
+
+def streamed(db):
+    for _ in stream_page(db, "medications", USER_ID):
+        pass
+
+
+def paged(db):
+    cursor = None
+    while True:
+        page = list_page(db, "medications", USER_ID, limit=100, cursor=cursor)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return
+
+
+def peak(db, action) -> float:
+    tracemalloc.start()
+    result = action(db)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak_bytes / 1024 / 1024
+
+
+def main():
+    print(f"{'documents':>10}{'full read MB':>15}{'ndjson MB':>12}{'pages MB':>12}")
+    for count in (1_000, 5_000, 20_000):
+        db = seed(count)
+        print(f"{count:>10}{peak(db, full_read):>15.1f}{peak(db, streamed):>12.1f}{peak(db, paged):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
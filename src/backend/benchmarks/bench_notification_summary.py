@@ -0,0 +1,75 @@
+# Notification Summary Benchmark
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# The unread badge of a user with a long notification history, against the in-memory Firestore
+# with latency on every RPC: counted from the full notification list, as the devices do, and
+# read from the summary document. Also the extra cost the summary adds to a notification write.
+#
+#   python -m benchmarks.bench_notification_summary
+#   python -m benchmarks.bench_notification_summary --history 2000 --latency-ms 40
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_firestore import FakeFirestore  # noqa: E402
+from models.request import Notification  # noqa: E402
+from services.repository import FirestoreRepository  # noqa: E402
+from services.summary import UNREAD, NotificationSummaryRepository, notification_summary  # noqa: E402
+
+USER_ID = "bench-user"
+
+
+def notification(item_id: int) -> Notification:
+    return Notification(id=item_id, user_id=USER_ID, type=1 + item_id % 3, var1="Medication", var2="08:00", var3="1",
+                        status=UNREAD if item_id % 4 == 0 else 2, target_id=item_id)
+
+
+def p50_ms(action: Callable, repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        action()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the unread badge from the notification list and from the summary.")
+    parser.add_argument("--history", type=int, default=500, help="notifications of the user")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="latency added to every Firestore RPC")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per measurement")
+    args = parser.parse_args()
+
+    db = FakeFirestore(latency=args.latency_ms / 1000)
+    engine = FirestoreRepository(lambda: db, lambda: None)
+    repository = NotificationSummaryRepository(engine)
+    repository.bulk_upsert("notifications", USER_ID, [notification(item_id) for item_id in range(args.history)])
+
+    def listed():
+        return sum(item["status"] == UNREAD for item in engine.list_page("notifications", USER_ID)["data"])
+
+    def summarized():
+        return notification_summary(repository, USER_ID)["unread"]
+
+    assert listed() == summarized()
+    print(f"{'badge from':<14}{'documents':>11}{'p50 ms':>9}")
+    for name, action, documents in [("list", listed, args.history), ("summary", summarized, 1)]:
+        print(f"{name:<14}{documents:>11}{p50_ms(action, args.repeat):>9.1f}")
+
+    written = iter(range(args.history, args.history + 2 * args.repeat))
+    print(f"\n{'write':<14}{'rpcs':>11}{'p50 ms':>9}")
+    for name, target in [("plain", engine), ("with summary", repository)]:
+        db.reset_counters()
+        duration = p50_ms(lambda: target.upsert("notifications", notification(next(written)).model_dump()), args.repeat)
+        print(f"{name:<14}{db.rpc_count / args.repeat:>11.1f}{duration:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Dose Schedule Benchmark
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Range queries over one user's doses, answered by expanding every frequency on each call and
+# by the schedule index, plus the cost of a frequency write to the index (one re-expansion)
+# against rebuilding the user's whole schedule.
+#
+#   python -m benchmarks.bench_schedule
+#   python -m benchmarks.bench_schedule --frequencies 40 --days 7
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.repository import FirestoreRepository  # noqa: E402
+from services.schedule import ScheduleIndex, expand  # noqa: E402
+
+USER_ID = "bench-user"
+
+
+def p50_us(action: Callable, repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        action()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare expanding doses per query with the schedule index.")
+    parser.add_argument("--frequencies", type=int, default=12, help="frequencies of the user")
+    parser.add_argument("--days", type=int, default=1, help="days covered by each query")
+    parser.add_argument("--repeat", type=int, default=2000, help="runs per measurement")
+    args = parser.parse_args()
+
+    today = date.today()
+    medications = [
+        {"id": item_id, "user_id": USER_ID, "start_date": (today - timedelta(days=90 + item_id)).isoformat(), "end_date": ""}
+        for item_id in range(args.frequencies)
+    ]
+    frequencies = [
+        {"id": item_id, "medication_id": item_id, "user_id": USER_ID, "dosage": 1, "dosage_unit": 0,
+         "cycle": 1 + item_id % 3, "times": ["06:00", "14:00", "22:00"][:1 + item_id % 3]}
+        for item_id in range(args.frequencies)
+    ]
+    repository = FirestoreRepository(lambda: None, lambda: None)
+    repository.list_page = lambda collection, user_id, **page: {"data": frequencies if collection == "frequencies" else medications}
+    index = ScheduleIndex(past_days=1, days=31, max_users=10)
+    by_id = {item["id"]: item for item in medications}
+
+    start = datetime.combine(today, datetime.min.time()) + timedelta(hours=12)
+    end = start + timedelta(days=args.days)
+
+    def expand_all():
+        doses = []
+        for frequency in frequencies:
+            doses.extend(at for at in expand(frequency, by_id[frequency["medication_id"]], start.date(), end.date()) if start <= at < end)
+        return sorted(doses)
+
+    def rebuild():
+        index._users.clear()
+        index.query(repository, USER_ID, start, end)
+
+    def write():
+        index.update("frequencies", USER_ID, [frequencies[0]])
+        index.query(repository, USER_ID, start, end)
+
+    assert len(expand_all()) == len(index.query(repository, USER_ID, start, end))
+    print(f"{'operation':<34}{'p50 us':>10}")
+    for name, action in [
+        ("query, expanding every frequency", expand_all),
+        ("query, schedule index", lambda: index.query(repository, USER_ID, start, end)),
+        ("write + query, whole rebuild", rebuild),
+        ("write + query, touched frequency", write),
+    ]:
+        print(f"{name:<34}{p50_us(action, args.repeat):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Read Coalescing Benchmark
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Fires bursts of identical full list reads, as an app launch does, at the in-memory Firestore
+# with the list cache off, and compares Firestore RPCs and burst latency with and without
+# coalescing, on threads (the regular routes) and on coroutines (the /async routes).
+#
+#   python -m benchmarks.bench_singleflight
+#   python -m benchmarks.bench_singleflight --burst 8 --latency-ms 30
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Every burst must reach Firestore, or the cache would hide what coalescing saves
+os.environ["LIST_CACHE_COLLECTIONS"] = ""
+
+from benchmarks.fake_firestore import AsyncFakeFirestore, FakeFirestore  # noqa: E402
+from services.delta import list_changes, list_changes_async, list_reads  # noqa: E402
+from services.documents import document_id, stamp  # noqa: E402
+
+USER_ID = "bench-user"
+
+
+def seed(db: FakeFirestore, items: int):
+    for item_id in range(items):
+        data = {"id": item_id, "user_id": USER_ID, "name": f"Medication {item_id}", "stock": 30}
+        db.collection("medications").document(document_id(USER_ID, item_id))._apply_set(stamp(data))
+
+
+def run_threads(db: FakeFirestore, burst: int, bursts: int) -> List[float]:
+    durations = []
+    with ThreadPoolExecutor(burst) as pool:
+        for _ in range(bursts):
+            started = time.perf_counter()
+            list(pool.map(lambda _: list_changes(db, "medications", USER_ID), range(burst)))
+            durations.append(time.perf_counter() - started)
+    return durations
+
+
+async def run_coroutines(db: AsyncFakeFirestore, burst: int, bursts: int) -> List[float]:
+    durations = []
+    for _ in range(bursts):
+        started = time.perf_counter()
+        await asyncio.gather(*(list_changes_async(db, "medications", USER_ID) for _ in range(burst)))
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def measure(mode: str, enabled: bool, args) -> Dict[str, float]:
+    db = FakeFirestore(latency=args.latency_ms / 1000)
+    seed(db, args.items)
+    async_db = AsyncFakeFirestore.sharing(db)
+    db.reset_counters()
+    async_db.reset_counters()
+    list_reads.enabled = enabled
+    before = list_reads.shared
+
+    if mode == "threads":
+        durations = run_threads(db, args.burst, args.bursts)
+    else:
+        durations = asyncio.run(run_coroutines(async_db, args.burst, args.bursts))
+    return {
+        "rpc_per_burst": (db.rpc_count + async_db.rpc_count) / args.bursts,
+        "p50_ms": statistics.median(durations) * 1000,
+        "shared": list_reads.shared - before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare identical concurrent reads with and without coalescing.")
+    parser.add_argument("--burst", type=int, default=6, help="identical reads fired together")
+    parser.add_argument("--bursts", type=int, default=50, help="bursts per run")
+    parser.add_argument("--items", type=int, default=30, help="medications of the user")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="latency added to every Firestore RPC")
+    args = parser.parse_args()
+
+    print(f"{'mode':<12}{'coalescing':<12}{'rpc/burst':>10}{'p50 ms':>9}{'reads saved':>13}")
+    for mode in ("threads", "coroutines"):
+        for enabled in (False, True):
+            result = measure(mode, enabled, args)
+            print(f"{mode:<12}{'on' if enabled else 'off':<12}{result['rpc_per_burst']:>10.1f}{result['p50_ms']:>9.1f}{result['shared']:>13}")
+
+
+if __name__ == "__main__":
+    main()
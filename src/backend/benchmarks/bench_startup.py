@@ -0,0 +1,72 @@
+# Startup Benchmark
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Times `import main` and the app's lifespan startup in fresh interpreters, checks that the
+# heavy client libraries stay unloaded until first use, and fails when over the time budget.
+#
+#   python -m benchmarks.bench_startup [runs]
+#   STARTUP_BUDGET_MS=1500 python -m benchmarks.bench_startup
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use rather than at import: Firestore/gRPC, NumPy, Twilio and SendGrid
+DEFERRED_MODULES = ["google.cloud.firestore", "numpy", "twilio.rest", "sendgrid"]
+
+_PROBE = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def boot():
+    async with main.lifespan(main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(boot())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+def probe(outbox_path: str) -> dict:
+    env = {**os.environ, "OUTBOX_PATH": outbox_path, "OUTBOX_PROVIDERS": "fake"}
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE % DEFERRED_MODULES],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    budget = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = [probe(os.path.join(directory, "outbox.db")) for _ in range(runs)]
+
+    import_ms = statistics.median(result["import_ms"] for result in results)
+    startup_ms = statistics.median(result["startup_ms"] for result in results)
+    loaded = sorted({name for result in results for name in result["loaded"]})
+    print(f"{'import main':<22}{import_ms:>10.0f} ms")
+    print(f"{'lifespan startup':<22}{startup_ms:>10.0f} ms")
+    print(f"{'total':<22}{import_ms + startup_ms:>10.0f} ms  (budget {budget:.0f} ms, median of {runs})")
+    print(f"{'eagerly loaded':<22}{', '.join(loaded) or 'none'}")
+
+    if import_ms + startup_ms > budget or loaded:
+        print("Startup budget exceeded")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Storage Backend Benchmark
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Runs one workload against the Firestore repository (in-memory Firestore with injected per-RPC
+# latency, list cache off) and the SQLite repository on a temporary file, and reports throughput
+# and p50/p95 latency per operation: bulk and single upserts, full, delta and paged lists, deletes.
+#
+#   python -m benchmarks.bench_storage
+#   python -m benchmarks.bench_storage --latency-ms 20 --users 20 --items 100
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Measure the engines themselves, not the cache in front of Firestore list reads
+os.environ.setdefault("LIST_CACHE_COLLECTIONS", "")
+
+from benchmarks.fake_firestore import FakeFirestore  # noqa: E402
+from models.request import Medication  # noqa: E402
+from services.repository import FirestoreRepository, Repository  # noqa: E402
+from services.sqlite_repository import SQLiteRepository  # noqa: E402
+
+
+def medication(user_id: str, item_id: int, stock: int = 30) -> Dict[str, Any]:
+    return {
+        "id": item_id, "user_id": user_id, "name": f"Medication {item_id}", "image": "", "stock": stock,
+        "start_date": "2026-10-01", "end_date": "2027-03-31", "stock_date": "2026-10-18", "threshold": 5,
+        "push_alert": "on", "email_alert": "on",
+    }
+
+
+def timed(latencies: List[float], action: Callable[[], Any]) -> Any:
+    started = time.perf_counter()
+    result = action()
+    latencies.append(time.perf_counter() - started)
+    return result
+
+
+def walk_pages(repository: Repository, user_id: str, limit: int) -> int:
+    pages, cursor = 0, None
+    while True:
+        page = repository.list_page("medications", user_id, limit=limit, cursor=cursor)
+        pages += 1
+        cursor = page.get("next_cursor")
+        if not cursor:
+            return pages
+
+
+def workload(repository: Repository, user_ids: List[str], items: int, updates: int) -> Dict[str, List[float]]:
+    latencies: Dict[str, List[float]] = {name: [] for name in ("bulk upsert", "upsert", "list", "delta list", "paged list", "delete")}
+    for user_id in user_ids:
+        batch = [Medication(**medication(user_id, item_id)) for item_id in range(items)]
+        timed(latencies["bulk upsert"], lambda: repository.bulk_upsert("medications", user_id, batch))
+
+    watermarks = {}
+    for user_id in user_ids:
+        page = timed(latencies["list"], lambda: repository.list_page("medications", user_id))
+        watermarks[user_id] = page["watermark"]
+
+    for user_id in user_ids:
+        for item_id in range(updates):
+            timed(latencies["upsert"], lambda: repository.upsert("medications", medication(user_id, item_id, stock=29)))
+        repository.delete("medications", user_id, items - 1)
+
+    # A client that synced before the updates: the changed items and one deletion
+    for user_id in user_ids:
+        timed(latencies["delta list"], lambda: repository.list_page("medications", user_id, since=watermarks[user_id]))
+        timed(latencies["paged list"], lambda: walk_pages(repository, user_id, 10))
+        for item_id in range(updates, updates * 2):
+            timed(latencies["delete"], lambda: repository.delete("medications", user_id, item_id))
+    return latencies
+
+
+def report(backend: str, latencies: Dict[str, List[float]]):
+    for operation, values in latencies.items():
+        p50 = statistics.median(values)
+        p95 = statistics.quantiles(values, n=20, method="inclusive")[18] if len(values) > 1 else values[0]
+        print(f"{backend:<11}{operation:<14}{len(values) / sum(values):>12.0f}{p50 * 1000:>10.2f}{p95 * 1000:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the Firestore and SQLite repositories on one workload.")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="latency added to every Firestore RPC")
+    parser.add_argument("--users", type=int, default=10, help="users in the workload")
+    parser.add_argument("--items", type=int, default=50, help="medications per user")
+    parser.add_argument("--updates", type=int, default=10, help="single upserts and deletes per user")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    user_ids = [f"bench-user-{index:04d}" for index in range(args.users)]
+    db = FakeFirestore(latency=args.latency_ms / 1000)
+    backends = {
+        "firestore": FirestoreRepository(lambda: db, lambda: None),
+        "sqlite": SQLiteRepository(os.path.join(directory, "storage.db")),
+    }
+
+    print(f"{'backend':<11}{'operation':<14}{'ops/s':>12}{'p50 ms':>10}{'p95 ms':>10}")
+    for backend, repository in backends.items():
+        report(backend, workload(repository, user_ids, args.items, args.updates))
+
+
+if __name__ == "__main__":
+    main()
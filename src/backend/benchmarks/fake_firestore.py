@@ -0,0 +1,394 @@
+# In-Memory Firestore
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Stand-ins for `firestore.Client` and `firestore_async.AsyncClient` over one shared store, with
+# per-RPC counters and injectable latency so the API can be measured without a Firebase project.
+import asyncio
+import copy
+import itertools
+import operator
+import pickle
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Union
+
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound
+
+_auto_ids = itertools.count(1)
+_update_times = itertools.count(1)
+
+_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda current, values: current in values,
+    "not-in": lambda current, values: current not in values,
+    "array_contains": lambda current, value: value in (current or []),
+}
+
+
+def _resolve(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Deep copy of written data with server-side sentinels replaced by their values."""
+    now = datetime.now(timezone.utc)
+    return {key: now if value is firestore.SERVER_TIMESTAMP else copy.deepcopy(value) for key, value in data.items()}
+
+
+def _decoded(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    # A fresh copy down to the strings, as if the document had just been decoded off the wire
+    return None if data is None else pickle.loads(pickle.dumps(data))
+
+
+class DocumentSnapshot:
+    def __init__(self, reference: "DocumentReference", data: Optional[Dict[str, Any]], update_time: Optional[int] = None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+        # A write counter rather than a timestamp, compared only by `last_update_time` preconditions
+        self.update_time = update_time
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data)
+
+    def get(self, field: str) -> Any:
+        return self._data[field]
+
+
+class DocumentReference:
+    def __init__(self, client: "FakeFirestore", collection: str, document_id: str):
+        self._client = client
+        self._collection = collection
+        self.id = document_id
+
+    @property
+    def _documents(self) -> Dict[str, Dict[str, Any]]:
+        return self._client.collections.setdefault(self._collection, {})
+
+    def _touch(self):
+        self._client.update_times[(self._collection, self.id)] = next(_update_times)
+
+    def _apply_set(self, data: Dict[str, Any], merge: bool = False):
+        with self._client._lock:
+            if merge and self.id in self._documents:
+                self._documents[self.id].update(_resolve(data))
+            else:
+                self._documents[self.id] = _resolve(data)
+            self._touch()
+
+    def _apply_create(self, data: Dict[str, Any]):
+        with self._client._lock:
+            if self.id in self._documents:
+                raise AlreadyExists(f"Document already exists: {self._collection}/{self.id}")
+            self._apply_set(data)
+
+    def _apply_update(self, data: Dict[str, Any], option: Optional[Dict[str, Any]] = None):
+        with self._client._lock:
+            if self.id not in self._documents:
+                raise NotFound(f"No document to update: {self._collection}/{self.id}")
+            if option and "last_update_time" in option and option["last_update_time"] != self._client.update_times.get((self._collection, self.id)):
+                raise FailedPrecondition(f"Document changed since it was read: {self._collection}/{self.id}")
+            self._documents[self.id].update(_resolve(data))
+            self._touch()
+
+    def _apply_delete(self, option: Optional[Dict[str, Any]] = None):
+        with self._client._lock:
+            if option and option.get("exists") and self.id not in self._documents:
+                raise NotFound(f"No document to delete: {self._collection}/{self.id}")
+            self._documents.pop(self.id, None)
+            self._client.update_times.pop((self._collection, self.id), None)
+
+    def _snapshot(self) -> DocumentSnapshot:
+        with self._client._lock:
+            return DocumentSnapshot(self, _decoded(self._documents.get(self.id)), self._client.update_times.get((self._collection, self.id)))
+
+    def get(self) -> DocumentSnapshot:
+        self._client._rpc("get")
+        return self._snapshot()
+
+    def set(self, data: Dict[str, Any], merge: bool = False):
+        self._client._rpc("commit")
+        self._apply_set(data, merge)
+
+    def create(self, data: Dict[str, Any]):
+        self._client._rpc("commit")
+        self._apply_create(data)
+
+    def update(self, data: Dict[str, Any], option: Optional[Dict[str, Any]] = None):
+        self._client._rpc("commit")
+        self._apply_update(data, option)
+
+    def delete(self, option: Optional[Dict[str, Any]] = None):
+        self._client._rpc("commit")
+        self._apply_delete(option)
+
+
+class Query:
+    def __init__(
+        self,
+        client: "FakeFirestore",
+        collection: str,
+        filters: tuple = (),
+        limit: Optional[int] = None,
+        fields: Optional[tuple] = None,
+        orders: tuple = (),
+        start_after: Optional[Dict[str, Any]] = None,
+    ):
+        self._client = client
+        self._collection = collection
+        self._filters = filters
+        self._limit = limit
+        self._fields = fields
+        self._orders = orders
+        self._start_after = start_after
+
+    def _with(self, **changes) -> "Query":
+        state = {
+            "filters": self._filters, "limit": self._limit, "fields": self._fields,
+            "orders": self._orders, "start_after": self._start_after,
+        }
+        state.update(changes)
+        return self._client._query_type(self._client, self._collection, **state)
+
+    def where(self, field: str, op: str, value: Any) -> "Query":
+        return self._with(filters=self._filters + ((field, op, value),))
+
+    def limit(self, count: int) -> "Query":
+        return self._with(limit=count)
+
+    def select(self, field_paths: List[str]) -> "Query":
+        return self._with(fields=tuple(field_paths))
+
+    def order_by(self, field: str, direction: str = "ASCENDING") -> "Query":
+        return self._with(orders=self._orders + ((field, direction == "DESCENDING"),))
+
+    def start_after(self, values: Dict[str, Any]) -> "Query":
+        return self._with(start_after=values)
+
+    def _matches(self, data: Dict[str, Any]) -> bool:
+        for field, op, value in self._filters:
+            # Like Firestore, range filters never match documents missing the field
+            if field not in data or not _OPERATORS[op](data[field], value):
+                return False
+        return True
+
+    def _ordered(self, documents: List[tuple]) -> List[tuple]:
+        value = lambda document_id, data, field: document_id if field == "__name__" else data.get(field)
+        for field, descending in reversed(self._orders):
+            # Ordering by a field also drops documents without it
+            documents = [item for item in documents if field == "__name__" or field in item[1]]
+            documents.sort(key=lambda item: value(item[0], item[1], field), reverse=descending)
+        if self._start_after is not None:
+            cursor = tuple(self._start_after[field] for field, _ in self._orders if field in self._start_after)
+            documents = [
+                item for item in documents
+                if _after(tuple(value(item[0], item[1], field) for field, _ in self._orders[:len(cursor)]), cursor, self._orders)
+            ]
+        return documents
+
+    def _results(self) -> List[DocumentSnapshot]:
+        with self._client._lock:
+            documents = [item for item in self._client.collections.get(self._collection, {}).items() if self._matches(item[1])]
+            results = []
+            for document_id, data in self._ordered(documents)[:self._limit]:
+                if self._fields is not None:
+                    data = {field: data[field] for field in self._fields if field in data}
+                reference = self._client._document_type(self._client, self._collection, document_id)
+                results.append(DocumentSnapshot(reference, _decoded(data)))
+        return results
+
+    def stream(self):
+        self._client._rpc("query")
+        yield from self._results()
+
+    def get(self) -> List[DocumentSnapshot]:
+        return list(self.stream())
+
+
+def _after(values: tuple, cursor: tuple, orders: tuple) -> bool:
+    for value, bound, (_, descending) in zip(values, cursor, orders):
+        if value != bound:
+            return value < bound if descending else value > bound
+    return False
+
+
+class CollectionReference(Query):
+    def document(self, document_id: Optional[str] = None) -> DocumentReference:
+        return self._client._document_type(self._client, self._collection, document_id or f"auto{next(_auto_ids):020d}")
+
+    def add(self, data: Dict[str, Any]):
+        reference = self.document()
+        reference.set(data)
+        return None, reference
+
+
+class WriteBatch:
+    def __init__(self, client: "FakeFirestore"):
+        self._client = client
+        self._writes: List[tuple] = []
+        self._preconditions: List[DocumentReference] = []
+
+    def set(self, reference: DocumentReference, data: Dict[str, Any], merge: bool = False):
+        self._writes.append((reference, reference._apply_set, (data, merge)))
+
+    def update(self, reference: DocumentReference, data: Dict[str, Any]):
+        self._writes.append((reference, reference._apply_update, (data,)))
+
+    def delete(self, reference: DocumentReference, option: Optional[Dict[str, Any]] = None):
+        self._writes.append((reference, reference._apply_delete, (option,)))
+        if option and option.get("exists"):
+            self._preconditions.append(reference)
+
+    def _apply(self):
+        with self._client._lock:
+            # Preconditions are checked before anything is applied, so a failed batch writes nothing
+            for reference in self._preconditions:
+                if reference.id not in reference._documents:
+                    raise NotFound(f"No document to delete: {reference._collection}/{reference.id}")
+            for _, apply, args in self._writes:
+                apply(*args)
+        self._writes = []
+        self._preconditions = []
+
+    def commit(self):
+        self._client._rpc("commit")
+        self._apply()
+
+
+Latency = Union[None, float, Dict[str, float]]
+
+
+class FakeFirestore:
+    """Stand-in for the subset of `firestore.Client` used by the backend, counting RPCs.
+
+    `latency` is seconds added to every RPC, or a dict of seconds per method (`get`, `query`,
+    `commit`, `batch_get`). Handlers run on a thread pool, so the store is guarded by a lock.
+    """
+
+    _query_type = Query
+    _collection_type = CollectionReference
+    _document_type = DocumentReference
+    _batch_type = WriteBatch
+
+    def __init__(self, latency: Latency = None, collections: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None):
+        self.collections: Dict[str, Dict[str, Dict[str, Any]]] = {} if collections is None else collections
+        self.update_times: Dict[tuple, int] = {}
+        self.latency = latency
+        self.rpc_count = 0
+        self.rpc_by_method: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def _delay(self, method: str) -> float:
+        if isinstance(self.latency, dict):
+            return self.latency.get(method, 0.0)
+        return self.latency or 0.0
+
+    def _count(self, method: str) -> float:
+        with self._lock:
+            self.rpc_count += 1
+            self.rpc_by_method[method] = self.rpc_by_method.get(method, 0) + 1
+        return self._delay(method)
+
+    def _rpc(self, method: str):
+        delay = self._count(method)
+        if delay:
+            time.sleep(delay)
+
+    def reset_counters(self):
+        with self._lock:
+            self.rpc_count = 0
+            self.rpc_by_method = {}
+
+    def collection(self, name: str) -> CollectionReference:
+        return self._collection_type(self, name)
+
+    def batch(self) -> WriteBatch:
+        return self._batch_type(self)
+
+    def write_option(self, **kwargs) -> Dict[str, Any]:
+        return kwargs
+
+    def get_all(self, references: List[DocumentReference], field_paths: Optional[List[str]] = None):
+        self._rpc("batch_get")
+        for reference in references:
+            yield reference._snapshot()
+
+
+class AsyncDocumentReference(DocumentReference):
+    async def get(self) -> DocumentSnapshot:
+        await self._client._rpc_async("get")
+        return self._snapshot()
+
+    async def set(self, data: Dict[str, Any], merge: bool = False):
+        await self._client._rpc_async("commit")
+        self._apply_set(data, merge)
+
+    async def create(self, data: Dict[str, Any]):
+        await self._client._rpc_async("commit")
+        self._apply_create(data)
+
+    async def update(self, data: Dict[str, Any], option: Optional[Dict[str, Any]] = None):
+        await self._client._rpc_async("commit")
+        self._apply_update(data, option)
+
+    async def delete(self, option: Optional[Dict[str, Any]] = None):
+        await self._client._rpc_async("commit")
+        self._apply_delete(option)
+
+
+class AsyncQuery(Query):
+    async def stream(self):
+        await self._client._rpc_async("query")
+        for snapshot in self._results():
+            yield snapshot
+
+    async def get(self) -> List[DocumentSnapshot]:
+        return [snapshot async for snapshot in self.stream()]
+
+
+class AsyncCollectionReference(AsyncQuery):
+    document = CollectionReference.document
+
+    async def add(self, data: Dict[str, Any]):
+        reference = self.document()
+        await reference.set(data)
+        return None, reference
+
+
+class AsyncWriteBatch(WriteBatch):
+    async def commit(self):
+        await self._client._rpc_async("commit")
+        self._apply()
+
+
+class AsyncFakeFirestore(FakeFirestore):
+    """Stand-in for `firestore_async.AsyncClient`."""
+
+    _query_type = AsyncQuery
+    _collection_type = AsyncCollectionReference
+    _document_type = AsyncDocumentReference
+    _batch_type = AsyncWriteBatch
+
+    @classmethod
+    def sharing(cls, client: FakeFirestore) -> "AsyncFakeFirestore":
+        """An async client over the same documents and lock as `client`, with its own counters."""
+        shared = cls(client.latency, client.collections)
+        shared.update_times = client.update_times
+        shared._lock = client._lock
+        return shared
+
+    async def _rpc_async(self, method: str):
+        delay = self._count(method)
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def get_all(self, references: List[DocumentReference], field_paths: Optional[List[str]] = None):
+        await self._rpc_async("batch_get")
+        for reference in references:
+            yield reference._snapshot()
@@ -3,517 +3,346 @@
 # RTHA
 #
 # Created by Morgan on 03/01/2025
-import firebase_admin
+import asyncio
+import math
 import os
-import services.firebase 
 import re
+import async_router
+
+from contextlib import aclosing, asynccontextmanager
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from models.request import Medication, Frequency, Setting, Appointment, EmergencyContact, Notification, EmergencyRequest, MedicationEmail, EmergencyDeleteRequest, ListQuery
+from typing import Annotated, List, Optional
+from datetime import datetime
+
+from utility import send_sms_many, send_email
+from services.cache import list_cache
+from services.delta import list_reads
+from services.outbox import outbox, PRIORITY_EMERGENCY
+from services.digest import email_digest
+from services.forecast import stock_forecaster
+from services.compaction import notification_compactor
+from services.codec import list_body, list_body_schema
+from services.encoding import JSON, encoded_response, render
+from services.repository import get_repository
+from services.responses import http_errors, list_result, stream_result, data_result, added_result, updated_result, bulk_result, deleted_result, bulk_deleted_result, emergency_ids, schedule_window
+from services.directory import user_directory
+from services.feed import change_feed
+from services.schedule import schedule_index
+from services.summary import notification_summary
+from services.images import MAX_IMAGE_BYTES, image_response, store_image
+from services.admission import ADMISSION_ENABLED, AdmissionMiddleware, admission_stats, email_rate_limit, run_emergency
+from services.metrics import METRICS_ENABLED, SERVER_TIMING, MetricsMiddleware, TimedRoute, exposition
 
-from fastapi import FastAPI, HTTPException, Query
-from models.request import Medication, Frequency, Setting, Appointment, EmergencyContact, Notification, EmergencyRequest, MedicationEmail
-from firebase_admin import credentials, firestore
-from pydantic import BaseModel
-from typing import List
-
-from utility import send_sms, send_email
-
-
-# Get Firestore database reference
-current_dir = os.path.dirname(os.path.abspath(__file__))
-key_path = os.path.join(current_dir, "firebaseServiceAccountKey.json")
-
-if not firebase_admin._apps:
-    cred = credentials.Certificate(key_path)
-    firebase_admin.initialize_app(cred)
-
-try:
-    db = firestore.client()
-except Exception as e:
-    print(f"Firestore client initialization failed: {e}")
     
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The storage engine comes up in the background (Firebase credentials and the Firestore
+    # channel; nothing of Firebase with STORAGE_BACKEND=sqlite); /ready reports when
+    get_repository().start()
+    user_directory.start()
+    outbox.start()
+    email_digest.start()
+    stock_forecaster.start(get_repository, user_directory.users)
+    notification_compactor.start(get_repository)
+    change_feed.start()
+    yield
+    change_feed.stop()
+    notification_compactor.stop()
+    stock_forecaster.stop()
+    email_digest.stop()
+    outbox.stop()
+    user_directory.stop()
+
+app = FastAPI(lifespan=lifespan)
+# Routes label their requests with the path template and time the endpoint apart from the framework
+app.router.route_class = TimedRoute
+# Added first so metrics, the outermost middleware, also count the requests it sheds
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, server_timing=SERVER_TIMING)
+
+# Registered ahead of the routers below, or the root-mounted /schedule/{user_id} would take it
+@app.get("/schedule/stats")
+def get_schedule_stats():
+    return {"code": 0, "data": schedule_index.stats()}
+
+# The AsyncClient handlers are always served under /async so both modes can be load-tested
+# side by side; FIRESTORE_ASYNC=1 also mounts them at the root, ahead of the threadpool handlers
+app.include_router(async_router.router, prefix="/async")
+if os.getenv("FIRESTORE_ASYNC") == "1":
+    app.include_router(async_router.router)
+
+def list_response(request: Request, collection: str, user_id: str, query: ListQuery):
+    with http_errors():
+        if query.format == "ndjson":
+            return stream_result(get_repository().stream_page(collection, user_id, **query.page()))
+        return list_result(request, get_repository().list_page(collection, user_id, **query.page()), collection)
 
 @app.get("/")
-def root():
-    users = services.firebase.get_firebase_users()
-    return {"users": users}
-
-@app.get("/medication/{user_id}")
-def get_medication_list(user_id: str):
+def root(page_token: Optional[str] = None, limit: int = Query(100, gt=0, le=1000)):
     try:
-        medications_ref = db.collection("medications").where("user_id", "==", user_id).stream()
-        
-        medications = [doc.to_dict() for doc in medications_ref]
-        if not medications:
-            return {"code": 0, "message": "No medications found", "data": []}
-
-        return {"code": 0, "data": medications}
-
+        users, next_page_token = user_directory.page(page_token, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return {"users": users, "next_page_token": next_page_token}
 
-@app.put("/medication/add")
-def add_medication(medication: Medication):
+@app.get("/users/lookup")
+def lookup_user(uid: Optional[str] = None, email: Optional[str] = None):
+    if not uid and not email:
+        raise HTTPException(status_code=400, detail="uid or email is required")
     try:
-        medication_data = medication.model_dump()
-        doc_ref = db.collection("medications").add(medication_data)
-
-        return {"code": 0, "document_id": doc_ref[1].id}    
+        user = user_directory.get(uid) if uid else user_directory.find_by_email(email)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-@app.put("/medication/update")
-def update_medication(medication: Medication):
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return {"code": 0, "data": user}
+
+@app.get("/users/stats")
+def get_user_directory_stats():
+    return {"code": 0, "data": user_directory.stats()}
+
+@app.get("/live")
+def get_liveness():
+    # Touches neither Auth nor Firestore, so probes stay cheap while either is slow
+    return {"code": 0, "status": "ok"}
+
+@app.get("/ready")
+def get_readiness():
+    status = get_repository().readiness()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content={"code": 1, "message": "Starting up", "data": status})
+    return {"code": 0, "data": status}
+
+@app.get("/metrics")
+def get_metrics():
+    content, media_type = exposition()
+    return Response(content=content, media_type=media_type)
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    return {"code": 0, "data": {**list_cache.stats(), "coalescing": list_reads.stats()}}
+
+@app.get("/sync/{user_id}")
+async def get_sync_snapshot(request: Request, user_id: str, since: Optional[datetime] = None):
+    # All six collections are read concurrently, so this costs about as much as the slowest one
+    snapshot = await async_router.read_snapshot(user_id, since)
+    if any(result["code"] != 0 for result in snapshot.values()):
+        return {"code": 1, "message": "Some collections failed to load", "data": snapshot}
+
+    return encoded_response(request, {"code": 0, "data": snapshot})
+
+@app.put("/image")
+async def upload_image(request: Request):
+    if int(request.headers.get("content-length") or 0) > MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail="Image too large")
+    data = await request.body()
+    if len(data) > MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail="Image too large")
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty image")
     try:
-        medications_ref = db.collection("medications")
-        query = (
-            medications_ref
-            .where("user_id", "==", medication.user_id)
-            .where("id", "==", medication.id)
-            .limit(1)
-            .stream()
-        )
-
-        medication_doc = next(query, None)
-
-        if medication_doc:
-            # Update the document
-            medication_doc.reference.update(medication.model_dump())
-            return {"code": 0, "message": "Medication updated successfully!"}
-        else:
-            # Add new medication if not found
-            medications_ref.add(medication.model_dump())
-            return {"code": 1, "message": "Medication not found, so it was added."}
-
+        # Hashing, thumbnails and the upload run off the event loop
+        image = await asyncio.to_thread(store_image, data)
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return {"code": 0, "image": image}
 
-
-@app.put("/medication/update/list")
-def update_medication(medications: List[Medication], user_id: str):
+@app.get("/image/{digest}")
+def get_image(request: Request, digest: str, size: Optional[int] = None):
     try:
-        medications_ref = db.collection("medications")
-        for medication in medications:
-            query = (
-                medications_ref
-                .where("user_id", "==", user_id)
-                .where("id", "==", medication.id)
-                .limit(1)
-                .stream()
-            )
-
-            medication_doc = next(query, None)
-
-            if medication_doc:
-                # Update the document
-                medication_doc.reference.update(medication.model_dump())
-            else:
-                # Add new medication if not found
-                medications_ref.add(medication.model_dump())
-
-        return {"code": 0, "message": "Medications updated successfully!"}
-
+        response = image_response(request, digest, size)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-    
-@app.delete("/medication/{user_id}/{medication_id}")
-def delete_medication(user_id: str, medication_id: int):
+    if response is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return response
+
+@app.get("/feed/stats")
+def get_feed_stats():
+    return {"code": 0, "data": change_feed.stats()}
+
+@app.get("/feed/{user_id}")
+async def stream_changes(request: Request, user_id: str, since: Optional[datetime] = None):
+    # EventSource sends the id of the last event it saw when it reconnects
+    last_event_id = request.headers.get("last-event-id")
+    if since is None and last_event_id:
+        try:
+            since = datetime.fromisoformat(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    return StreamingResponse(
+        change_feed.sse(user_id, since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/feed/{user_id}/ws")
+async def websocket_changes(websocket: WebSocket, user_id: str, since: Optional[datetime] = None):
+    await websocket.accept()
     try:
-        # Query Firestore to find the correct document
-        medications_ref = db.collection("medications")
-        query = medications_ref.where("user_id", "==", user_id).where("id", "==", medication_id).limit(1).stream()
+        async with aclosing(change_feed.subscribe(user_id, since)) as events:
+            async for event in events:
+                await websocket.send_text(render(event, JSON).decode())
+    except WebSocketDisconnect:
+        pass
 
-        medication_doc = next(query, None)
-        if not medication_doc:
-            raise HTTPException(status_code=404, detail="Medication not found")
+@app.get("/medication/{user_id}")
+def get_medication_list(request: Request, user_id: str, query: Annotated[ListQuery, Query()]):
+    return list_response(request, "medications", user_id, query)
 
-        # Delete the document
-        medication_doc.reference.delete()
+@app.put("/medication/add")
+def add_medication(medication: Medication):
+    with http_errors(bad_request=False):
+        return added_result(get_repository().upsert("medications", medication.model_dump()))
 
-        return {"code": 0, "message": "Medication deleted successfully!"}
+@app.put("/medication/update")
+def update_medication(medication: Medication):
+    with http_errors(bad_request=False):
+        return updated_result("Medication", get_repository().upsert("medications", medication.model_dump()))
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    
 
-@app.get("/medication/frequency/{user_id}")
-def get_frequency_list(user_id: str):
-    try:
-        frequencies_ref = db.collection("frequencies").where("user_id", "==", user_id).stream()
-        
-        frequencies = [doc.to_dict() for doc in frequencies_ref]
-        if not frequencies:
-            return {"code": 0, "message": "No frequencies found", "data": []}
+@app.put("/medication/update/list", openapi_extra=list_body_schema(Medication))
+def update_medication(medications: Annotated[List[Medication], Depends(list_body(Medication))], user_id: str):
+    with http_errors(bad_request=False):
+        return bulk_result(get_repository().bulk_upsert("medications", user_id, medications), "medications")
 
-        return {"code": 0, "data": frequencies}
+    
+@app.delete("/medication/{user_id}/{medication_id}")
+def delete_medication(user_id: str, medication_id: int):
+    with http_errors(bad_request=False):
+        return deleted_result(get_repository().delete("medications", user_id, medication_id), "Medication")
+    
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@app.get("/medication/frequency/{user_id}")
+def get_frequency_list(request: Request, user_id: str, query: Annotated[ListQuery, Query()]):
+    return list_response(request, "frequencies", user_id, query)
 
 @app.put("/medication/frequency/add")
 def add_frequency(frequency: Frequency):
-    try:
-        frequency_data = frequency.model_dump()
-        doc_ref = db.collection("frequencies").add(frequency_data)
-
-        return {"code": 0, "document_id": doc_ref[1].id}    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    with http_errors(bad_request=False):
+        return added_result(get_repository().upsert("frequencies", frequency.model_dump()))
 
 @app.put("/medication/frequency/update")
 def update_medication_frequency(frequency: Frequency):
-    try:
-        frequencies_ref = db.collection("frequencies")
-        query = (
-            frequencies_ref
-            .where("user_id", "==", frequency.user_id)
-            .where("id", "==", frequency.id)
-            .limit(1)
-            .stream()
-        )
-
-        frequency_doc = next(query, None)
-
-        if frequency_doc:
-            # Update the existing document
-            frequency_doc.reference.update(frequency.model_dump())
-            return {"code": 0, "message": "Frequency updated successfully!"}
-        else:
-            # Add new frequency if not found
-            frequencies_ref.add(frequency.model_dump())
-            return {"code": 1, "message": "Frequency not found, so it was added."}
+    with http_errors(bad_request=False):
+        return updated_result("Frequency", get_repository().upsert("frequencies", frequency.model_dump()))
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
 
-
-@app.put("/medication/frequency/update/list")
-def update_medication_frequency_list(frequencies: List[Frequency], user_id: str):
-    try:
-        frequencies_ref = db.collection("frequencies")
-        for frequency in frequencies:
-            query = (
-                frequencies_ref
-                .where("user_id", "==", user_id)
-                .where("id", "==", frequency.id)
-                .limit(1)
-                .stream()
-            )
-
-            frequency_doc = next(query, None)
-
-            if frequency_doc:
-                # Update the existing document
-                frequency_doc.reference.update(frequency.model_dump())
-            else:
-                # Add new frequency if not found
-                frequencies_ref.add(frequency.model_dump())
-
-        return {"code": 0, "message": "Frequencies updated successfully!"}
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@app.put("/medication/frequency/update/list", openapi_extra=list_body_schema(Frequency))
+def update_medication_frequency_list(frequencies: Annotated[List[Frequency], Depends(list_body(Frequency))], user_id: str):
+    with http_errors(bad_request=False):
+        return bulk_result(get_repository().bulk_upsert("frequencies", user_id, frequencies), "frequencies")
 
 
 
 @app.delete("/medication/frequency/{user_id}/{frequency_id}")
 def delete_frequency(user_id: str, frequency_id: int):
-    try:
-        # Query Firestore to find the correct document
-        frequencies_ref = db.collection("frequencies")
-        query = frequencies_ref.where("user_id", "==", user_id).where("id", "==", frequency_id).limit(1).stream()
-
-        frequency_doc = next(query, None)
-        if not frequency_doc:
-            raise HTTPException(status_code=404, detail="frequency not found")
-
-        # Delete the document
-        frequency_doc.reference.delete()
-
-        return {"code": 0, "message": "frequency deleted successfully!"}
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))    
+    with http_errors(bad_request=False):
+        return deleted_result(get_repository().delete("frequencies", user_id, frequency_id), "frequency")
     
 
-@app.get("/appointment/{user_id}")
-def get_appointment_list(user_id: str):
-    try:
-        appointments_ref = db.collection("appointments").where("user_id", "==", user_id).stream()
-        
-        appointments = [doc.to_dict() for doc in appointments_ref]
-        if not appointments:
-            return {"code": 0, "message": "No appointments found", "data": []}
+@app.get("/schedule/{user_id}")
+def get_schedule(request: Request, user_id: str, start: Annotated[Optional[datetime], Query(alias="from")] = None,
+                 end: Annotated[Optional[datetime], Query(alias="to")] = None):
+    with http_errors():
+        return data_result(request, schedule_index.query(get_repository(), user_id, *schedule_window(start, end)))
 
-        return {"code": 0, "data": appointments}
+@app.get("/schedule/{user_id}/next")
+def get_next_doses(request: Request, user_id: str, start: Annotated[Optional[datetime], Query(alias="from")] = None):
+    with http_errors():
+        return data_result(request, schedule_index.query(get_repository(), user_id, start or datetime.now(), first_only=True))
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@app.get("/appointment/{user_id}")
+def get_appointment_list(request: Request, user_id: str, query: Annotated[ListQuery, Query()]):
+    return list_response(request, "appointments", user_id, query)
 
 @app.post("/appointment")
 def add_appointment(appointment: Appointment):
-    try:
-        appointment_data = appointment.model_dump()
-        doc_ref = db.collection("appointments").add(appointment_data)
-
-        return {"code": 0, "document_id": doc_ref[1].id}    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    with http_errors(bad_request=False):
+        return added_result(get_repository().upsert("appointments", appointment.model_dump()))
 
 @app.put("/appointment")
 def update_appointment(appointment: Appointment):
-    try:
-        appointments_ref = db.collection("appointments")
-        query = (
-            appointments_ref
-            .where("user_id", "==", appointment.user_id)
-            .where("id", "==", appointment.id)
-            .limit(1)
-            .stream()
-        )
-
-        appointment_doc = next(query, None)
-
-        if appointment_doc:
-            # Update the existing appointment
-            appointment_doc.reference.update(appointment.model_dump())
-            return {"code": 0, "message": "Appointment updated successfully!"}
-        else:
-            # Add new appointment if not found
-            appointments_ref.add(appointment.model_dump())
-            return {"code": 1, "message": "Appointment not found, so it was added."}
+    with http_errors(bad_request=False):
+        return updated_result("Appointment", get_repository().upsert("appointments", appointment.model_dump()))
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
 
-
-@app.put("/appointment/list")
-def update_appointment_list(appointments: List[Appointment], user_id: str):
-    try:
-        appointments_ref = db.collection("appointments")
-        for appointment in appointments:
-            query = (
-                appointments_ref
-                .where("user_id", "==", user_id)
-                .where("id", "==", appointment.id)
-                .limit(1)
-                .stream()
-            )
-
-            appointment_doc = next(query, None)
-
-            if appointment_doc:
-                # Update the existing appointment
-                appointment_doc.reference.update(appointment.model_dump())
-            else:
-                # Add new appointment if not found
-                appointments_ref.add(appointment.model_dump())
-
-        return {"code": 0, "message": "Appointments updated successfully!"}
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@app.put("/appointment/list", openapi_extra=list_body_schema(Appointment))
+def update_appointment_list(appointments: Annotated[List[Appointment], Depends(list_body(Appointment))], user_id: str):
+    with http_errors(bad_request=False):
+        return bulk_result(get_repository().bulk_upsert("appointments", user_id, appointments), "appointments")
 
 
 
 @app.delete("/appointment/{user_id}/{appointment_id}")
 def delete_appointment(user_id: str, appointment_id: int):
-    try:
-        # Query Firestore to find the correct document
-        appointments_ref = db.collection("appointments")
-        query = appointments_ref.where("user_id", "==", user_id).where("id", "==", appointment_id).limit(1).stream()
-
-        appointment_doc = next(query, None)
-        if not appointment_doc:
-            raise HTTPException(status_code=404, detail="appointment not found")
-
-        # Delete the document
-        appointment_doc.reference.delete()
-
-        return {"code": 0, "message": "appointment deleted successfully!"}
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))    
+    with http_errors(bad_request=False):
+        return deleted_result(get_repository().delete("appointments", user_id, appointment_id), "appointment")
 
 
 @app.get("/user/setting/{user_id}")
-def get_setting_list(user_id: str):
-    try:
-        settings_ref = db.collection("settings").where("user_id", "==", user_id).stream()
-        
-        settings = [doc.to_dict() for doc in settings_ref]
-        if not settings:
-            return {"code": 0, "message": "No settings found", "data": []}
-
-        return {"code": 0, "data": settings}
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+def get_setting_list(request: Request, user_id: str, query: Annotated[ListQuery, Query()]):
+    return list_response(request, "settings", user_id, query)
 
 @app.put("/user/setting")
 def update_setting(setting: Setting):
-    try:
-        settings_ref = db.collection("settings")
-
-        # Query to find the document
-        query = (
-            settings_ref
-            .where("user_id", "==", setting.user_id)
-            .limit(1)
-            .stream()
-        )
-
-        setting_doc = next(query, None)
-
-        if setting_doc:
-            # Update the existing setting
-            setting_doc.reference.update(setting.model_dump())
-            return {"code": 0, "message": "Setting updated successfully!"}
-        else:
-            # Add new setting if not found
-            _, doc_ref = settings_ref.add(setting.model_dump())
-            return {"code": 1, "message": "Setting not found, so it was added.", "document_id": doc_ref.id}
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    with http_errors(bad_request=False):
+        # Settings are one document per user, keyed by the user id
+        return updated_result("Setting", get_repository().upsert("settings", setting.model_dump()), with_id=True)
     
 
 @app.get("/emergency/contact/{user_id}")
-def get_emergency_list(user_id: str):
-    try:
-        emergencies_ref = db.collection("emergencies").where("user_id", "==", user_id).stream()
-        emergencies = [doc.to_dict() for doc in emergencies_ref]
-        if not emergencies:
-            return {"code": 0, "message": "No emergencies found", "data": []}
-
-        return {"code": 0, "data": emergencies}
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+def get_emergency_list(request: Request, user_id: str, query: Annotated[ListQuery, Query()]):
+    return list_response(request, "emergencies", user_id, query)
     
 @app.put("/emergency/contact/update")
 def update_emergency(emergency: EmergencyContact):
-    try:
-        emergencies_ref = db.collection("emergencies")
-        
-        # Check if the emergency contact exists using user_id and id
-        query = (
-            emergencies_ref
-            .where("user_id", "==", emergency.user_id)
-            .where("id", "==", emergency.id)
-            .limit(1)
-            .stream()
-        )
-
-        emergency_doc = next(query, None)
-        emergency_data = emergency.model_dump()
-
-        if emergency_doc:
-            # Update existing emergency contact
-            emergency_doc.reference.update(emergency_data)
-            return {"code": 0, "message": "Emergency contact updated successfully!"}
-        else:
-            # Add new emergency contact if not found
-            doc_ref = emergencies_ref.add(emergency_data)
-            return {"code": 1, "message": "Emergency contact not found, so it was added.", "document_id": doc_ref[1].id}
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
+    with http_errors(bad_request=False):
+        return updated_result("Emergency contact", get_repository().upsert("emergencies", emergency.model_dump()), with_id=True)
 
-@app.put("/emergency/contact/update/list")
-def update_emergency_list(emergencies: List[EmergencyContact], user_id: str):
-    try:
-        emergencies_ref = db.collection("emergencies")
-        for emergency in emergencies:
-            # Check if the emergency contact exists using user_id and id
-            query = (
-                emergencies_ref
-                .where("user_id", "==", user_id)
-                .where("id", "==", emergency.id)
-                .limit(1)
-                .stream()
-            )
-
-            emergency_doc = next(query, None)
-            emergency_data = emergency.model_dump()
-
-            if emergency_doc:
-                # Update existing emergency contact
-                emergency_doc.reference.update(emergency_data)
-            else:
-                # Add new emergency contact if not found
-                emergencies_ref.add(emergency_data)
-
-        return {"code": 0, "message": "Emergency contacts updated successfully!"}
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
 
-class EmergencyDeleteRequest(BaseModel):
-    contactList: str
+@app.put("/emergency/contact/update/list", openapi_extra=list_body_schema(EmergencyContact))
+def update_emergency_list(emergencies: Annotated[List[EmergencyContact], Depends(list_body(EmergencyContact))], user_id: str):
+    with http_errors(bad_request=False):
+        return bulk_result(get_repository().bulk_upsert("emergencies", user_id, emergencies), "emergency contacts")
 
 @app.delete("/emergency/contact/{user_id}")
 def delete_emergency(user_id: str, request: EmergencyDeleteRequest):
-    try:
-        # Convert the contactList string to a list of IDs
-        emergency_ids = request.contactList.split(",")
-        emergencies_ref = db.collection("emergencies")
-        deleted_count = 0
-        for emergency_id in emergency_ids:
-            emergency_id = int(emergency_id)
-            query = (
-                emergencies_ref
-                .where("user_id", "==", user_id)
-                .where("id", "==", emergency_id)
-                .limit(1)
-                .stream()
-            )
-            emergency_doc = next(query, None)
-            if emergency_doc:
-                emergency_doc.reference.delete()
-                deleted_count += 1
-
-        if deleted_count == 0:
-            raise HTTPException(status_code=404, detail="No matching emergencies found to delete.")
-
-        return {"code": 0, "message": f"{deleted_count} emergencies deleted successfully!"}
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    with http_errors(bad_request=False):
+        return bulk_deleted_result(get_repository().bulk_delete("emergencies", user_id, emergency_ids(request)), "emergencies")
     
 @app.get("/notification/{user_id}")
-def get_notification_list(user_id: str):
-    try:
-        notifications_ref = db.collection("notifications").where("user_id", "==", user_id).stream()
-        notifications = [doc.to_dict() for doc in notifications_ref]
-        if not notifications:
-            return {"code": 0, "message": "No notifications found", "data": []}
+def get_notification_list(request: Request, user_id: str, query: Annotated[ListQuery, Query()]):
+    return list_response(request, "notifications", user_id, query)
 
-        return {"code": 0, "data": notifications}
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@app.get("/notification/{user_id}/summary")
+def get_notification_summary(request: Request, user_id: str):
+    with http_errors(bad_request=False):
+        return data_result(request, notification_summary(get_repository(), user_id))
     
 @app.put("/notification/update")
 def update_notification(notification: Notification):
-    try:
-        notification_data = notification.model_dump()
-        doc_ref = db.collection("notifications").add(notification_data)
-
-        return {"code": 0, "document_id": doc_ref[1].id}    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    with http_errors(bad_request=False):
+        return added_result(get_repository().upsert("notifications", notification.model_dump()))
     
-@app.put("/notification/update/list")
-def update_notification_list(notifications: List[Notification], user_id: str):
-    try:
-        notifications_ref = db.collection("notifications")
-        for notification in notifications:
-            notification_data = notification.model_dump()
-            doc_ref = notifications_ref.add(notification_data)
+@app.put("/notification/update/list", openapi_extra=list_body_schema(Notification))
+def update_notification_list(notifications: Annotated[List[Notification], Depends(list_body(Notification))], user_id: str):
+    with http_errors(bad_request=False):
+        return bulk_result(get_repository().bulk_upsert("notifications", user_id, notifications), "notifications")
 
-        return {"code": 0, "message": "Notifications updated successfully!"}
+@app.post("/notification/compact")
+def compact_notification_list(dry_run: bool = False):
+    try:
+        return {"code": 0, "data": notification_compactor.run(get_repository(), dry_run)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -523,18 +352,21 @@ def format_phone_number(phone: str) -> str:
 
 
 @app.post("/sendEmergency")
-def send_emergency(data: EmergencyRequest):
+async def send_emergency(data: EmergencyRequest):
+    # On threads reserved for emergencies, so bulk syncs holding the shared threadpool cannot delay it
+    return await run_emergency(dispatch_emergency, data)
+
+def dispatch_emergency(data: EmergencyRequest):
     try:
         if data.currentAddress[0]:
             message_body = f"A human is in danger. Location: {data.currentAddress}, Please help me." 
         else:
-            message_body = f"A human is in danger. Please help me." 
-        # Loop through each phone number and send SMS
-        responses = []
-        for phone in data.emergencyData:
-            formatted_phone = format_phone_number(phone)  # Convert to +E.164 format
-            response = send_sms(formatted_phone, message_body)
-            responses.append(response)
+            message_body = "A human is in danger. Please help me." 
+        formatted_phones = [format_phone_number(phone) for phone in data.emergencyData]  # Convert to +E.164 format
+
+        # Send to every contact at once over the pooled client, one result per recipient. Inline
+        # rather than through the outbox, so no queued mail can hold up an alert.
+        responses = send_sms_many(formatted_phones, message_body)
         # Check if all messages were sent successfully
         failed_messages = [res for res in responses if res["code"] != 0]
 
@@ -542,19 +374,88 @@ def send_emergency(data: EmergencyRequest):
             return {
                 "code": 1,
                 "message": len(failed_messages),
-                "details": failed_messages
+                "details": failed_messages,
+                "results": responses,
+                "queued": queue_emergency_retries(failed_messages, message_body),
             }
-        return {"code": 0, "message": len(responses)}
+        return {"code": 0, "message": len(responses), "results": responses}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+def queue_emergency_retries(failed_messages: List[dict], message_body: str) -> List[int]:
+    # Contacts not reached inline are retried by the outbox with backoff. A send that timed out
+    # may still land, so such a contact can get the alert twice, which beats not at all.
+    queued = []
+    for result in failed_messages:
+        try:
+            result["queued"] = outbox.enqueue("sms", {"to": result["to"], "body": message_body}, PRIORITY_EMERGENCY)
+            queued.append(result["queued"])
+        except Exception as e:
+            print(f"Outbox unavailable, emergency SMS to {result['to']} is not retried: {e}")
+    return queued
+    
 @app.post("/medication/sendEmail")
 def send_medication_email(body: MedicationEmail):
+    # The recipient is the user the alert belongs to
+    retry_after = email_rate_limit.acquire(body.to_email.lower())
+    if retry_after:
+        raise HTTPException(status_code=429, detail="Too many emails for this user", headers={"Retry-After": str(math.ceil(retry_after))})
+
+    if email_digest.enabled:
+        try:
+            email_digest.add(body.to_email, body.user_name, body.medication_name)
+            return {"code": 0, "message": "Alert added to the next digest"}
+        except Exception as e:
+            print(f"Email digest unavailable, queueing a single email: {e}")
+
     html_content = f"<div><p>Hi, <strong>{body.user_name}</strong></p><p>The stock of <strong>{body.medication_name}</strong> has reached its threshold.</p></div>"
+    try:
+        message_id = outbox.enqueue("email", {"to": body.to_email, "html_content": html_content})
+        return {"code": 0, "queued": message_id}
+    except Exception as e:
+        print(f"Outbox unavailable, sending email inline: {e}")
+
     ret = send_email(body.to_email, html_content)
     if ret:
         return {"code": 0}
     else:
         return {"code": -1}
-    
\ No newline at end of file
+
+
+@app.post("/forecast/run")
+def run_stock_forecast():
+    try:
+        users = {user.id: user for user in user_directory.users()}
+        return {"code": 0, "data": stock_forecaster.run(get_repository(), users)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/admission/stats")
+def get_admission_stats():
+    return {"code": 0, "data": admission_stats()}
+
+@app.get("/outbox/stats")
+def get_outbox_stats():
+    return {"code": 0, "data": outbox.stats()}
+
+
+@app.get("/outbox/dead")
+def get_outbox_dead_letters(limit: int = Query(100, le=1000)):
+    return {"code": 0, "data": outbox.dead_letters(limit)}
+
+
+@app.get("/outbox/{message_id}")
+def get_outbox_message(message_id: int):
+    state = outbox.status([message_id]).get(message_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Message not found")
+    return {"code": 0, "data": state}
+
+
+@app.post("/outbox/{message_id}/retry")
+def retry_outbox_message(message_id: int):
+    if not outbox.retry(message_id):
+        raise HTTPException(status_code=404, detail="Dead letter not found")
+    return {"code": 0, "message": "Message queued again"}
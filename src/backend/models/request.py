@@ -3,8 +3,9 @@
 #
 # Created by Morgan on 03/02/2025
 
-from pydantic import BaseModel
-from typing import List, Optional
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 
 class EmergencyRequest(BaseModel):
   emergencyData: List[str]
@@ -66,7 +67,21 @@ class EmergencyContact(BaseModel):
   image: str
   type: str
 
+class EmergencyDeleteRequest(BaseModel):
+  contactList: str
+
 class MedicationEmail(BaseModel):
   user_name: str
   to_email: str
   medication_name: str
+
+class ListQuery(BaseModel):
+  since: Optional[datetime] = None
+  limit: Optional[int] = Field(None, gt=0, le=1000)
+  cursor: Optional[str] = None
+  fields: Optional[str] = None
+  format: Optional[Literal["json", "ndjson"]] = None
+
+  def page(self) -> dict:
+    fields = [field.strip() for field in self.fields.split(",") if field.strip()] if self.fields else None
+    return {"since": self.since, "limit": self.limit, "cursor": self.cursor, "fields": fields}
@@ -0,0 +1,86 @@
+# Document Key Migration
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Rewrites auto-ID documents to the deterministic `{user_id}_{id}` keys used by the API.
+# Run once from the backend directory before deploying keyed writes:
+#
+#   python -m scripts.migrate_document_ids [--dry-run]
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.clients import get_db  # noqa: E402
+from services.documents import document_id, stamp  # noqa: E402
+
+KEYED_COLLECTIONS = ["medications", "frequencies", "appointments", "emergencies", "settings"]
+BATCH_LIMIT = 500
+
+
+def plan_collection(db, collection: str):
+    """Return the (old reference, new key, data) moves and duplicate references of a collection."""
+    moves, duplicates, claimed = [], [], set()
+    for doc in db.collection(collection).stream():
+        data = doc.to_dict()
+        if "user_id" not in data:
+            continue
+        key = document_id(data["user_id"], None if collection == "settings" else data.get("id"))
+        if doc.id == key:
+            claimed.add(key)
+        elif key in claimed:
+            duplicates.append(doc.reference)
+        else:
+            claimed.add(key)
+            moves.append((doc.reference, key, data))
+    return moves, duplicates
+
+
+def migrate_collection(db, collection: str, dry_run: bool = False):
+    moves, duplicates = plan_collection(db, collection)
+    collection_ref = db.collection(collection)
+
+    # A keyed document written after the deploy is newer than its auto-ID original, keep it
+    targets = [collection_ref.document(key) for _, key, _ in moves]
+    existing = set()
+    for start in range(0, len(targets), BATCH_LIMIT):
+        existing.update(snapshot.id for snapshot in db.get_all(targets[start:start + BATCH_LIMIT]) if snapshot.exists)
+
+    writes = []
+    for old_ref, key, data in moves:
+        if key not in existing:
+            # Stamped so the copy shows up in since-deltas and in listings ordered by updated_at
+            writes.append(("set", collection_ref.document(key), stamp(data)))
+        writes.append(("delete", old_ref, None))
+    writes.extend(("delete", ref, None) for ref in duplicates)
+
+    if not dry_run:
+        for start in range(0, len(writes), BATCH_LIMIT):
+            batch = db.batch()
+            for op, ref, data in writes[start:start + BATCH_LIMIT]:
+                if op == "set":
+                    batch.set(ref, data)
+                else:
+                    batch.delete(ref)
+            batch.commit()
+
+    return {"moved": len(moves) - len(existing), "superseded": len(existing), "duplicates": len(duplicates)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rewrite auto-ID documents to `{user_id}_{id}` keys.")
+    parser.add_argument("--dry-run", action="store_true", help="report the planned moves without writing")
+    parser.add_argument("--collection", action="append", choices=KEYED_COLLECTIONS, help="limit to a collection")
+    args = parser.parse_args()
+
+    db = get_db()
+
+    for collection in args.collection or KEYED_COLLECTIONS:
+        result = migrate_collection(db, collection, args.dry_run)
+        print(f"{collection}: {result['moved']} moved, {result['superseded']} superseded, {result['duplicates']} duplicates removed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Image Migration
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Moves inline base64 images of existing medications, appointments and contacts to the blob
+# store and leaves their `/image/{sha256}` URL in the document. Safe to re-run; writes through
+# the API offload new images on their own, so this is needed once for older documents:
+#
+#   python -m scripts.migrate_images [--dry-run]
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.images import IMAGE_COLLECTIONS, decode_inline_image, offload_refusal, store_image  # noqa: E402
+from services.repository import get_repository  # noqa: E402
+
+
+def migrate_collection(repository, collection: str, dry_run: bool = False):
+    report = {"offloaded": 0, "bytes": 0, "failed": 0}
+    for data in repository.scan(collection, ["user_id", "id", "image"]):
+        image = decode_inline_image(data.get("image"))
+        if image is None:
+            continue
+        try:
+            if not dry_run:
+                # A merge of the one field; updated_at moves, so clients pick up the new URL on their next sync
+                repository.upsert(collection, {"user_id": data["user_id"], "id": data["id"], "image": store_image(image)})
+            report["offloaded"] += 1
+            report["bytes"] += len(data["image"])
+        except Exception as e:
+            print(f"{collection} {data.get('user_id')}/{data.get('id')}: {e}")
+            report["failed"] += 1
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move inline images to the blob store.")
+    parser.add_argument("--dry-run", action="store_true", help="report the images that would move without writing")
+    parser.add_argument("--collection", action="append", choices=sorted(IMAGE_COLLECTIONS), help="limit to a collection")
+    args = parser.parse_args()
+
+    refusal = offload_refusal()
+    if refusal is not None:
+        sys.exit(f"Images cannot be offloaded: {refusal}")
+
+    repository = get_repository()
+    for collection in args.collection or sorted(IMAGE_COLLECTIONS):
+        result = migrate_collection(repository, collection, args.dry_run)
+        print(f"{collection}: {result['offloaded']} images offloaded ({result['bytes'] / 1024:.0f} KiB out of documents), {result['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# Admission Control
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Keeps bulk syncs from crowding out life-safety traffic. Bulk writes and list reads are admitted
+# through lanes with bounded concurrency and queues, and shed with a fast 503 once full;
+# emergency dispatch runs on threads of its own; replenishment emails are rate limited per user.
+import asyncio
+import functools
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import anyio
+from starlette.responses import JSONResponse
+
+from services.metrics import SHED_REQUESTS
+
+ADMISSION_ENABLED = os.getenv("ADMISSION", "1") != "0"
+EMERGENCY_THREADS = int(os.getenv("ADMISSION_EMERGENCY_THREADS", "8"))
+
+
+class Overloaded(Exception):
+    pass
+
+
+class Lane:
+    """At most `concurrency` requests running and `max_queue` waiting, each for up to `queue_timeout` seconds.
+
+    Lives on the event loop, so it needs no lock; a freed slot is handed straight to the
+    oldest waiter, which keeps the queue FIFO.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.shed = 0
+
+    def _reject(self, reason: str):
+        self.shed += 1
+        SHED_REQUESTS.labels(self.name, reason).inc()
+        raise Overloaded(f"{self.name} lane {reason}")
+
+    async def acquire(self):
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot arrived as the wait ended; pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("queue_timeout")
+            raise
+        self.admitted += 1
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+
+def _lane(name: str, concurrency: str, max_queue: str) -> Lane:
+    prefix = f"ADMISSION_{name.upper()}"
+    return Lane(
+        name,
+        concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", concurrency)),
+        max_queue=int(os.getenv(f"{prefix}_QUEUE", max_queue)),
+        queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2")),
+    )
+
+
+# Below the threadpool's 40 threads together, so single-item writes and lookups always find one
+lanes = {
+    "bulk": _lane("bulk", "8", "32"),
+    "list": _lane("list", "24", "256"),
+}
+
+_COLLECTIONS = r"(/async)?/(medication|medication/frequency|appointment|user/setting|emergency/contact|notification)"
+# (lane, methods, path) in match order; paths are full matches
+LANE_ROUTES: List[Tuple[str, set, re.Pattern]] = [
+    ("bulk", {"PUT"}, re.compile(r"(/async)?/.+/list")),
+    ("bulk", {"POST"}, re.compile(r"/forecast/run|/notification/compact")),
+    ("list", {"GET"}, re.compile(_COLLECTIONS + r"/[^/]+|/sync/[^/]+")),
+]
+
+
+def lane_for(method: str, path: str) -> Optional[Lane]:
+    for name, methods, pattern in LANE_ROUTES:
+        if method in methods and pattern.fullmatch(path):
+            return lanes[name]
+    return None
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting bulk and list requests through their lanes, or shedding them with a 503."""
+
+    def __init__(self, app, retry_after: int = 1):
+        self.app = app
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        lane = lane_for(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if lane is None:
+            return await self.app(scope, receive, send)
+
+        try:
+            await lane.acquire()
+        except Overloaded as e:
+            response = JSONResponse({"detail": f"Server busy: {e}"}, status_code=503, headers={"Retry-After": str(self.retry_after)})
+            return await response(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release()
+
+
+_emergency_limiter: Optional[anyio.CapacityLimiter] = None
+
+
+def _emergency_threads() -> anyio.CapacityLimiter:
+    # Created on the event loop at first use; anyio limiters cannot be made outside one
+    global _emergency_limiter
+    if _emergency_limiter is None:
+        _emergency_limiter = anyio.CapacityLimiter(EMERGENCY_THREADS)
+    return _emergency_limiter
+
+
+async def run_emergency(function: Callable, *args) -> Any:
+    """Run `function` on threads reserved for emergency dispatch, outside the shared threadpool."""
+    return await anyio.to_thread.run_sync(functools.partial(function, *args), limiter=_emergency_threads())
+
+
+class RateLimiter:
+    """Token bucket per key: `burst` calls at once, refilled at `rate` calls per second."""
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, key: str) -> float:
+        """Take a token for `key`: 0 if allowed, else the seconds until the next token."""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                self.limited += 1
+                return (1 - tokens) / self.rate
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return 0.0
+
+    def _prune(self, now: float):
+        # Buckets that have refilled are the same as absent ones
+        full = [key for key, (tokens, updated_at) in self._buckets.items() if tokens + (now - updated_at) * self.rate >= self.burst]
+        for key in full:
+            del self._buckets[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"rate_per_hour": self.rate * 3600, "burst": self.burst, "keys": len(self._buckets), "limited": self.limited}
+
+
+email_rate_limit = RateLimiter(
+    rate=float(os.getenv("EMAIL_RATE_LIMIT", "60")) / 3600,
+    burst=int(os.getenv("EMAIL_RATE_BURST", "10")),
+)
+
+
+def admission_stats() -> Dict[str, Any]:
+    return {
+        "enabled": ADMISSION_ENABLED,
+        "lanes": {name: lane.stats() for name, lane in lanes.items()},
+        "emergency": {"threads": EMERGENCY_THREADS, "busy": _emergency_limiter.borrowed_tokens if _emergency_limiter else 0},
+        "email_rate_limit": email_rate_limit.stats(),
+    }
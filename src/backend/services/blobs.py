@@ -0,0 +1,141 @@
+# Blob Store
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Write-once storage of binary objects under content-derived keys. IMAGE_STORE picks a local
+# directory (default, works offline, seen by this instance only) or a Firebase Storage bucket.
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class BlobStore(ABC):
+    """Storage of immutable blobs; a key always names the same bytes, so writes never overwrite."""
+
+    # Whether every instance of the app sees the same blobs, and they outlive a redeploy
+    shared = False
+
+    @abstractmethod
+    def put(self, key: str, data: bytes, content_type: Optional[str] = None):
+        ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def read(self, key: str) -> Optional[bytes]:
+        ...
+
+    def path(self, key: str) -> Optional[str]:
+        """A local file holding the blob, when the store keeps one; it is then served from disk."""
+        return None
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs as files under `root`, fanned out by the first two characters of the key."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def put(self, key, data, content_type=None):
+        target = self._file(key)
+        if os.path.exists(target):
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Written aside and renamed, so a concurrent reader sees the whole blob or none of it
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(target))
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(data)
+            os.replace(temporary, target)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def exists(self, key):
+        return os.path.exists(self._file(key))
+
+    def read(self, key):
+        try:
+            with open(self._file(key), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def path(self, key):
+        target = self._file(key)
+        return target if os.path.exists(target) else None
+
+
+class FirebaseBlobStore(BlobStore):
+    """Blobs as objects under `prefix` in a Firebase Storage (Cloud Storage) bucket."""
+
+    shared = True
+
+    def __init__(self, bucket_name: Optional[str], prefix: str = "blobs/"):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self._bucket = None
+
+    def _blob(self, key: str):
+        if self._bucket is None:
+            from firebase_admin import storage
+
+            from services.clients import firebase_app
+
+            self._bucket = storage.bucket(self.bucket_name, app=firebase_app())
+        return self._bucket.blob(self.prefix + key)
+
+    def put(self, key, data, content_type=None):
+        blob = self._blob(key)
+        blob.cache_control = "public, max-age=31536000, immutable"
+        # The precondition makes a concurrent upload of the same key a no-op instead of a rewrite
+        try:
+            blob.upload_from_string(data, content_type=content_type, if_generation_match=0)
+        except Exception as e:
+            if getattr(e, "code", None) != 412:
+                raise
+
+    def exists(self, key):
+        return self._blob(key).exists()
+
+    def read(self, key):
+        from google.api_core.exceptions import NotFound
+
+        try:
+            return self._blob(key).download_as_bytes()
+        except NotFound:
+            return None
+
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "blobs")
+
+_store: Optional[BlobStore] = None
+
+
+def _create() -> BlobStore:
+    backend = os.getenv("IMAGE_STORE", "local")
+    if backend == "local":
+        return LocalBlobStore(os.getenv("IMAGE_STORE_PATH", DEFAULT_PATH))
+    if backend == "firebase":
+        return FirebaseBlobStore(os.getenv("IMAGE_STORE_BUCKET"))
+    raise ValueError(f"Unknown IMAGE_STORE '{backend}'")
+
+
+def get_blob_store() -> BlobStore:
+    """The configured blob store, created on first use."""
+    global _store
+    if _store is None:
+        _store = _create()
+    return _store
+
+
+def set_blob_store(store: BlobStore):
+    global _store
+    _store = store
@@ -0,0 +1,181 @@
+# Bulk Write Engine
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+from typing import Any, Dict, Iterable, List
+
+from pydantic import BaseModel
+
+from services.documents import CREATED_AT_COLLECTIONS, document_ref, notify_write, stamp, tombstone, tombstone_ref
+
+BATCH_LIMIT = 500  # Firestore accepts at most 500 writes per WriteBatch
+
+
+def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def bulk_report(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {}
+    for item in items:
+        summary[item["status"]] = summary.get(item["status"], 0) + 1
+    summary["items"] = items
+    return summary
+
+
+def _fill_batch(batch, writes: List[tuple]):
+    for op, ref, data in writes:
+        if op == "set":
+            batch.set(ref, data, merge=True)
+        elif op == "add":
+            batch.set(ref, data)
+        else:
+            batch.delete(ref)
+    return batch
+
+
+def _batches(writes: List[List[tuple]], results: List[Dict[str, Any]]):
+    # writes and results are index aligned: each item owns a group of (op, ref, data) writes
+    # that always lands in the same batch as the rest of its group
+    ops, chunk = [], []
+    for group, result in zip(writes, results):
+        if ops and len(ops) + len(group) > BATCH_LIMIT:
+            yield ops, chunk
+            ops, chunk = [], []
+        ops.extend(group)
+        chunk.append(result)
+    if ops:
+        yield ops, chunk
+
+
+def _mark_failed(results: List[Dict[str, Any]], error: Exception):
+    print(f"Bulk commit failed: {error}")
+    for result in results:
+        result["status"] = "failed"
+        result["error"] = str(error)
+
+
+def _notify(writes: List[List[tuple]], collection: str):
+    for user_id in {data["user_id"] for group in writes for op, _, data in group if op != "delete" and "user_id" in data}:
+        notify_write(collection, user_id)
+
+
+def _commit(db, collection: str, writes: List[List[tuple]], results: List[Dict[str, Any]]):
+    for ops, chunk in _batches(writes, results):
+        try:
+            _fill_batch(db.batch(), ops).commit()
+        except Exception as e:
+            _mark_failed(chunk, e)
+    _notify(writes, collection)
+
+
+async def _commit_async(db, collection: str, writes: List[List[tuple]], results: List[Dict[str, Any]]):
+    for ops, chunk in _batches(writes, results):
+        try:
+            await _fill_batch(db.batch(), ops).commit()
+        except Exception as e:
+            _mark_failed(chunk, e)
+    _notify(writes, collection)
+
+
+def _keyed_refs(db, collection: str, user_id: str, ids: List[int]) -> Dict[int, Any]:
+    return {item_id: document_ref(db, collection, user_id, item_id) for item_id in dict.fromkeys(ids)}
+
+
+def _plan_upsert(collection: str, payload: Dict[int, Dict[str, Any]], refs: Dict[int, tuple]):
+    writes, results = [], []
+    for item_id, data in payload.items():
+        ref, exists = refs[item_id]
+        writes.append([("set", ref, stamp(data, created=not exists and collection in CREATED_AT_COLLECTIONS))])
+        results.append({"id": item_id, "status": "updated" if exists else "created"})
+    return writes, results
+
+
+def _plan_insert(db, collection: str, items: List[BaseModel]):
+    collection_ref = db.collection(collection)
+    writes, results = [], []
+    for item in items:
+        writes.append([("add", collection_ref.document(), stamp(item.model_dump(), collection in CREATED_AT_COLLECTIONS))])
+        results.append({"id": item.id, "status": "created"})
+    return writes, results
+
+
+def _plan_delete(db, collection: str, user_id: str, refs: Dict[int, tuple]):
+    writes, results = [], []
+    for item_id, (ref, exists) in refs.items():
+        if exists:
+            writes.append([
+                ("delete", ref, None),
+                ("add", tombstone_ref(db, collection, user_id, item_id), tombstone(collection, user_id, item_id)),
+            ])
+            results.append({"id": item_id, "status": "deleted"})
+    return writes, results
+
+
+def _not_found(refs: Dict[int, tuple]) -> List[Dict[str, Any]]:
+    return [{"id": item_id, "status": "not_found"} for item_id, (_, exists) in refs.items() if not exists]
+
+
+def prefetch_documents(db, collection: str, user_id: str, ids: List[int]) -> Dict[int, Any]:
+    """Map the given item ids of a user to their keyed document references, existing or not."""
+    refs = _keyed_refs(db, collection, user_id, ids)
+    existing: Dict[str, bool] = {}
+    for chunk in _chunks(list(refs.values()), BATCH_LIMIT):
+        # One BatchGetDocuments call per chunk; only the key field is transferred
+        for snapshot in db.get_all(chunk, field_paths=["id"]):
+            existing[snapshot.id] = snapshot.exists
+    return {item_id: (ref, existing.get(ref.id, False)) for item_id, ref in refs.items()}
+
+
+def bulk_upsert(db, collection: str, user_id: str, items: List[BaseModel]) -> Dict[str, Any]:
+    """Create or merge every item with one batched read and one commit per 500 writes."""
+    # The last occurrence of a repeated id wins, as it would have in a sequential sync
+    payload = {item.id: item.model_dump() for item in items}
+    writes, results = _plan_upsert(collection, payload, prefetch_documents(db, collection, user_id, list(payload)))
+    _commit(db, collection, writes, results)
+    return bulk_report(results)
+
+
+def bulk_insert(db, collection: str, items: List[BaseModel]) -> Dict[str, Any]:
+    """Add every item as a new document without looking up existing ones."""
+    writes, results = _plan_insert(db, collection, items)
+    _commit(db, collection, writes, results)
+    return bulk_report(results)
+
+
+def bulk_delete(db, collection: str, user_id: str, ids: List[int]) -> Dict[str, Any]:
+    """Delete the documents of a user matching the given item ids."""
+    refs = prefetch_documents(db, collection, user_id, ids)
+    writes, results = _plan_delete(db, collection, user_id, refs)
+    _commit(db, collection, writes, results)
+    return bulk_report(results + _not_found(refs))
+
+
+async def prefetch_documents_async(db, collection: str, user_id: str, ids: List[int]) -> Dict[int, Any]:
+    refs = _keyed_refs(db, collection, user_id, ids)
+    existing: Dict[str, bool] = {}
+    for chunk in _chunks(list(refs.values()), BATCH_LIMIT):
+        async for snapshot in db.get_all(chunk, field_paths=["id"]):
+            existing[snapshot.id] = snapshot.exists
+    return {item_id: (ref, existing.get(ref.id, False)) for item_id, ref in refs.items()}
+
+
+async def bulk_upsert_async(db, collection: str, user_id: str, items: List[BaseModel]) -> Dict[str, Any]:
+    payload = {item.id: item.model_dump() for item in items}
+    writes, results = _plan_upsert(collection, payload, await prefetch_documents_async(db, collection, user_id, list(payload)))
+    await _commit_async(db, collection, writes, results)
+    return bulk_report(results)
+
+
+async def bulk_insert_async(db, collection: str, items: List[BaseModel]) -> Dict[str, Any]:
+    writes, results = _plan_insert(db, collection, items)
+    await _commit_async(db, collection, writes, results)
+    return bulk_report(results)
+
+
+async def bulk_delete_async(db, collection: str, user_id: str, ids: List[int]) -> Dict[str, Any]:
+    refs = await prefetch_documents_async(db, collection, user_id, ids)
+    writes, results = _plan_delete(db, collection, user_id, refs)
+    await _commit_async(db, collection, writes, results)
+    return bulk_report(results + _not_found(refs))
@@ -0,0 +1,202 @@
+# List Cache
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+import os
+import pickle
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from services.documents import on_write
+
+CacheKey = Tuple[str, str]  # (collection, user_id)
+
+
+class CacheBackend(ABC):
+    """Storage behind the list cache; implement it to share entries across workers.
+
+    `get` must return a value the caller may modify without changing the stored entry.
+    """
+
+    @abstractmethod
+    def get(self, key: CacheKey) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: CacheKey, value: Any):
+        ...
+
+    @abstractmethod
+    def delete(self, key: CacheKey):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU bounded by entry count and payload bytes, with a TTL.
+
+    Entries are held pickled, so each `get` hands out a fresh copy and the byte bound is exact.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[CacheKey, tuple]" = OrderedDict()  # key -> (expires_at, size, pickled value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def _drop(self, key: CacheKey):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key: CacheKey) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            payload = entry[2]
+        return pickle.loads(payload)
+
+    def set(self, key: CacheKey, value: Any):
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, payload)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key: CacheKey):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class ListCache:
+    """Read-through cache of full list reads, invalidated by every write to the same user's collection."""
+
+    def __init__(self, backend: CacheBackend, collections):
+        self.backend = backend
+        self.collections = set(collections)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> [loads in flight, generation]; a write bumps the generation so a load that raced
+        # it never stores its stale result. Keys leave with their last load, so this holds only
+        # the keys being loaded right now.
+        self._loads: Dict[CacheKey, list] = {}
+
+    def invalidate(self, collection: str, user_id: str):
+        key = (collection, user_id)
+        with self._lock:
+            load = self._loads.get(key)
+            if load is not None:
+                load[1] += 1
+            self.backend.delete(key)
+
+    def _lookup(self, key: CacheKey):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is not None:
+                self.hits += 1
+                return value, None
+            self.misses += 1
+            load = self._loads.setdefault(key, [0, 0])
+            load[0] += 1
+            return None, load[1]
+
+    def _store(self, key: CacheKey, generation: int, value: Any):
+        # Called once per miss, also when the load failed (value None), to release the key
+        with self._lock:
+            load = self._loads[key]
+            current = load[1] == generation
+            load[0] -= 1
+            if load[0] == 0:
+                del self._loads[key]
+            # Under the lock, so an invalidation cannot fall between the check and the write
+            if value is not None and current:
+                self.backend.set(key, value)
+
+    def get_or_load(self, collection: str, user_id: str, loader: Callable[[], Any]) -> Any:
+        if collection not in self.collections:
+            return loader()
+        key = (collection, user_id)
+        value, generation = self._lookup(key)
+        if value is None:
+            try:
+                value = loader()
+            finally:
+                self._store(key, generation, value)
+        return value
+
+    async def get_or_load_async(self, collection: str, user_id: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        if collection not in self.collections:
+            return await loader()
+        key = (collection, user_id)
+        value, generation = self._lookup(key)
+        if value is None:
+            try:
+                value = await loader()
+            finally:
+                self._store(key, generation, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {"hits": self.hits, "misses": self.misses}
+        return {**counters, "collections": sorted(self.collections), **self.backend.stats()}
+
+
+list_cache = ListCache(
+    MemoryCache(
+        max_entries=int(os.getenv("LIST_CACHE_MAX_ENTRIES", "1024")),
+        max_bytes=int(os.getenv("LIST_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        ttl=float(os.getenv("LIST_CACHE_TTL", "300")),
+    ),
+    os.getenv("LIST_CACHE_COLLECTIONS", "medications,frequencies,settings,emergencies").split(","),
+)
+
+
+def set_cache_backend(backend: CacheBackend):
+    list_cache.backend = backend
+
+
+on_write(list_cache.invalidate)
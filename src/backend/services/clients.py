@@ -0,0 +1,101 @@
+# External Clients
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Firebase and Firestore clients created on first use or by the app's lifespan, never at import,
+# so a cold worker starts serving (and answering liveness) before credentials have resolved.
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from services.metrics import traced
+
+KEY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "firebaseServiceAccountKey.json")
+
+_lock = threading.Lock()
+_db = None
+_async_db = None
+_state: Dict[str, Any] = {"started_at": None, "ready_at": None, "prewarm": False, "prewarmed": False, "error": None}
+
+
+def firebase_app():
+    """The default Firebase app, initialized from the service-account key on first use."""
+    import firebase_admin
+    from firebase_admin import credentials
+
+    with _lock:
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app(credentials.Certificate(KEY_PATH))
+        return firebase_admin.get_app()
+
+
+def get_db():
+    """The Firestore client, created on first use and traced for the metrics."""
+    global _db
+    if _db is None:
+        firebase_app()
+        from firebase_admin import firestore
+
+        with _lock:
+            if _db is None:
+                _db = firestore.client()
+    return traced(_db)
+
+
+def get_async_db():
+    """The Firestore AsyncClient, created on first use so it binds to the serving event loop."""
+    global _async_db
+    if _async_db is None:
+        firebase_app()
+        from firebase_admin import firestore_async
+
+        _async_db = firestore_async.client()
+    return traced(_async_db)
+
+
+def prewarm(db):
+    # One small read opens the gRPC channel and fetches an access token before the first request
+    for _ in db.collection("settings").limit(1).stream():
+        pass
+
+
+def _initialize(prewarm_channel: bool):
+    # Credentials that are slow or briefly unavailable are retried instead of failing the worker
+    delay = 1.0
+    while True:
+        try:
+            db = get_db()
+            if prewarm_channel:
+                prewarm(db)
+                _state["prewarmed"] = True
+            _state["ready_at"] = time.time()
+            _state["error"] = None
+            return
+        except Exception as e:
+            print(f"Firestore client initialization failed, retrying in {delay:.0f}s: {e}")
+            _state["error"] = str(e)
+            time.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+
+def start(prewarm_channel: bool = False) -> threading.Thread:
+    """Create the clients in the background; `readiness()` reports when they are up."""
+    _state["started_at"] = time.time()
+    _state["prewarm"] = prewarm_channel
+    thread = threading.Thread(target=_initialize, args=(prewarm_channel,), name="clients-init", daemon=True)
+    thread.start()
+    return thread
+
+
+def readiness() -> Dict[str, Any]:
+    started_at: Optional[float] = _state["started_at"]
+    ready_at: Optional[float] = _state["ready_at"]
+    return {
+        "ready": _db is not None and (_state["prewarmed"] or not _state["prewarm"]),
+        "firestore": _db is not None,
+        "prewarmed": _state["prewarmed"],
+        "error": _state["error"],
+        "startup_seconds": ready_at - started_at if ready_at and started_at else None,
+    }
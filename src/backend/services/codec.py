@@ -0,0 +1,41 @@
+# Request Decoding
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Bulk bodies are parsed and validated in one pass by pydantic-core, straight from the request
+# bytes, instead of FastAPI decoding them with the json module and validating the objects after.
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Type
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    # Building an adapter compiles a validator, so each list type gets one for the process
+    return TypeAdapter(List[model])
+
+
+def list_body(model: Type[BaseModel]) -> Callable[[Request], Any]:
+    """A dependency reading the request body as a JSON array of `model`.
+
+    Invalid bodies get the same 422 as FastAPI's own body validation.
+    """
+    adapter = list_adapter(model)
+
+    async def parse(request: Request) -> List[BaseModel]:
+        try:
+            return adapter.validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)])
+
+    return parse
+
+
+def list_body_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """`openapi_extra` documenting a `list_body(model)` route's body, which FastAPI cannot see."""
+    schema = {"type": "array", "items": {"$ref": f"#/components/schemas/{model.__name__}"}}
+    return {"requestBody": {"required": True, "content": {"application/json": {"schema": schema}}}}
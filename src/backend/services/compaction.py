@@ -0,0 +1,193 @@
+# Notification Compaction
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Collapses notifications duplicated by the old add-on-every-sync writes onto their
+# `{user_id}_{id}` key and trims each user's notifications to a retention window and count cap.
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from services.bulk import BATCH_LIMIT
+from services.documents import document_id, notify_write, tombstone, tombstone_ref
+
+COLLECTION = "notifications"
+PAGE_SIZE = 1000
+_OLDEST = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def _created_at(data: Dict[str, Any]) -> Optional[datetime]:
+    # Documents written before created_at was kept count from their last write instead
+    return data.get("created_at") or data.get("updated_at")
+
+
+def _users(db) -> Iterator[Tuple[str, List[Any]]]:
+    """Yield each user's notifications in turn, reading the collection a page at a time."""
+    query = db.collection(COLLECTION).order_by("user_id").order_by("__name__").limit(PAGE_SIZE)
+    user_id, docs, position = None, [], None
+    while True:
+        page = list((query.start_after(position) if position else query).stream())
+        for doc in page:
+            data = doc.to_dict()
+            if data.get("user_id") != user_id:
+                if docs and user_id is not None:
+                    yield user_id, docs
+                user_id, docs = data.get("user_id"), []
+            docs.append(doc)
+        if len(page) < PAGE_SIZE:
+            break
+        position = {"user_id": user_id, "__name__": page[-1].id}
+    if docs and user_id is not None:
+        yield user_id, docs
+
+
+def _plan_user(db, user_id: str, docs: List[Any], cutoff: Optional[datetime], max_per_user: Optional[int], report: Dict[str, Any]):
+    collection_ref = db.collection(COLLECTION)
+    groups: Dict[int, List[Any]] = {}
+    for doc in docs:
+        data = doc.to_dict()
+        if data.get("id") is not None:
+            groups.setdefault(data["id"], []).append((doc, data))
+            report["scanned"] += 1
+
+    writes: List[List[tuple]] = []  # each group of writes commits in one batch
+    survivors: List[tuple] = []  # [(created_at, id)]
+    for item_id, copies in groups.items():
+        key = document_id(user_id, item_id)
+        keyed = next(((doc, data) for doc, data in copies if doc.id == key), None)
+        # The keyed document is the one current writes update; otherwise the newest copy takes the key
+        keep, data = keyed or max(copies, key=lambda copy: copy[1].get("updated_at") or _OLDEST)
+        group = [("delete", doc.reference, None) for doc, _ in copies if doc is not keep]
+        created_at = _created_at(data)
+        if keyed is None:
+            moved = {**data, "created_at": created_at} if created_at else data
+            group.insert(0, ("set", collection_ref.document(key), moved))
+            group.append(("delete", keep.reference, None))
+            report["moved"] += 1
+        elif created_at and "created_at" not in data:
+            # Pin the creation time now, before the next sync moves updated_at
+            group.append(("update", keep.reference, {"created_at": created_at}))
+            report["dated"] += 1
+        report["duplicates"] += len(copies) - 1
+        if group:
+            writes.append(group)
+        survivors.append((created_at or _OLDEST, item_id))
+
+    dropped: List[int] = []
+    survivors.sort(reverse=True)
+    for rank, (created_at, item_id) in enumerate(survivors):
+        # Notifications with no timestamp at all cannot be dated, so they fall outside any window
+        if cutoff is not None and created_at < cutoff:
+            report["expired"] += 1
+        elif max_per_user is not None and rank >= max_per_user:
+            report["over_cap"] += 1
+        else:
+            continue
+        dropped.append(item_id)
+        # Dropped notifications leave a tombstone so delta sync removes them on the devices too
+        writes.append([
+            ("delete", collection_ref.document(document_id(user_id, item_id)), None),
+            ("set", tombstone_ref(db, COLLECTION, user_id, item_id), tombstone(COLLECTION, user_id, item_id)),
+        ])
+    return writes, dropped
+
+
+def _fill_batch(batch, ops: List[tuple]):
+    for op, ref, data in ops:
+        if op == "set":
+            batch.set(ref, data)
+        elif op == "update":
+            batch.update(ref, data)
+        else:
+            batch.delete(ref)
+    return batch
+
+
+def compact_notifications(
+    db,
+    retention_days: Optional[float] = None,
+    max_per_user: Optional[int] = None,
+    dry_run: bool = False,
+    now: Optional[datetime] = None,
+    on_dropped: Optional[Callable[[str, List[int]], None]] = None,
+) -> Dict[str, Any]:
+    """Remove duplicate notifications and those past the retention window or per-user cap.
+
+    Notifications age from their `created_at`; resyncs do not renew them. Users are compacted
+    one at a time from a paged scan, so memory is bounded by the largest user. Returns counts of
+    documents scanned, duplicates removed, copies moved onto their key, old documents given a
+    `created_at`, notifications expired or over the cap, and the total documents reclaimed.
+    After each commit, `on_dropped(user_id, ids)` is called with the expired and over-cap ids
+    of each user in it.
+    """
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=retention_days) if retention_days else None
+    report = {"scanned": 0, "duplicates": 0, "moved": 0, "dated": 0, "expired": 0, "over_cap": 0, "dry_run": dry_run}
+    ops: List[tuple] = []
+    pending: Dict[str, List[int]] = {}  # users with writes in `ops` -> their dropped ids
+
+    def commit():
+        _fill_batch(db.batch(), ops).commit()
+        for user_id, ids in pending.items():
+            notify_write(COLLECTION, user_id)
+            if on_dropped is not None and ids:
+                on_dropped(user_id, ids)
+        ops.clear()
+        pending.clear()
+
+    for user_id, docs in _users(db):
+        writes, dropped = _plan_user(db, user_id, docs, cutoff, max_per_user, report)
+        if dry_run or not writes:
+            continue
+        for group in writes:
+            if ops and len(ops) + len(group) > BATCH_LIMIT:
+                commit()
+            ops.extend(group)
+            pending.setdefault(user_id, [])
+        pending[user_id].extend(dropped)
+    if ops:
+        commit()
+
+    report["reclaimed"] = report["duplicates"] + report["expired"] + report["over_cap"]
+    return report
+
+
+class NotificationCompactor:
+    def __init__(self, interval: float, retention_days: Optional[float], max_per_user: Optional[int]):
+        self.interval = interval
+        self.retention_days = retention_days
+        self.max_per_user = max_per_user
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def run(self, repository, dry_run: bool = False) -> Dict[str, Any]:
+        return repository.compact_notifications(self.retention_days, self.max_per_user, dry_run)
+
+    def _run(self, get_repository):
+        while not self._stopping.wait(self.interval):
+            try:
+                print(f"Notification compaction: {self.run(get_repository())}")
+            except Exception as e:
+                print(f"Notification compaction failed: {e}")
+
+    def start(self, get_repository):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, args=(get_repository,), name="notification-compaction", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+
+notification_compactor = NotificationCompactor(
+    interval=float(os.getenv("NOTIFICATION_COMPACTION_INTERVAL", "0")),
+    retention_days=float(os.getenv("NOTIFICATION_RETENTION_DAYS", "90")) or None,
+    max_per_user=int(os.getenv("NOTIFICATION_MAX_PER_USER", "500")) or None,
+)
@@ -0,0 +1,90 @@
+# Delta Sync
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from services.cache import list_cache
+from services.documents import TOMBSTONES, on_write
+from services.singleflight import SingleFlight
+
+# Identical list reads in flight at once (an app launch fires several) share one Firestore query
+list_reads = SingleFlight("list_reads", enabled=os.getenv("READ_COALESCING", "1") != "0")
+on_write(lambda collection, user_id: list_reads.forget(lambda key: key[:2] == (collection, user_id)))
+
+
+def utc_since(since: Optional[datetime]) -> Optional[datetime]:
+    if since is not None and since.tzinfo is None:
+        return since.replace(tzinfo=timezone.utc)
+    return since
+
+
+def _queries(db, collection: str, user_id: str, since: Optional[datetime]):
+    query = db.collection(collection).where("user_id", "==", user_id)
+    if since is None:
+        return query, None
+    # `>=` re-delivers records stamped exactly at the watermark rather than risk skipping one
+    tombstones = (
+        db.collection(TOMBSTONES)
+        .where("user_id", "==", user_id)
+        .where("collection", "==", collection)
+        .where("deleted_at", ">=", since)
+    )
+    return query.where("updated_at", ">=", since), tombstones
+
+
+def _merge(documents: List[Dict[str, Any]], tombstones: List[Dict[str, Any]], since: Optional[datetime]) -> Dict[str, Any]:
+    watermark = since
+    changed: Dict[Any, Dict[str, Any]] = {}
+    for data in documents:
+        updated_at = data.get("updated_at")
+        if updated_at is not None and (watermark is None or updated_at > watermark):
+            watermark = updated_at
+        changed[data.get("id")] = data
+
+    deleted = []
+    for data in tombstones:
+        deleted_at = data["deleted_at"]
+        if watermark is None or deleted_at > watermark:
+            watermark = deleted_at
+        # A record recreated after its deletion is reported as changed only
+        current = changed.get(data["id"])
+        if current is None or current.get("updated_at") is None or current["updated_at"] < deleted_at:
+            changed.pop(data["id"], None)
+            deleted.append(data["id"])
+
+    return {"data": list(changed.values()), "deleted": deleted, "watermark": watermark}
+
+
+def _read_changes(db, collection: str, user_id: str, since: Optional[datetime]) -> Dict[str, Any]:
+    query, tombstones = _queries(db, collection, user_id, since)
+    documents = [doc.to_dict() for doc in query.stream()]
+    deleted = [doc.to_dict() for doc in tombstones.stream()] if tombstones else []
+    return _merge(documents, deleted, since)
+
+
+async def _read_changes_async(db, collection: str, user_id: str, since: Optional[datetime]) -> Dict[str, Any]:
+    query, tombstones = _queries(db, collection, user_id, since)
+    documents = [doc.to_dict() async for doc in query.stream()]
+    deleted = [doc.to_dict() async for doc in tombstones.stream()] if tombstones else []
+    return _merge(documents, deleted, since)
+
+
+def list_changes(db, collection: str, user_id: str, since: Optional[datetime] = None) -> Dict[str, Any]:
+    """Documents of a user changed at or after `since` (all of them without it), the ids deleted
+    since then, and the watermark to pass as the next `since`. Full reads go through the list cache."""
+    since = utc_since(since)
+    load = lambda: list_reads.do((collection, user_id, since), lambda: _read_changes(db, collection, user_id, since))
+    if since is None:
+        return list_cache.get_or_load(collection, user_id, load)
+    return load()
+
+
+async def list_changes_async(db, collection: str, user_id: str, since: Optional[datetime] = None) -> Dict[str, Any]:
+    since = utc_since(since)
+    load = lambda: list_reads.do_async((collection, user_id, since), lambda: _read_changes_async(db, collection, user_id, since))
+    if since is None:
+        return await list_cache.get_or_load_async(collection, user_id, load)
+    return await load()
@@ -0,0 +1,124 @@
+# Email Digest
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Collects medication threshold alerts for a window and turns them into one email per recipient,
+# sent up to 1000 recipients per SendGrid request through the outbox.
+import html
+import os
+import threading
+import time
+from typing import Dict, List
+
+from services.outbox import Outbox, outbox
+from utility import PERSONALIZATION_LIMIT
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS digest_alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    to_email TEXT NOT NULL,
+    user_name TEXT NOT NULL,
+    medication_name TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def render_digest(user_name: str, medication_names: List[str]) -> str:
+    if len(medication_names) == 1:
+        return f"<div><p>Hi, <strong>{html.escape(user_name)}</strong></p><p>The stock of <strong>{html.escape(medication_names[0])}</strong> has reached its threshold.</p></div>"
+    items = "".join(f"<li><strong>{html.escape(name)}</strong></li>" for name in medication_names)
+    return f"<div><p>Hi, <strong>{html.escape(user_name)}</strong></p><p>The stock of these medications has reached its threshold:</p><ul>{items}</ul></div>"
+
+
+class EmailDigest:
+    """Buffers alerts next to the outbox queue, so a flush moves them into digest messages atomically."""
+
+    def __init__(self, outbox: Outbox, window: float):
+        self.outbox = outbox
+        self.window = window
+        self._ready = False
+        self._thread = None
+        self._stopping = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def _schema(self, connection):
+        if not self._ready:
+            connection.execute(_SCHEMA)
+            self._ready = True
+
+    def insert(self, connection, to_email: str, user_name: str, medication_name: str):
+        self._schema(connection)
+        connection.execute(
+            "INSERT INTO digest_alerts (to_email, user_name, medication_name, created_at) VALUES (?, ?, ?, ?)",
+            (to_email, user_name, medication_name, time.time()),
+        )
+
+    def add(self, to_email: str, user_name: str, medication_name: str):
+        with self.outbox.transaction() as connection:
+            self.insert(connection, to_email, user_name, medication_name)
+
+    def flush(self) -> Dict[str, int]:
+        """Merge the buffered alerts per recipient and queue them as digest messages."""
+        with self.outbox.transaction() as connection:
+            self._schema(connection)
+            rows = connection.execute(
+                "DELETE FROM digest_alerts RETURNING to_email, user_name, medication_name, id"
+            ).fetchall()
+
+            recipients: Dict[str, tuple] = {}  # to_email -> (user_name, medication names)
+            for to_email, user_name, medication_name, _ in sorted(rows, key=lambda row: row[3]):
+                _, names = recipients.setdefault(to_email, (user_name, []))
+                if medication_name not in names:
+                    names.append(medication_name)
+
+            messages = [
+                {"to": to_email, "html_content": render_digest(user_name, names)}
+                for to_email, (user_name, names) in recipients.items()
+            ]
+            for start in range(0, len(messages), PERSONALIZATION_LIMIT):
+                self.outbox.insert(connection, "email_digest", {"recipients": messages[start:start + PERSONALIZATION_LIMIT]})
+
+        return {
+            "alerts": len(rows),
+            "recipients": len(messages),
+            "requests": -(-len(messages) // PERSONALIZATION_LIMIT),
+        }
+
+    def _run(self):
+        while not self._stopping.wait(self.window):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Email digest flush failed: {e}")
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="email-digest", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+        # Alerts still buffered go out now rather than wait for the next start
+        self.flush()
+
+
+email_digest = EmailDigest(outbox, window=float(os.getenv("EMAIL_DIGEST_WINDOW", "0")))
+
+
+def queue_replenishment_alert(connection, to_email: str, user_name: str, medication_name: str):
+    """Hold the alert for the next digest, or queue it as a single email when digests are off."""
+    if email_digest.enabled:
+        email_digest.insert(connection, to_email, user_name, medication_name)
+    else:
+        outbox.insert(connection, "email", {"to": to_email, "html_content": render_digest(user_name, [medication_name])})
@@ -0,0 +1,120 @@
+# User Directory
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Firebase Auth users served from an in-memory snapshot that a background job rebuilds, so
+# listing and looking up users costs a slice or a dict lookup instead of a full Auth scan.
+import base64
+import bisect
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from models.response import User
+from services.firebase import list_firebase_users
+
+
+class _Snapshot:
+    def __init__(self, users: List[User]):
+        self.users = sorted(users, key=lambda user: user.id)
+        self.ids = [user.id for user in self.users]
+        self.by_id = {user.id: user for user in self.users}
+        self.by_email = {user.email.lower(): user for user in self.users if user.email}
+        self.loaded_at = time.time()
+
+
+def _encode_token(user_id: str) -> str:
+    return base64.urlsafe_b64encode(user_id.encode()).decode()
+
+
+def _decode_token(page_token: str) -> str:
+    try:
+        return base64.b64decode(page_token.encode(), altchars=b"-_", validate=True).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid page token")
+
+
+class UserDirectory:
+    """Snapshot of all users, ordered by uid and indexed by uid and email.
+
+    The snapshot is loaded on first use, or by the refresh job once the app has started, and
+    swapped whole on every refresh; a failed refresh keeps serving the previous one.
+    """
+
+    def __init__(self, loader: Callable[[], List[User]], interval: float):
+        self.loader = loader
+        self.interval = interval
+        self._snapshot: Optional[_Snapshot] = None
+        self._load_lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def refresh(self) -> int:
+        """Reload all users from Auth and return how many there are."""
+        with self._load_lock:
+            snapshot = _Snapshot(self.loader())
+            self._snapshot = snapshot
+        return len(snapshot.users)
+
+    def _current(self) -> _Snapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._load_lock:
+                if self._snapshot is None:
+                    self._snapshot = _Snapshot(self.loader())
+                snapshot = self._snapshot
+        return snapshot
+
+    def page(self, page_token: Optional[str] = None, limit: int = 100) -> Tuple[List[User], Optional[str]]:
+        """Up to `limit` users after `page_token`, and the token of the next page (None on the last)."""
+        snapshot = self._current()
+        start = bisect.bisect_right(snapshot.ids, _decode_token(page_token)) if page_token else 0
+        users = snapshot.users[start:start + limit]
+        more = start + limit < len(snapshot.users)
+        return users, _encode_token(users[-1].id) if users and more else None
+
+    def get(self, user_id: str) -> Optional[User]:
+        return self._current().by_id.get(user_id)
+
+    def find_by_email(self, email: str) -> Optional[User]:
+        return self._current().by_email.get(email.lower())
+
+    def users(self) -> List[User]:
+        return list(self._current().users)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        snapshot = self._snapshot
+        return {
+            "users": len(snapshot.users) if snapshot else None,
+            "age_seconds": time.time() - snapshot.loaded_at if snapshot else None,
+            "refresh_interval": self.interval,
+        }
+
+    def _run(self):
+        # The first load runs at once so the directory is warm before the first request needs it
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"User directory refresh failed: {e}")
+            if self._stopping.wait(self.interval):
+                return
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="user-directory", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+
+user_directory = UserDirectory(list_firebase_users, interval=float(os.getenv("USER_DIRECTORY_REFRESH", "300")))
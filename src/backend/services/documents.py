@@ -0,0 +1,183 @@
+# Document Keys
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from google.api_core.exceptions import Aborted, Conflict, FailedPrecondition, NotFound
+
+TOMBSTONES = "tombstones"
+SUMMARIES = "summaries"
+# Collections whose documents also keep the time they were first written, which retention runs on
+CREATED_AT_COLLECTIONS = {"notifications"}
+TRANSFORM_ATTEMPTS = 5
+
+_write_listeners: List[Callable[[str, str], None]] = []
+
+
+def on_write(listener: Callable[[str, str], None]):
+    """Register `listener(collection, user_id)`, called after every write through this module or services.bulk."""
+    _write_listeners.append(listener)
+    return listener
+
+
+def notify_write(collection: str, user_id: str):
+    for listener in _write_listeners:
+        listener(collection, user_id)
+
+
+def document_id(user_id: str, item_id: Optional[int] = None) -> str:
+    """Deterministic document key: `{user_id}_{id}`, or `{user_id}` for one-per-user documents."""
+    if item_id is None:
+        return user_id
+    return f"{user_id}_{item_id}"
+
+
+def document_ref(db, collection: str, user_id: str, item_id: Optional[int] = None):
+    return db.collection(collection).document(document_id(user_id, item_id))
+
+
+def server_timestamp():
+    # Imported on first write: loading the Firestore client library is most of a cold start
+    from firebase_admin import firestore
+
+    return firestore.SERVER_TIMESTAMP
+
+
+def stamp(data: Dict[str, Any], created: bool = False) -> Dict[str, Any]:
+    """Copy of a document with its server-side `updated_at` watermark, and `created_at` when `created`."""
+    if created:
+        return {**data, "updated_at": server_timestamp(), "created_at": server_timestamp()}
+    return {**data, "updated_at": server_timestamp()}
+
+
+def tombstone_ref(db, collection: str, user_id: str, item_id: Optional[int] = None):
+    return db.collection(TOMBSTONES).document(f"{collection}_{document_id(user_id, item_id)}")
+
+
+def tombstone(collection: str, user_id: str, item_id: Optional[int] = None) -> Dict[str, Any]:
+    return {"collection": collection, "user_id": user_id, "id": item_id, "deleted_at": server_timestamp()}
+
+
+def add_document(db, collection: str, data: Dict[str, Any]) -> str:
+    """Add a document under an auto-generated key, returning the key."""
+    _, ref = db.collection(collection).add(stamp(data, collection in CREATED_AT_COLLECTIONS))
+    notify_write(collection, data["user_id"])
+    return ref.id
+
+
+def upsert_document(db, collection: str, data: Dict[str, Any]) -> Tuple[str, bool]:
+    """Update or create a document, returning its key and whether it was created.
+
+    An existing document is updated in one write. A missing one fails that update and is then
+    created, so `created_at` is written only once; a create that loses a race falls back to a merge.
+    """
+    ref = document_ref(db, collection, data["user_id"], data.get("id"))
+    try:
+        try:
+            ref.update(stamp(data))
+            return ref.id, False
+        except NotFound:
+            pass
+        try:
+            ref.create(stamp(data, collection in CREATED_AT_COLLECTIONS))
+            return ref.id, True
+        except Conflict:
+            ref.set(stamp(data), merge=True)
+            return ref.id, False
+    finally:
+        notify_write(collection, data["user_id"])
+
+
+def _delete_batch(db, collection: str, user_id: str, item_id: Optional[int]):
+    # The delete and its tombstone commit together; the precondition fails both if nothing was there
+    batch = db.batch()
+    batch.delete(document_ref(db, collection, user_id, item_id), option=db.write_option(exists=True))
+    batch.set(tombstone_ref(db, collection, user_id, item_id), tombstone(collection, user_id, item_id))
+    return batch
+
+
+def delete_document(db, collection: str, user_id: str, item_id: Optional[int] = None) -> bool:
+    """Delete a document in a single commit, returning False when it did not exist."""
+    try:
+        _delete_batch(db, collection, user_id, item_id).commit()
+    except NotFound:
+        return False
+    finally:
+        notify_write(collection, user_id)
+    return True
+
+
+async def add_document_async(db, collection: str, data: Dict[str, Any]) -> str:
+    _, ref = await db.collection(collection).add(stamp(data, collection in CREATED_AT_COLLECTIONS))
+    notify_write(collection, data["user_id"])
+    return ref.id
+
+
+async def upsert_document_async(db, collection: str, data: Dict[str, Any]) -> Tuple[str, bool]:
+    ref = document_ref(db, collection, data["user_id"], data.get("id"))
+    try:
+        try:
+            await ref.update(stamp(data))
+            return ref.id, False
+        except NotFound:
+            pass
+        try:
+            await ref.create(stamp(data, collection in CREATED_AT_COLLECTIONS))
+            return ref.id, True
+        except Conflict:
+            await ref.set(stamp(data), merge=True)
+            return ref.id, False
+    finally:
+        notify_write(collection, data["user_id"])
+
+
+async def delete_document_async(db, collection: str, user_id: str, item_id: Optional[int] = None) -> bool:
+    try:
+        await _delete_batch(db, collection, user_id, item_id).commit()
+    except NotFound:
+        return False
+    finally:
+        notify_write(collection, user_id)
+    return True
+
+
+def _transform_write(ref, db, snapshot, data: Dict[str, Any]):
+    # Fails with FailedPrecondition or Conflict when another write got there after our read
+    if snapshot.exists:
+        return ref.update(data, option=db.write_option(last_update_time=snapshot.update_time))
+    return ref.create(data)
+
+
+def transform_document(db, ref, change: Callable[[Optional[Dict[str, Any]]], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """Replace a document with `change(current)`, where `current` is None when it does not exist.
+
+    The write is conditional on the document being unchanged since the read, and the read and
+    `change` are retried when it was not, so concurrent transforms never lose an update. When
+    `change` returns None nothing is written.
+    """
+    for _ in range(TRANSFORM_ATTEMPTS):
+        snapshot = ref.get()
+        data = change(snapshot.to_dict() if snapshot.exists else None)
+        if data is None:
+            return None
+        try:
+            _transform_write(ref, db, snapshot, data)
+        except (Conflict, FailedPrecondition):
+            continue
+        return data
+    raise Aborted(f"{ref.id} kept changing during {TRANSFORM_ATTEMPTS} attempts")
+
+
+async def transform_document_async(db, ref, change: Callable[[Optional[Dict[str, Any]]], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    for _ in range(TRANSFORM_ATTEMPTS):
+        snapshot = await ref.get()
+        data = change(snapshot.to_dict() if snapshot.exists else None)
+        if data is None:
+            return None
+        try:
+            await _transform_write(ref, db, snapshot, data)
+        except (Conflict, FailedPrecondition):
+            continue
+        return data
+    raise Aborted(f"{ref.id} kept changing during {TRANSFORM_ATTEMPTS} attempts")
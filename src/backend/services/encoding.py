@@ -0,0 +1,135 @@
+# Response Encoding
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Content negotiation for sync payloads: JSON or msgpack by `Accept`, br or gzip by
+# `Accept-Encoding`, and a strong ETag so unchanged lists are answered with 304. JSON is
+# rendered by orjson when it is installed.
+import gzip
+import hashlib
+import json
+from typing import Any, Optional
+
+import msgpack
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from services.metrics import phase
+
+try:
+    import brotli
+except ImportError:  # br is offered only when the Brotli package is installed
+    brotli = None
+
+try:
+    import orjson
+except ImportError:  # bodies are then rendered by the json module, after jsonable_encoder
+    orjson = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MIN_COMPRESS_SIZE = 1024  # smaller bodies grow or gain nothing once compressed
+
+
+def _qualities(header: Optional[str]) -> dict:
+    """`{token: q}` for an Accept-style header, e.g. `gzip;q=0.5, br` -> {"gzip": 0.5, "br": 1.0}."""
+    qualities = {}
+    for part in (header or "").split(","):
+        token, *params = [piece.strip() for piece in part.split(";")]
+        if not token:
+            continue
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        qualities[token.lower()] = quality
+    return qualities
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    qualities = _qualities(accept)
+    msgpack_quality = max(qualities.get(MSGPACK, 0), qualities.get("application/x-msgpack", 0))
+    json_quality = max(qualities.get(JSON, 0), qualities.get("application/*", 0), qualities.get("*/*", 0))
+    return MSGPACK if msgpack_quality > 0 and msgpack_quality >= json_quality else JSON
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    qualities = _qualities(accept_encoding)
+    wildcard = qualities.get("*", 0)
+    offered = [coding for coding in (("br",) if brotli else ()) + ("gzip",) if qualities.get(coding, wildcard) > 0]
+    return max(offered, key=lambda coding: qualities.get(coding, wildcard), default=None)
+
+
+def _default(value: Any) -> Any:
+    # Types the serializers do not know natively, such as models and sets, go through FastAPI's encoder
+    return jsonable_encoder(value)
+
+
+def render(body: Any, media_type: str) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(body, default=_default)
+    if orjson is not None:
+        return orjson.dumps(body, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    content = jsonable_encoder(body)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class CompactJSONResponse(Response):
+    """JSON rendered by `render`. Returning one from a handler skips FastAPI's jsonable_encoder pass over the body."""
+
+    media_type = JSON
+
+    def render(self, content: Any) -> bytes:
+        return render(content, JSON)
+
+
+def compress(payload: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "br":
+        return brotli.compress(payload, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(payload, compresslevel=6)
+    return payload
+
+
+def entity_tag(payload: bytes, encoding: Optional[str]) -> str:
+    # Hashing the uncompressed representation keeps the tag stable however often it is recompressed
+    digest = hashlib.sha256(payload).hexdigest()[:32]
+    return f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], tag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ tags from intermediaries still match
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return tag in candidates
+
+
+def encoded_response(request: Request, body: Any) -> Response:
+    """Serialize `body` as the client prefers, or answer 304 when it already holds this version."""
+    media_type = negotiate_media_type(request.headers.get("accept"))
+    with phase("encode"):
+        payload = render(body, media_type)
+        encoding = negotiate_encoding(request.headers.get("accept-encoding")) if len(payload) >= MIN_COMPRESS_SIZE else None
+        tag = entity_tag(payload, encoding)
+    headers = {
+        "ETag": tag,
+        "Vary": "Accept, Accept-Encoding",
+        # Lets the platform HTTP cache on the device keep the list and revalidate it with If-None-Match
+        "Cache-Control": "private, no-cache",
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), tag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    with phase("encode"):
+        content = compress(payload, encoding)
+    return Response(content, media_type=media_type, headers=headers)
@@ -0,0 +1,248 @@
+# Change Feed
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Pushes each user's changes to their connected devices over SSE or WebSocket. Writes announce
+# themselves through `on_write` (and, optionally, Firestore snapshot listeners catch writes made
+# by other workers); one delta read per user then fans out to every device of that user.
+import asyncio
+import os
+from contextlib import aclosing
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from services.documents import on_write
+from services.encoding import JSON, render
+from services.repository import COLLECTIONS, get_repository
+
+FEED_COLLECTIONS = list(COLLECTIONS)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class _Subscriber:
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.overflowed = False
+
+
+class _Channel:
+    """The devices of one user, and how far each collection has been read for them."""
+
+    def __init__(self, user_id: str, start: datetime):
+        self.user_id = user_id
+        self.subscribers: Set[_Subscriber] = set()
+        self.since: Dict[str, datetime] = {collection: start for collection in FEED_COLLECTIONS}
+        # What was sent at each collection's watermark, since a read from it returns those again
+        self.sent: Dict[str, set] = {collection: set() for collection in FEED_COLLECTIONS}
+        self.pending: Set[str] = set()
+        self.task: Optional[asyncio.Task] = None
+        self.watches: List[Any] = []
+
+
+class ChangeFeed:
+    """Change events per user, read once per change and fanned out to each of the user's devices.
+
+    Events carry an `offset`: a time before which every change has been delivered. A device that
+    reconnects with it gets what it missed from a delta read, possibly with a few repeats, which
+    are harmless since events are upserts and deletions. A device that falls `queue_size`
+    events behind gets a `resync` event and should run a delta sync from its last offset.
+    """
+
+    def __init__(self, heartbeat: float, queue_size: int, margin: float, watch_firestore: bool):
+        self.heartbeat = heartbeat
+        self.queue_size = queue_size
+        # Covers writes stamped before a read but committed after it, and clock skew with Firestore
+        self.margin = timedelta(seconds=margin)
+        self.watch_firestore = watch_firestore
+        self._channels: Dict[str, _Channel] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing = False
+        self.events = 0
+        self.reads = 0
+        self.overflows = 0
+
+    def notify(self, collection: str, user_id: str):
+        # Called after every write, from the threadpool or the event loop
+        if user_id in self._channels and collection in COLLECTIONS:
+            try:
+                self._loop.call_soon_threadsafe(self._mark, user_id, collection)
+            except RuntimeError:
+                pass  # the serving loop has closed
+
+    def _mark(self, user_id: str, collection: str):
+        channel = self._channels.get(user_id)
+        if channel is None:
+            return
+        channel.pending.add(collection)
+        if channel.task is None:
+            channel.task = self._loop.create_task(self._pump(channel))
+
+    def _offset(self, started: datetime) -> str:
+        return (started - self.margin).isoformat()
+
+    async def _pump(self, channel: _Channel):
+        # Writes that arrive while a read is running are picked up by the next pass
+        try:
+            while channel.pending:
+                collections, channel.pending = channel.pending, set()
+                started = _now()
+                for collection in collections:
+                    try:
+                        event = await self._read(channel, collection)
+                    except Exception as e:
+                        print(f"Change feed read of {collection} for {channel.user_id} failed: {e}")
+                        self._loop.call_later(1.0, self._mark, channel.user_id, collection)
+                        continue
+                    if event is not None:
+                        self._publish(channel, {**event, "offset": self._offset(started)})
+        finally:
+            channel.task = None
+
+    async def _read(self, channel: _Channel, collection: str) -> Optional[Dict[str, Any]]:
+        since = channel.since[collection]
+        self.reads += 1
+        page = await get_repository().list_page_async(collection, channel.user_id, since=since)
+
+        sent = channel.sent[collection]
+        data = [item for item in page["data"] if ("data", item.get("id"), item.get("updated_at")) not in sent]
+        deleted = [item_id for item_id in page["deleted"] if ("deleted", item_id) not in sent]
+        watermark = page["watermark"] or since
+        if watermark != since:
+            channel.since[collection] = watermark
+            sent = channel.sent[collection] = set()
+        sent.update(("data", item.get("id"), item.get("updated_at")) for item in data)
+        sent.update(("deleted", item_id) for item_id in deleted)
+
+        if not data and not deleted:
+            return None
+        return {"type": "change", "collection": collection, "data": data, "deleted": deleted, "watermark": watermark}
+
+    def _publish(self, channel: _Channel, event: Dict[str, Any]):
+        self.events += 1
+        for subscriber in channel.subscribers:
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                if not subscriber.overflowed:
+                    subscriber.overflowed = True
+                    self.overflows += 1
+
+    def _open(self, user_id: str) -> _Channel:
+        channel = self._channels[user_id] = _Channel(user_id, _now() - self.margin)
+        if self.watch_firestore:
+            try:
+                self._watch(channel)
+            except Exception as e:
+                print(f"Change feed listeners for {user_id} failed, relying on this worker's writes: {e}")
+        return channel
+
+    def _watch(self, channel: _Channel):
+        from services.clients import get_db
+
+        db = get_db()
+        for collection in FEED_COLLECTIONS:
+            initial = [True]
+
+            def on_snapshot(snapshots, changes, read_time, collection=collection, initial=initial):
+                # The first snapshot is the current state; later ones mean a change, possibly by another worker
+                if initial[0]:
+                    initial[0] = False
+                    return
+                self.notify(collection, channel.user_id)
+
+            channel.watches.append(db.collection(collection).where("user_id", "==", channel.user_id).on_snapshot(on_snapshot))
+
+    def _close(self, channel: _Channel):
+        for watch in channel.watches:
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                print(f"Change feed listener close failed: {e}")
+        if channel.task is not None:
+            channel.task.cancel()
+        self._channels.pop(channel.user_id, None)
+
+    async def subscribe(self, user_id: str, since: Optional[datetime] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Events for one device: what changed after `since` if given, then live changes and heartbeats."""
+        self._loop = asyncio.get_running_loop()
+        fresh = user_id not in self._channels
+        channel = self._channels.get(user_id) or self._open(user_id)
+        subscriber = _Subscriber(self.queue_size)
+        # Registered before the catch-up read so nothing written meanwhile is missed
+        channel.subscribers.add(subscriber)
+        try:
+            if since is not None:
+                if since.tzinfo is None:
+                    since = since.replace(tzinfo=timezone.utc)
+                started = _now()
+                repository = get_repository()
+                pages = await asyncio.gather(*(repository.list_page_async(collection, user_id, since=since) for collection in FEED_COLLECTIONS))
+                for collection, page in zip(FEED_COLLECTIONS, pages):
+                    if fresh and page["watermark"] and page["watermark"] > channel.since[collection]:
+                        # Live reads need not send the only device what the catch-up just did
+                        channel.since[collection] = page["watermark"]
+                        channel.sent[collection] = {("data", item.get("id"), item.get("updated_at")) for item in page["data"]}
+                        channel.sent[collection].update(("deleted", item_id) for item_id in page["deleted"])
+                    if page["data"] or page["deleted"]:
+                        yield {"type": "change", "collection": collection, **page, "offset": self._offset(started)}
+
+            while not self._closing:
+                if subscriber.overflowed:
+                    yield {"type": "resync"}
+                    return
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield {"type": "heartbeat", "time": _now().isoformat()}
+                    continue
+                if event is not None:
+                    yield event
+        finally:
+            channel.subscribers.discard(subscriber)
+            if not channel.subscribers and self._channels.get(user_id) is channel:
+                self._close(channel)
+
+    async def sse(self, user_id: str, since: Optional[datetime] = None) -> AsyncIterator[bytes]:
+        """The events as Server-Sent Events; the offset is the event id EventSource resumes from."""
+        async with aclosing(self.subscribe(user_id, since)) as events:
+            async for event in events:
+                if event["type"] == "heartbeat":
+                    yield b": heartbeat\n\n"
+                    continue
+                offset = f"id: {event['offset']}\n".encode() if "offset" in event else b""
+                yield offset + f"event: {event['type']}\n".encode() + b"data: " + render(event, JSON) + b"\n\n"
+
+    def stop(self):
+        """End every stream, so shutdown does not wait for devices to disconnect."""
+        self._closing = True
+        for channel in list(self._channels.values()):
+            for subscriber in channel.subscribers:
+                try:
+                    subscriber.queue.put_nowait(None)
+                except asyncio.QueueFull:
+                    pass
+
+    def start(self):
+        self._closing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._channels),
+            "devices": sum(len(channel.subscribers) for channel in self._channels.values()),
+            "events": self.events,
+            "reads": self.reads,
+            "overflows": self.overflows,
+        }
+
+
+change_feed = ChangeFeed(
+    heartbeat=float(os.getenv("FEED_HEARTBEAT", "15")),
+    queue_size=int(os.getenv("FEED_QUEUE_SIZE", "100")),
+    margin=float(os.getenv("FEED_RESUME_MARGIN", "5")),
+    watch_firestore=os.getenv("FEED_FIRESTORE_LISTENERS") == "1",
+)
+on_write(change_feed.notify)
@@ -1,21 +1,29 @@
-from firebase_admin import auth
 from models.response import User
 from typing import List
+from services.clients import firebase_app
 
-def get_firebase_users() -> List[User]:
+def list_firebase_users() -> List[User]:
+  from firebase_admin import auth
+
+  firebase_app()
   users: List[User] = []
+  page = auth.list_users()
+  while page:
+      for user in page.users:
+          m_user = User(
+              email = user.email,
+              id = user.uid,
+              name = user.display_name
+          )
+          users.append(m_user)
+          
+      page = page.get_next_page()
+  
+  return users
+
+def get_firebase_users() -> List[User]:
   try:
-      page = auth.list_users()
-      while page:
-          for user in page.users:
-              m_user = User(
-                  email = user.email,
-                  id = user.uid
-              )
-              users.append(m_user)
-              
-          page = page.get_next_page()
+      return list_firebase_users()
   except Exception as e:
       print(f"Error listing users: {e}")
-  
-  return users
\ No newline at end of file
+      return []
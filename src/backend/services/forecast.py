@@ -0,0 +1,174 @@
+# Stock Forecast
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Projects every medication's stock from its frequency in one pass over NumPy arrays and emails
+# the owners of medications that newly fell below their threshold.
+import os
+import threading
+from datetime import date
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from services.digest import queue_replenishment_alert
+from services.outbox import Outbox, outbox
+
+if TYPE_CHECKING:
+    import numpy as np
+
+MEDICATION_FIELDS = ["id", "user_id", "name", "stock", "start_date", "end_date", "stock_date", "threshold", "email_alert"]
+FREQUENCY_FIELDS = ["medication_id", "user_id", "dosage", "cycle", "times"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS forecast_alerts (
+    user_id TEXT NOT NULL,
+    medication_id INTEGER NOT NULL,
+    PRIMARY KEY (user_id, medication_id)
+);
+"""
+
+
+def _dates(values: List[Any]) -> "np.ndarray":
+    """`YYYY-MM-DD` strings as datetime64[D], NaT where empty or malformed."""
+    import numpy as np
+
+    cleaned = [value[:10] if isinstance(value, str) and value else "NaT" for value in values]
+    try:
+        return np.array(cleaned, dtype="datetime64[D]")
+    except ValueError:
+        parsed = []
+        for value in cleaned:
+            try:
+                parsed.append(np.datetime64(value, "D"))
+            except ValueError:
+                parsed.append(np.datetime64("NaT"))
+        return np.array(parsed, dtype="datetime64[D]")
+
+
+def _times(value: Any) -> int:
+    if isinstance(value, str):
+        return len([time for time in value.split(",") if time])
+    return len(value or [])
+
+
+def forecast(medications: List[Dict[str, Any]], frequencies: List[Dict[str, Any]], today: Optional[date] = None) -> Dict[str, "np.ndarray"]:
+    """Projected stock on `today` and run-out dates for each medication, as arrays aligned with `medications`.
+
+    Stock is consumed at `dosage * len(times) / cycle` per day, summed over all of the medication's
+    frequencies, from `stock_date` (or `start_date` when it was never counted) until `end_date`.
+    A medication without a frequency never depletes.
+    """
+    # Imported here so the API worker does not pay for NumPy until the job first runs
+    import numpy as np
+
+    today = np.datetime64(today or date.today(), "D")
+    positions = {(item.get("user_id"), item.get("id")): index for index, item in enumerate(medications)}
+    owner = np.array([positions.get((item.get("user_id"), item.get("medication_id")), -1) for item in frequencies], dtype=np.int64)
+
+    stock = np.array([item.get("stock") or 0 for item in medications], dtype=np.float64)
+    threshold = np.array([item.get("threshold") or 0 for item in medications], dtype=np.float64)
+    dosage = np.array([item.get("dosage") or 0 for item in frequencies], dtype=np.float64)
+    times = np.array([_times(item.get("times")) for item in frequencies], dtype=np.float64)
+    cycle = np.array([item.get("cycle") or 0 for item in frequencies], dtype=np.float64)
+    start = _dates([item.get("start_date") for item in medications])
+    end = _dates([item.get("end_date") for item in medications])
+    counted = _dates([item.get("stock_date") for item in medications])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(cycle > 0, dosage * times / cycle, 0.0)
+    # A medication taken on several schedules (say a morning and an evening dose) uses them all
+    matched = owner >= 0
+    daily = np.bincount(owner[matched], weights=rate[matched], minlength=len(medications)).astype(np.float64)
+    base = np.where(np.isnat(counted), start, counted)
+    until = np.where(np.isnat(end) | (end > today), today, end)
+    elapsed = np.clip((until - base).astype(np.float64), 0, None)
+    elapsed[np.isnat(base)] = 0
+
+    projected = stock - elapsed * daily
+    active = ~np.isnat(start) & (start <= today) & (np.isnat(end) | (today <= end))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        runs_out = np.where(daily > 0, np.floor(stock / daily), np.nan)
+        reaches_threshold = np.where(daily > 0, np.ceil(np.maximum(stock - threshold, 0) / daily), np.nan)
+    no_date = np.isnan(runs_out) | np.isnat(base)
+
+    return {
+        "projected_stock": projected,
+        "below_threshold": active & (projected < threshold),
+        "daily_use": daily,
+        "run_out_date": np.where(no_date, np.datetime64("NaT"), base + np.nan_to_num(runs_out).astype("timedelta64[D]")),
+        "threshold_date": np.where(no_date, np.datetime64("NaT"), base + np.nan_to_num(reaches_threshold).astype("timedelta64[D]")),
+    }
+
+
+class StockForecaster:
+    """Scheduled job that forecasts all users' stock and alerts once per threshold crossing.
+
+    The medications that were below threshold at the previous run are kept next to the outbox,
+    so the alerts and the new state commit together and a restocked medication can alert again.
+    """
+
+    def __init__(self, outbox: Outbox, interval: float):
+        self.outbox = outbox
+        self.interval = interval
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def _load(self, repository):
+        medications = repository.scan("medications", MEDICATION_FIELDS)
+        frequencies = repository.scan("frequencies", FREQUENCY_FIELDS)
+        return medications, frequencies
+
+    def run(self, repository, users: Dict[str, Any], today: Optional[date] = None) -> Dict[str, int]:
+        """Forecast every medication and queue alerts; `users` maps user ids to their `User`."""
+        import numpy as np
+
+        medications, frequencies = self._load(repository)
+        below = forecast(medications, frequencies, today)["below_threshold"]
+        crossing = {
+            (item["user_id"], item["id"]): item
+            for item in (medications[index] for index in np.flatnonzero(below))
+        }
+
+        alerts = 0
+        with self.outbox.transaction() as connection:
+            connection.execute(_SCHEMA)
+            previous = set(connection.execute("SELECT user_id, medication_id FROM forecast_alerts").fetchall())
+            fresh = [key for key in crossing if key not in previous]
+            connection.executemany(
+                "DELETE FROM forecast_alerts WHERE user_id = ? AND medication_id = ?",
+                [key for key in previous if key not in crossing],
+            )
+            connection.executemany("INSERT INTO forecast_alerts (user_id, medication_id) VALUES (?, ?)", fresh)
+            for key in fresh:
+                item = crossing[key]
+                user = users.get(item["user_id"])
+                if item.get("email_alert") != "on" or user is None or not user.email:
+                    continue
+                queue_replenishment_alert(connection, user.email, user.name or user.email.split("@")[0], item.get("name", ""))
+                alerts += 1
+
+        return {"medications": len(medications), "below_threshold": len(crossing), "newly_below": len(fresh), "alerts": alerts}
+
+    def _run(self, get_repository, list_users):
+        while not self._stopping.wait(self.interval):
+            try:
+                print(f"Stock forecast: {self.run(get_repository(), {user.id: user for user in list_users()})}")
+            except Exception as e:
+                print(f"Stock forecast failed: {e}")
+
+    def start(self, get_repository, list_users):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, args=(get_repository, list_users), name="stock-forecast", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+
+stock_forecaster = StockForecaster(outbox, interval=float(os.getenv("FORECAST_INTERVAL", "0")))
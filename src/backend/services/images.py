@@ -0,0 +1,231 @@
+# Images
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Pictures of medications, appointments and contacts live in the blob store under their SHA-256,
+# with WebP thumbnails made once at upload, and documents keep only their `/image/{sha256}` URL
+# under IMAGE_BASE_URL. With IMAGE_OFFLOAD=1, inline base64 images sent by older clients are
+# offloaded on write too, so lists carry metadata only.
+import asyncio
+import base64
+import hashlib
+import io
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+
+from services.blobs import get_blob_store
+from services.encoding import etag_matches
+from services.repository import RepositoryWrapper
+
+IMAGE_PREFIX = "/image/"
+# Public origin of this API; documents are read by clients that do not resolve relative URLs
+IMAGE_BASE_URL = os.getenv("IMAGE_BASE_URL", "").rstrip("/")
+IMAGE_COLLECTIONS = {"medications", "appointments", "emergencies"}
+THUMBNAIL_SIZES = [int(size) for size in os.getenv("IMAGE_THUMBNAIL_SIZES", "128,512").split(",") if size]
+MAX_IMAGE_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+CACHE_CONTROL = "public, max-age=31536000, immutable"  # a URL always names the same bytes
+
+_DIGEST = re.compile(r"[0-9a-f]{64}")
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+def sniff(data: bytes) -> Optional[str]:
+    """The media type of an image from its first bytes, or None if it is not one we store."""
+    for signature, media_type in _SIGNATURES:
+        if data.startswith(signature):
+            return media_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:8] == b"ftyp" and data[8:12] in (b"heic", b"heix", b"mif1"):
+        return "image/heic"
+    return None
+
+
+def image_url(digest: str) -> str:
+    return IMAGE_BASE_URL + IMAGE_PREFIX + digest
+
+
+def offload_refusal() -> Optional[str]:
+    """Why inline images must not be offloaded in this deployment, or None when they can be.
+
+    Offloading replaces the only copy of a picture in its document by a URL, so the blob store
+    has to be seen by every instance and survive redeploys, and the URL has to be absolute.
+    """
+    if not get_blob_store().shared:
+        return "IMAGE_STORE=firebase is required, the local store is seen by one instance only"
+    if not IMAGE_BASE_URL:
+        return "IMAGE_BASE_URL is required, clients do not resolve relative image URLs"
+    return None
+
+
+def decode_inline_image(value: Any) -> Optional[bytes]:
+    if not isinstance(value, str) or not value or value.startswith((IMAGE_PREFIX, image_url(""))):
+        return None
+    payload = value
+    if value.startswith("data:"):
+        header, _, payload = value.partition(",")
+        if not header.endswith(";base64"):
+            return None
+    # The first bytes tell an inline picture from a URL or a name without decoding all of it
+    try:
+        head = base64.b64decode("".join(payload[:64].split())[:16], validate=True)
+    except ValueError:
+        return None
+    if sniff(head) is None:
+        return None
+    try:
+        return base64.b64decode("".join(payload.split()), validate=True)
+    except ValueError:
+        return None
+
+
+def _thumbnails(data: bytes) -> Dict[int, bytes]:
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        print("Pillow is not installed; images are served at full size")
+        return {}
+
+    thumbnails = {}
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image)
+            for size in THUMBNAIL_SIZES:
+                # Pictures already this small are served as they are
+                if max(image.size) <= size:
+                    continue
+                thumbnail = image.copy()
+                thumbnail.thumbnail((size, size))
+                if thumbnail.mode not in ("RGB", "RGBA"):
+                    thumbnail = thumbnail.convert("RGBA")
+                output = io.BytesIO()
+                thumbnail.save(output, "WEBP", quality=80)
+                thumbnails[size] = output.getvalue()
+    except Exception as e:
+        print(f"Thumbnail generation failed: {e}")
+    return thumbnails
+
+
+def store_image(data: bytes) -> str:
+    """Store an image and its thumbnails, once per content, and return its URL."""
+    media_type = sniff(data)
+    if media_type is None:
+        raise ValueError("Unsupported image type")
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ValueError(f"Image larger than {MAX_IMAGE_BYTES} bytes")
+
+    digest = hashlib.sha256(data).hexdigest()
+    store = get_blob_store()
+    if not store.exists(digest):
+        # Thumbnails go first: once the original exists the image counts as stored
+        for size, thumbnail in _thumbnails(data).items():
+            store.put(f"{digest}_{size}", thumbnail, "image/webp")
+        store.put(digest, data, media_type)
+    return image_url(digest)
+
+
+def offload_image(data: Dict[str, Any]) -> Dict[str, Any]:
+    """`data` with an inline base64 image replaced by its URL; as it was if it holds none."""
+    image = decode_inline_image(data.get("image"))
+    if image is None:
+        return data
+    try:
+        return {**data, "image": store_image(image)}
+    except Exception as e:
+        # The write still goes through, with the picture inline as before
+        print(f"Image offload failed, keeping it inline: {e}")
+        return data
+
+
+def _offload_items(items: List[BaseModel]) -> List[BaseModel]:
+    offloaded = []
+    for item in items:
+        image = getattr(item, "image", None)
+        update = offload_image({"image": image})
+        offloaded.append(item if update["image"] == image else item.model_copy(update=update))
+    return offloaded
+
+
+class ImageRepository(RepositoryWrapper):
+    """Repository wrapper that offloads inline images to the blob store before they are written."""
+
+    def upsert(self, collection, data):
+        if collection in IMAGE_COLLECTIONS:
+            data = offload_image(data)
+        return self.repository.upsert(collection, data)
+
+    def bulk_upsert(self, collection, user_id, items):
+        if collection in IMAGE_COLLECTIONS:
+            items = _offload_items(items)
+        return self.repository.bulk_upsert(collection, user_id, items)
+
+    async def upsert_async(self, collection, data):
+        if collection in IMAGE_COLLECTIONS:
+            data = await asyncio.to_thread(offload_image, data)
+        return await self.repository.upsert_async(collection, data)
+
+    async def bulk_upsert_async(self, collection, user_id, items):
+        if collection in IMAGE_COLLECTIONS:
+            items = await asyncio.to_thread(_offload_items, items)
+        return await self.repository.bulk_upsert_async(collection, user_id, items)
+
+
+def _byte_range(header: Optional[str], length: int):
+    """(start, end) of a single `bytes=` range, "unsatisfiable", or None to send everything."""
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", (header or "").strip())
+    if match is None or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), length - 1) if last else length - 1
+    else:
+        start, end = max(length - int(last), 0), length - 1
+    return (start, end) if start <= end and start < length else "unsatisfiable"
+
+
+def image_response(request: Request, digest: str, size: Optional[int] = None) -> Optional[Response]:
+    """The image, or its thumbnail for `size` when one was made, with Range and If-None-Match support.
+
+    Returns None when there is no such image.
+    """
+    if not _DIGEST.fullmatch(digest):
+        return None
+    store = get_blob_store()
+    key, media_type = digest, None
+    if size in THUMBNAIL_SIZES and store.exists(f"{digest}_{size}"):
+        key, media_type = f"{digest}_{size}", "image/webp"
+
+    headers = {"ETag": f'"{key}"', "Cache-Control": CACHE_CONTROL, "Accept-Ranges": "bytes"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    path = store.path(key)
+    if path is not None:
+        if media_type is None:
+            with open(path, "rb") as file:
+                media_type = sniff(file.read(12))
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+    data = store.read(key)
+    if data is None:
+        return None
+    media_type = media_type or sniff(data[:12])
+    selected = _byte_range(request.headers.get("range"), len(data))
+    if selected == "unsatisfiable":
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{len(data)}"})
+    if selected is None:
+        return Response(data, media_type=media_type, headers=headers)
+    start, end = selected
+    headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+    return Response(data[start:end + 1], status_code=206, media_type=media_type, headers=headers)
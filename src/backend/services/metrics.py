@@ -0,0 +1,346 @@
+# Request Metrics
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Per-route latency, payload sizes, Firestore RPCs and document reads, and Twilio/SendGrid call
+# latency in Prometheus format, plus an optional Server-Timing header splitting each request into
+# Firestore, external calls, encoding, handler code and the framework (parsing, validation, serialization).
+import asyncio
+import functools
+import inspect
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+from fastapi.routing import APIRoute
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+from starlette.datastructures import MutableHeaders
+
+METRICS_ENABLED = os.getenv("METRICS", "1") != "0"
+SERVER_TIMING = os.getenv("SERVER_TIMING") == "1"
+
+BACKGROUND = "background"  # label of work outside a request: outbox, forecaster, compaction
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+REQUEST_SECONDS = Histogram("rtha_http_request_duration_seconds", "Request latency", ["method", "route", "status"])
+PHASE_SECONDS = Histogram("rtha_http_request_phase_seconds", "Request time by phase", ["route", "phase"])
+REQUEST_BYTES = Histogram("rtha_http_request_size_bytes", "Request body size", ["route"], buckets=SIZE_BUCKETS)
+RESPONSE_BYTES = Histogram("rtha_http_response_size_bytes", "Response body size on the wire", ["route"], buckets=SIZE_BUCKETS)
+FIRESTORE_RPCS = Counter("rtha_firestore_rpcs_total", "Firestore RPCs", ["route", "rpc"])
+FIRESTORE_READS = Counter("rtha_firestore_documents_read_total", "Firestore documents read", ["route", "collection"])
+FIRESTORE_SECONDS = Histogram("rtha_firestore_rpc_duration_seconds", "Firestore RPC latency", ["rpc"])
+EXTERNAL_SECONDS = Histogram("rtha_external_call_duration_seconds", "Twilio and SendGrid call latency", ["service", "outcome"])
+SHARED_LOADS = Counter("rtha_singleflight_shared_total", "Reads answered by another caller's in-flight load", ["flight"])
+SHED_REQUESTS = Counter("rtha_admission_shed_total", "Requests turned away by admission control", ["lane", "reason"])
+
+
+class RequestMetrics:
+    """What one request spent its time on, shared with the threads that serve it."""
+
+    def __init__(self):
+        self.route: Optional[str] = None
+        self.phases: Dict[str, float] = {}
+        self.rpcs = 0
+        self.reads = 0
+        self.external_calls = 0
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def breakdown(self, total: float) -> Dict[str, float]:
+        endpoint = self.phases.get("endpoint", 0.0)
+        nested = sum(self.phases.get(phase, 0.0) for phase in ("firestore", "external", "encode"))
+        return {
+            "firestore": self.phases.get("firestore", 0.0),
+            "external": self.phases.get("external", 0.0),
+            "encode": self.phases.get("encode", 0.0),
+            "handler": max(endpoint - nested, 0.0),
+            "framework": max(total - endpoint, 0.0),
+        }
+
+    def server_timing(self, total: float) -> str:
+        descriptions = {
+            "firestore": f"{self.rpcs} rpc, {self.reads} reads",
+            "external": f"{self.external_calls} calls",
+        }
+        entries = [
+            f'{phase};dur={seconds * 1000:.1f}' + (f';desc="{descriptions[phase]}"' if phase in descriptions else "")
+            for phase, seconds in self.breakdown(total).items() if seconds
+        ]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+def _route() -> str:
+    metrics = _current.get()
+    return (metrics.route or "unmatched") if metrics else BACKGROUND
+
+
+class phase:
+    """Context manager adding the time of its block to a phase of the current request."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.add(self.name, time.perf_counter() - self.started)
+
+
+def _record_rpc(rpc: str, collection: Optional[str], seconds: float, reads: int):
+    route = _route()
+    FIRESTORE_RPCS.labels(route, rpc).inc()
+    FIRESTORE_SECONDS.labels(rpc).observe(seconds)
+    if reads:
+        FIRESTORE_READS.labels(route, collection or "unknown").inc(reads)
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add("firestore", seconds)
+        metrics.rpcs += 1
+        metrics.reads += reads
+
+
+def _unwrap(value: Any) -> Any:
+    if isinstance(value, TracedFirestore):
+        return value._target
+    if isinstance(value, list):
+        return [_unwrap(item) for item in value]
+    return value
+
+
+def _reads(result: Any) -> int:
+    if isinstance(result, list):
+        return sum(_reads(item) for item in result)
+    return 1 if getattr(result, "exists", False) else 0
+
+
+class TracedFirestore:
+    """Thin proxy over a Firestore client, query, reference or batch that times every RPC.
+
+    Works the same over `firestore.Client` and `AsyncClient`: generators and async generators
+    are timed across their iteration, awaitables when awaited. Everything else passes through.
+    """
+
+    BUILDERS = {"collection", "document", "where", "limit", "select", "order_by", "start_after", "offset", "batch"}
+    WRITES = {"set", "update", "delete", "create", "commit", "add"}
+
+    def __init__(self, target: Any, collection: Optional[str] = None, kind: str = "client"):
+        self._target = target
+        self._collection = collection
+        self._kind = kind
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._target, name)
+        if self._kind == "batch" and name != "commit":
+            # Staging a write in a batch is local; the batch's commit is the RPC
+            return lambda *args, **kwargs: attribute(*_unwrap(args), **kwargs)
+        if name in self.BUILDERS:
+            return functools.partial(self._build, name, attribute)
+        if name in self.WRITES:
+            return functools.partial(self._call, "commit", attribute, 0)
+        if name == "get":
+            return functools.partial(self._call, "get" if self._kind == "document" else "query", attribute, 1)
+        if name == "stream":
+            return functools.partial(self._call, "query", attribute, 1)
+        if name == "get_all":
+            return functools.partial(self._call, "batch_get", attribute, 1)
+        return attribute
+
+    def _build(self, name: str, method: Callable, *args, **kwargs) -> "TracedFirestore":
+        collection = args[0] if name == "collection" and args else self._collection
+        kind = {"document": "document", "batch": "batch"}.get(name, "query")
+        return TracedFirestore(method(*args, **kwargs), collection, kind)
+
+    def _call(self, rpc: str, method: Callable, counts_reads: int, *args, **kwargs) -> Any:
+        collection = self._collection
+        if rpc == "batch_get" and args and isinstance(args[0], list):
+            collection = next((item._collection for item in args[0] if isinstance(item, TracedFirestore)), collection)
+
+        started = time.perf_counter()
+        result = method(*_unwrap(args), **kwargs)
+        elapsed = time.perf_counter() - started
+        if inspect.isasyncgen(result):
+            return self._iterate_async(rpc, collection, result, counts_reads, elapsed)
+        if inspect.isgenerator(result):
+            return self._iterate(rpc, collection, result, counts_reads, elapsed)
+        if inspect.isawaitable(result):
+            return self._await(rpc, collection, result, counts_reads, elapsed)
+        _record_rpc(rpc, collection, elapsed, _reads(result) if counts_reads else 0)
+        return result
+
+    @staticmethod
+    def _iterate(rpc, collection, generator, counts_reads, elapsed):
+        reads = 0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - started
+                reads += _reads(item) if counts_reads else 0
+                yield item
+        finally:
+            generator.close()
+            _record_rpc(rpc, collection, elapsed, reads)
+
+    @staticmethod
+    async def _iterate_async(rpc, collection, generator, counts_reads, elapsed):
+        reads = 0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = await generator.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - started
+                reads += _reads(item) if counts_reads else 0
+                yield item
+        finally:
+            await generator.aclose()
+            _record_rpc(rpc, collection, elapsed, reads)
+
+    @staticmethod
+    async def _await(rpc, collection, awaitable, counts_reads, elapsed):
+        started = time.perf_counter()
+        result = await awaitable
+        elapsed += time.perf_counter() - started
+        _record_rpc(rpc, collection, elapsed, _reads(result) if counts_reads else 0)
+        return result
+
+
+def traced(db):
+    """`db` behind a TracedFirestore, or as is when metrics are off."""
+    return TracedFirestore(db) if METRICS_ENABLED and db is not None else db
+
+
+def _failed(result: Any) -> bool:
+    if isinstance(result, dict):
+        return result.get("code") not in (0, None)
+    return result is False
+
+
+def timed_external(service: str):
+    """Decorator recording the latency and outcome of a Twilio or SendGrid call."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = function(*args, **kwargs)
+                outcome = "error" if _failed(result) else "ok"
+                return result
+            finally:
+                elapsed = time.perf_counter() - started
+                EXTERNAL_SECONDS.labels(service, outcome).observe(elapsed)
+                metrics = _current.get()
+                if metrics is not None:
+                    metrics.add("external", elapsed)
+                    metrics.external_calls += 1
+        return wrapper
+    return decorator
+
+
+def _timed_endpoint(call: Callable) -> Callable:
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def timed(*args, **kwargs):
+            with phase("endpoint"):
+                return await call(*args, **kwargs)
+    else:
+        @functools.wraps(call)
+        def timed(*args, **kwargs):
+            # Runs on the threadpool, which inherits the request's context
+            with phase("endpoint"):
+                return call(*args, **kwargs)
+    return timed
+
+
+class TimedRoute(APIRoute):
+    """Route that labels the current request with its path template and times the endpoint alone."""
+
+    def get_route_handler(self) -> Callable:
+        self.dependant.call = _timed_endpoint(self.dependant.call)
+        handler = super().get_route_handler()
+        path = self.path
+
+        async def route_handler(request):
+            metrics = _current.get()
+            if metrics is not None:
+                metrics.route = path
+            return await handler(request)
+
+        return route_handler
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, phases and payload sizes per route template."""
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        sizes = {"request": 0, "response": 0}
+        status = 500
+
+        async def receive_counted():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["request"] += len(message.get("body", b""))
+            return message
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    MutableHeaders(scope=message).append("Server-Timing", metrics.server_timing(time.perf_counter() - started))
+            elif message["type"] == "http.response.body":
+                sizes["response"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_counted, send_timed)
+        finally:
+            total = time.perf_counter() - started
+            _current.reset(token)
+            route = metrics.route or "unmatched"
+            REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(total)
+            REQUEST_BYTES.labels(route).observe(sizes["request"])
+            RESPONSE_BYTES.labels(route).observe(sizes["response"])
+            for name, seconds in metrics.breakdown(total).items():
+                PHASE_SECONDS.labels(route, name).observe(seconds)
+
+
+def exposition() -> tuple:
+    """The metrics in Prometheus text format and their content type.
+
+    With PROMETHEUS_MULTIPROC_DIR set, the samples of all worker processes are merged.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,337 @@
+# Outbox
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Durable queue for outbound SMS and email. Handlers enqueue and return; a worker pool drains
+# the queue with exponential backoff and dead-letters messages that keep failing. Several
+# processes may share one queue file: a worker claims a message under a lease, and only a lease
+# that ran out is taken over, so one process starting never re-sends what another is sending.
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+import utility
+
+PRIORITY_EMERGENCY = 10
+PRIORITY_ROUTINE = 0
+
+Provider = Callable[[Dict[str, Any]], None]  # raises when the message was not sent
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    sent_at REAL,
+    last_error TEXT,
+    claimed_by TEXT,
+    claimed_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, priority DESC, next_attempt_at);
+"""
+
+# Added after the first release; queue files created before get them on open
+_LEASE_COLUMNS = {"claimed_by": "TEXT", "claimed_at": "REAL"}
+_LEASE_INDEX = "CREATE INDEX IF NOT EXISTS outbox_claims ON outbox (status, claimed_at)"
+
+
+
+def send_sms_provider(payload: Dict[str, Any]):
+    result = utility.send_sms(payload["to"], payload["body"])
+    if result["code"] != 0:
+        raise RuntimeError(result["message"])
+
+
+def send_email_provider(payload: Dict[str, Any]):
+    if not utility.send_email(payload["to"], payload["html_content"]):
+        raise RuntimeError("SendGrid rejected the message")
+
+
+def send_email_digest_provider(payload: Dict[str, Any]):
+    if not utility.send_email_digest(payload["recipients"]):
+        raise RuntimeError("SendGrid rejected the digest")
+
+
+class FakeProvider:
+    """Local stand-in for Twilio/SendGrid that records messages and can fail or lag on demand."""
+
+    def __init__(self, failure_rate: float = 0.0, latency: float = 0.0):
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.sent: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, payload: Dict[str, Any]):
+        if self.latency:
+            time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise RuntimeError("fake provider failure")
+        with self._lock:
+            self.sent.append(payload)
+
+
+class Outbox:
+    def __init__(
+        self,
+        path: str,
+        providers: Dict[str, Provider],
+        workers: int = 4,
+        max_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 300.0,
+        poll_interval: float = 1.0,
+        lease: float = 120.0,
+        sent_retention: float = 7 * 86400,
+        purge_interval: float = 3600.0,
+    ):
+        self.path = path
+        self.providers = providers
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        # Longer than any provider call, or a slow send would be taken over and sent twice
+        self.lease = lease
+        self.sent_retention = sent_retention
+        self.purge_interval = purge_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.purged = 0
+        self._purged_at = 0.0
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+        self._send_latency = deque(maxlen=1000)  # seconds spent in the provider call
+        self._delivery_latency = deque(maxlen=1000)  # seconds from enqueue to sent
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            # Other processes sharing the file hold the write lock for a statement at a time
+            self._connection.execute("PRAGMA busy_timeout=5000")
+            self._connection.executescript(_SCHEMA)
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(outbox)")}
+            for column, kind in _LEASE_COLUMNS.items():
+                if column not in columns:
+                    self._connection.execute(f"ALTER TABLE outbox ADD COLUMN {column} {kind}")
+            self._connection.execute(_LEASE_INDEX)
+        return self._connection
+
+    @contextmanager
+    def transaction(self):
+        """Connection to the outbox database inside one write transaction, for callers that keep
+        their own tables next to the queue and enqueue atomically with them."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        self._wakeup.set()
+
+    def insert(self, connection: sqlite3.Connection, kind: str, payload: Dict[str, Any], priority: int = PRIORITY_ROUTINE) -> int:
+        if kind not in self.providers:
+            raise ValueError(f"No provider for outbox messages of kind '{kind}'")
+        now = time.time()
+        cursor = connection.execute(
+            "INSERT INTO outbox (kind, payload, priority, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)",
+            (kind, json.dumps(payload), priority, now, now),
+        )
+        return cursor.lastrowid
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], priority: int = PRIORITY_ROUTINE) -> int:
+        with self.transaction() as connection:
+            return self.insert(connection, kind, payload, priority)
+
+    def _claim(self) -> Optional[tuple]:
+        now = time.time()
+        with self._lock:
+            # One statement, so claiming is atomic across processes too. A message whose sender
+            # died mid-send is claimed again once its lease ran out (at-least-once delivery).
+            return self._db.execute(
+                """
+                UPDATE outbox SET status = 'sending', attempts = attempts + 1, claimed_by = ?, claimed_at = ?
+                WHERE id = (
+                    SELECT id FROM outbox
+                    WHERE (status = 'pending' AND next_attempt_at <= ?) OR (status = 'sending' AND claimed_at <= ?)
+                    ORDER BY priority DESC, id LIMIT 1
+                )
+                RETURNING id, kind, payload, attempts, created_at
+                """,
+                (self.owner, now, now, now - self.lease),
+            ).fetchone()
+
+    def _finish(self, message_id: int, sql: str, parameters: tuple):
+        # Only while the claim is still ours; a worker whose lease was taken over leaves the row alone
+        with self._lock:
+            self._db.execute(
+                f"UPDATE outbox SET {sql}, claimed_by = NULL, claimed_at = NULL WHERE id = ? AND status = 'sending' AND claimed_by = ?",
+                (*parameters, message_id, self.owner),
+            )
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def process_one(self) -> bool:
+        """Send the next due message, returning False when nothing was due."""
+        message = self._claim()
+        if message is None:
+            return False
+        message_id, kind, payload, attempts, created_at = message
+
+        started = time.monotonic()
+        try:
+            self.providers[kind](json.loads(payload))
+        except Exception as e:
+            print(f"Outbox message {message_id} ({kind}) failed, attempt {attempts}: {e}")
+            status = "dead" if attempts >= self.max_attempts else "pending"
+            self._finish(message_id, "status = ?, next_attempt_at = ?, last_error = ?", (status, time.time() + self._backoff(attempts), str(e)))
+            return True
+
+        now = time.time()
+        self._send_latency.append(time.monotonic() - started)
+        self._delivery_latency.append(now - created_at)
+        self._finish(message_id, "status = 'sent', sent_at = ?, last_error = NULL", (now,))
+        return True
+
+    def purge(self, now: Optional[float] = None) -> int:
+        """Delete messages sent more than `sent_retention` seconds ago, returning how many."""
+        cutoff = (now or time.time()) - self.sent_retention
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?", (cutoff,)).rowcount
+            self.purged += deleted
+        return deleted
+
+    def _maybe_purge(self):
+        now = time.time()
+        with self._lock:
+            if self.sent_retention <= 0 or now - self._purged_at < self.purge_interval:
+                return
+            self._purged_at = now
+        try:
+            self.purge(now)
+        except Exception as e:
+            print(f"Outbox purge failed: {e}")
+
+    def _work(self):
+        while not self._stopping.is_set():
+            if not self.process_one():
+                self._maybe_purge()
+                # An enqueue between the empty claim and this wait leaves the event set
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"outbox-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def status(self, message_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Delivery state of the given messages; ids purged or never queued are left out."""
+        if not message_ids:
+            return {}
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, kind, status, attempts, last_error, created_at, sent_at FROM outbox WHERE id IN ({','.join('?' * len(message_ids))})",
+                list(message_ids),
+            ).fetchall()
+        return {
+            row[0]: {"id": row[0], "kind": row[1], "status": row[2], "attempts": row[3], "last_error": row[4], "created_at": row[5], "sent_at": row[6]}
+            for row in rows
+        }
+
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, kind, payload, attempts, last_error, created_at FROM outbox WHERE status = 'dead' ORDER BY id DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [
+            {"id": row[0], "kind": row[1], "payload": json.loads(row[2]), "attempts": row[3], "last_error": row[4], "created_at": row[5]}
+            for row in rows
+        ]
+
+    def retry(self, message_id: int) -> bool:
+        """Move a dead letter back to the queue."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE id = ? AND status = 'dead'",
+                (time.time(), message_id),
+            )
+        self._wakeup.set()
+        return cursor.rowcount > 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+        return {
+            "depth": counts.get("pending", 0) + counts.get("sending", 0),
+            "pending": counts.get("pending", 0),
+            "sending": counts.get("sending", 0),
+            "sent": counts.get("sent", 0),
+            "dead": counts.get("dead", 0),
+            "workers": len(self._threads),
+            "purged": self.purged,
+            "send_latency": _percentiles(self._send_latency),
+            "delivery_latency": _percentiles(self._delivery_latency),
+        }
+
+
+def _percentiles(samples) -> Dict[str, Optional[float]]:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50": None, "p95": None, "max": None}
+    return {
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+def _default_providers() -> Dict[str, Provider]:
+    if os.getenv("OUTBOX_PROVIDERS") == "fake":
+        return {"sms": FakeProvider(), "email": FakeProvider(), "email_digest": FakeProvider()}
+    return {"sms": send_sms_provider, "email": send_email_provider, "email_digest": send_email_digest_provider}
+
+
+outbox = Outbox(
+    os.getenv("OUTBOX_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "outbox.db")),
+    _default_providers(),
+    workers=int(os.getenv("OUTBOX_WORKERS", "8")),
+    max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5")),
+    lease=float(os.getenv("OUTBOX_LEASE", "120")),
+    sent_retention=float(os.getenv("OUTBOX_SENT_RETENTION", str(7 * 86400))),
+)
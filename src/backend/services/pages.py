@@ -0,0 +1,223 @@
+# List Pages
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Keyset-paginated, projected and streamed reads of a user's collection, so a request holds at
+# most one page (or one document, when streamed) in memory however large the collection grows.
+import base64
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from services.delta import list_changes, list_changes_async, utc_since
+from services.documents import TOMBSTONES
+
+# Always read so deltas can be merged and cursors built, whatever the caller projected
+MERGE_FIELDS = ["id", "updated_at"]
+
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _encode_cursor(name: str, updated_at: Optional[datetime], watermark: Optional[datetime]) -> str:
+    state = {"n": name, "t": updated_at, "w": watermark}
+    return base64.urlsafe_b64encode(json.dumps(state, default=_json_default).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {
+            "name": state["n"],
+            "updated_at": datetime.fromisoformat(state["t"]) if state["t"] else None,
+            "watermark": datetime.fromisoformat(state["w"]) if state["w"] else None,
+        }
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def _queries(db, collection: str, user_id: str, since, limit, after, fields):
+    query = db.collection(collection).where("user_id", "==", user_id)
+    if since is not None:
+        query = query.where("updated_at", ">=", since).order_by("updated_at")
+    query = query.order_by("__name__")
+    if after is not None:
+        position = {"__name__": after["name"]}
+        if since is not None:
+            position = {"updated_at": after["updated_at"], **position}
+        query = query.start_after(position)
+    if fields:
+        query = query.select(list(dict.fromkeys(fields + MERGE_FIELDS)))
+    if limit:
+        query = query.limit(limit)
+
+    # Deletions are reported with the first page only
+    tombstones = None
+    if since is not None and after is None:
+        tombstones = (
+            db.collection(TOMBSTONES)
+            .where("user_id", "==", user_id)
+            .where("collection", "==", collection)
+            .where("deleted_at", ">=", since)
+        )
+    return query, tombstones
+
+
+class Page:
+    """Folds tombstones and documents of one page into its deletions, watermark and next cursor."""
+
+    def __init__(self, since: Optional[datetime], limit: Optional[int], after: Optional[Dict[str, Any]]):
+        self.limit = limit
+        self.watermark = after["watermark"] if after else since
+        self.deleted: Dict[Any, datetime] = {}
+        self.count = 0
+        self.last = None
+
+    def _advance(self, value: Optional[datetime]):
+        if value is not None and (self.watermark is None or value > self.watermark):
+            self.watermark = value
+
+    def tombstone(self, data: Dict[str, Any]):
+        self.deleted[data["id"]] = data["deleted_at"]
+        self._advance(data["deleted_at"])
+
+    def document(self, name: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The document to return, or None when it was deleted after this version was written."""
+        self.count += 1
+        self.last = (name, data.get("updated_at"))
+        self._advance(data.get("updated_at"))
+        deleted_at = self.deleted.get(data.get("id"))
+        if deleted_at is not None:
+            if data.get("updated_at") is None or data["updated_at"] < deleted_at:
+                return None
+            # A record recreated after its deletion is reported as changed only
+            del self.deleted[data["id"]]
+        return data
+
+    def footer(self) -> Dict[str, Any]:
+        footer = {"deleted": list(self.deleted), "watermark": self.watermark}
+        if self.limit:
+            full = self.count == self.limit and self.last is not None
+            footer["next_cursor"] = _encode_cursor(self.last[0], self.last[1], self.watermark) if full else None
+        return footer
+
+
+def _plain(limit, cursor, fields) -> bool:
+    return not (limit or cursor or fields)
+
+
+def _start(db, collection, user_id, since, limit, cursor, fields):
+    # Runs before the response starts, so a bad cursor is still a 400 rather than a broken stream
+    since = utc_since(since)
+    after = decode_cursor(cursor) if cursor else None
+    query, tombstones = _queries(db, collection, user_id, since, limit, after, fields)
+    return query, tombstones, Page(since, limit, after)
+
+
+def list_page(
+    db,
+    collection: str,
+    user_id: str,
+    since: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """One page of `list_changes`, ordered by key (by `updated_at`, then key, with `since`).
+
+    Pass `next_cursor` back as `cursor` for the next page; it is None after the last one.
+    Unpaged, unprojected reads are served by `list_changes` and its cache.
+    """
+    if _plain(limit, cursor, fields):
+        return list_changes(db, collection, user_id, since)
+    query, tombstones, page = _start(db, collection, user_id, since, limit, cursor, fields)
+    for doc in tombstones.stream() if tombstones else []:
+        page.tombstone(doc.to_dict())
+    data = [item for item in (page.document(doc.id, doc.to_dict()) for doc in query.stream()) if item is not None]
+    return {"data": data, **page.footer()}
+
+
+async def list_page_async(
+    db,
+    collection: str,
+    user_id: str,
+    since: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    if _plain(limit, cursor, fields):
+        return await list_changes_async(db, collection, user_id, since)
+    query, tombstones, page = _start(db, collection, user_id, since, limit, cursor, fields)
+    if tombstones:
+        async for doc in tombstones.stream():
+            page.tombstone(doc.to_dict())
+    data = []
+    async for doc in query.stream():
+        item = page.document(doc.id, doc.to_dict())
+        if item is not None:
+            data.append(item)
+    return {"data": data, **page.footer()}
+
+
+def ndjson_line(value: Dict[str, Any]) -> bytes:
+    return (json.dumps(value, default=_json_default) + "\n").encode()
+
+
+def _stream(collection, user_id, query, tombstones, page: Page) -> Iterator[bytes]:
+    try:
+        for doc in tombstones.stream() if tombstones else []:
+            page.tombstone(doc.to_dict())
+        for doc in query.stream():
+            item = page.document(doc.id, doc.to_dict())
+            if item is not None:
+                yield ndjson_line({"data": item})
+        yield ndjson_line(page.footer())
+    except Exception as e:
+        print(f"Streaming {collection} of {user_id} failed: {e}")
+        yield ndjson_line({"code": -1, "message": str(e)})
+
+
+async def _stream_async(collection, user_id, query, tombstones, page: Page) -> AsyncIterator[bytes]:
+    try:
+        if tombstones:
+            async for doc in tombstones.stream():
+                page.tombstone(doc.to_dict())
+        async for doc in query.stream():
+            item = page.document(doc.id, doc.to_dict())
+            if item is not None:
+                yield ndjson_line({"data": item})
+        yield ndjson_line(page.footer())
+    except Exception as e:
+        print(f"Streaming {collection} of {user_id} failed: {e}")
+        yield ndjson_line({"code": -1, "message": str(e)})
+
+
+def stream_page(
+    db,
+    collection: str,
+    user_id: str,
+    since: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> Iterator[bytes]:
+    """NDJSON lines: `{"data": document}` per document as it arrives from Firestore, then one
+    `{"deleted", "watermark"[, "next_cursor"]}` line. A failure mid-stream ends it with `{"code": -1, "message"}`."""
+    return _stream(collection, user_id, *_start(db, collection, user_id, since, limit, cursor, fields))
+
+
+def stream_page_async(
+    db,
+    collection: str,
+    user_id: str,
+    since: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> AsyncIterator[bytes]:
+    return _stream_async(collection, user_id, *_start(db, collection, user_id, since, limit, cursor, fields))
@@ -0,0 +1,309 @@
+# Repository
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# One storage interface for the user collections of models/request.py, so handlers and jobs
+# list, upsert and delete without knowing the engine. STORAGE_BACKEND picks Firestore (default)
+# or the local SQLite engine in services/sqlite_repository.py.
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+from starlette.concurrency import iterate_in_threadpool
+
+from models.request import Appointment, EmergencyContact, Frequency, Medication, Notification, Setting
+from services.bulk import bulk_delete, bulk_delete_async, bulk_upsert, bulk_upsert_async
+from services.compaction import compact_notifications
+from services.documents import (
+    SUMMARIES, delete_document, delete_document_async, document_ref, transform_document, transform_document_async,
+    upsert_document, upsert_document_async,
+)
+from services.pages import list_page, list_page_async, stream_page, stream_page_async
+
+# Collection name -> the model its documents hold; settings are one document per user
+COLLECTIONS: Dict[str, Type[BaseModel]] = {
+    "settings": Setting,
+    "medications": Medication,
+    "frequencies": Frequency,
+    "appointments": Appointment,
+    "emergencies": EmergencyContact,
+    "notifications": Notification,
+}
+
+
+class Repository(ABC):
+    """Storage of the user collections.
+
+    `list_page` and `stream_page` take the same `since`/`limit`/`cursor`/`fields` as
+    `services.pages` and answer in its shapes; bulk operations answer with a `services.bulk`
+    report. The async methods run the sync ones on a worker thread unless an engine has a
+    native async client.
+    """
+
+    @abstractmethod
+    def list_page(self, collection: str, user_id: str, since: Optional[datetime] = None, limit: Optional[int] = None,
+                  cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def stream_page(self, collection: str, user_id: str, since: Optional[datetime] = None, limit: Optional[int] = None,
+                    cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Iterator[bytes]:
+        ...
+
+    @abstractmethod
+    def upsert(self, collection: str, data: Dict[str, Any]) -> Tuple[str, bool]:
+        """Write a document, returning its key and whether it was created rather than updated."""
+
+    @abstractmethod
+    def bulk_upsert(self, collection: str, user_id: str, items: List[BaseModel]) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def delete(self, collection: str, user_id: str, item_id: Optional[int] = None) -> bool:
+        ...
+
+    @abstractmethod
+    def bulk_delete(self, collection: str, user_id: str, ids: List[int]) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def scan(self, collection: str, fields: List[str]) -> List[Dict[str, Any]]:
+        """The given fields of every document in a collection, across users."""
+
+    @abstractmethod
+    def compact_notifications(self, retention_days: Optional[float] = None, max_per_user: Optional[int] = None,
+                              dry_run: bool = False, on_dropped: Optional[Callable[[str, List[int]], None]] = None) -> Dict[str, Any]:
+        """See services.compaction; `on_dropped(user_id, ids)` is called for the notifications each user lost."""
+
+    @abstractmethod
+    def read_summary(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """The user's summary document (services.summary), or None when there is none yet."""
+
+    @abstractmethod
+    def update_summary(self, user_id: str, change: Callable[[Optional[Dict[str, Any]]], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Atomically replace the user's summary with `change(current)`; None from `change` writes nothing.
+
+        `change` may run more than once when another write races it, so it must not have side effects.
+        """
+
+    @abstractmethod
+    def start(self):
+        """Bring up the engine's clients, in the background when that can be slow; called by the app's lifespan."""
+
+    @abstractmethod
+    def readiness(self) -> Dict[str, Any]:
+        """`ready` once the engine can serve requests, with the engine's own startup details."""
+
+    async def list_page_async(self, collection: str, user_id: str, **page) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.list_page, collection, user_id, **page)
+
+    def stream_page_async(self, collection: str, user_id: str, **page) -> AsyncIterator[bytes]:
+        # Started here so a bad cursor still fails before the response does
+        return iterate_in_threadpool(self.stream_page(collection, user_id, **page))
+
+    async def upsert_async(self, collection: str, data: Dict[str, Any]) -> Tuple[str, bool]:
+        return await asyncio.to_thread(self.upsert, collection, data)
+
+    async def bulk_upsert_async(self, collection: str, user_id: str, items: List[BaseModel]) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.bulk_upsert, collection, user_id, items)
+
+    async def delete_async(self, collection: str, user_id: str, item_id: Optional[int] = None) -> bool:
+        return await asyncio.to_thread(self.delete, collection, user_id, item_id)
+
+    async def bulk_delete_async(self, collection: str, user_id: str, ids: List[int]) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.bulk_delete, collection, user_id, ids)
+
+    async def read_summary_async(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.read_summary, user_id)
+
+    async def update_summary_async(self, user_id: str, change: Callable) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.update_summary, user_id, change)
+
+
+class FirestoreRepository(Repository):
+    """The collections as Firestore documents keyed `{user_id}_{id}`, through services.documents,
+    services.bulk and services.pages, on the sync client or the AsyncClient."""
+
+    def __init__(self, get_db: Callable[[], Any], get_async_db: Callable[[], Any]):
+        self.get_db = get_db
+        self.get_async_db = get_async_db
+
+    def start(self):
+        from services.clients import start
+
+        start(prewarm_channel=os.getenv("FIRESTORE_PREWARM") == "1")
+
+    def readiness(self):
+        from services.clients import readiness
+
+        return {"storage": "firestore", **readiness()}
+
+    def list_page(self, collection, user_id, since=None, limit=None, cursor=None, fields=None):
+        return list_page(self.get_db(), collection, user_id, since, limit, cursor, fields)
+
+    def stream_page(self, collection, user_id, since=None, limit=None, cursor=None, fields=None):
+        return stream_page(self.get_db(), collection, user_id, since, limit, cursor, fields)
+
+    def upsert(self, collection, data):
+        return upsert_document(self.get_db(), collection, data)
+
+    def bulk_upsert(self, collection, user_id, items):
+        return bulk_upsert(self.get_db(), collection, user_id, items)
+
+    def delete(self, collection, user_id, item_id=None):
+        return delete_document(self.get_db(), collection, user_id, item_id)
+
+    def bulk_delete(self, collection, user_id, ids):
+        return bulk_delete(self.get_db(), collection, user_id, ids)
+
+    def scan(self, collection, fields):
+        return [doc.to_dict() for doc in self.get_db().collection(collection).select(fields).stream()]
+
+    def compact_notifications(self, retention_days=None, max_per_user=None, dry_run=False, on_dropped=None):
+        return compact_notifications(self.get_db(), retention_days, max_per_user, dry_run, on_dropped=on_dropped)
+
+    def read_summary(self, user_id):
+        snapshot = document_ref(self.get_db(), SUMMARIES, user_id).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def update_summary(self, user_id, change):
+        db = self.get_db()
+        return transform_document(db, document_ref(db, SUMMARIES, user_id), change)
+
+    async def list_page_async(self, collection, user_id, **page):
+        return await list_page_async(self.get_async_db(), collection, user_id, **page)
+
+    def stream_page_async(self, collection, user_id, **page):
+        return stream_page_async(self.get_async_db(), collection, user_id, **page)
+
+    async def upsert_async(self, collection, data):
+        return await upsert_document_async(self.get_async_db(), collection, data)
+
+    async def bulk_upsert_async(self, collection, user_id, items):
+        return await bulk_upsert_async(self.get_async_db(), collection, user_id, items)
+
+    async def delete_async(self, collection, user_id, item_id=None):
+        return await delete_document_async(self.get_async_db(), collection, user_id, item_id)
+
+    async def bulk_delete_async(self, collection, user_id, ids):
+        return await bulk_delete_async(self.get_async_db(), collection, user_id, ids)
+
+    async def read_summary_async(self, user_id):
+        snapshot = await document_ref(self.get_async_db(), SUMMARIES, user_id).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    async def update_summary_async(self, user_id, change):
+        db = self.get_async_db()
+        return await transform_document_async(db, document_ref(db, SUMMARIES, user_id), change)
+
+
+class RepositoryWrapper(Repository):
+    """A repository handing every call to `repository`; subclasses override the calls they add work to."""
+
+    def __init__(self, repository: Repository):
+        self.repository = repository
+
+    def list_page(self, *args, **kwargs):
+        return self.repository.list_page(*args, **kwargs)
+
+    def stream_page(self, *args, **kwargs):
+        return self.repository.stream_page(*args, **kwargs)
+
+    def upsert(self, *args, **kwargs):
+        return self.repository.upsert(*args, **kwargs)
+
+    def bulk_upsert(self, *args, **kwargs):
+        return self.repository.bulk_upsert(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self.repository.delete(*args, **kwargs)
+
+    def bulk_delete(self, *args, **kwargs):
+        return self.repository.bulk_delete(*args, **kwargs)
+
+    def scan(self, *args, **kwargs):
+        return self.repository.scan(*args, **kwargs)
+
+    def compact_notifications(self, *args, **kwargs):
+        return self.repository.compact_notifications(*args, **kwargs)
+
+    def start(self):
+        self.repository.start()
+
+    def readiness(self):
+        return self.repository.readiness()
+
+    def read_summary(self, *args, **kwargs):
+        return self.repository.read_summary(*args, **kwargs)
+
+    def update_summary(self, *args, **kwargs):
+        return self.repository.update_summary(*args, **kwargs)
+
+    async def list_page_async(self, *args, **kwargs):
+        return await self.repository.list_page_async(*args, **kwargs)
+
+    def stream_page_async(self, *args, **kwargs):
+        return self.repository.stream_page_async(*args, **kwargs)
+
+    async def upsert_async(self, *args, **kwargs):
+        return await self.repository.upsert_async(*args, **kwargs)
+
+    async def bulk_upsert_async(self, *args, **kwargs):
+        return await self.repository.bulk_upsert_async(*args, **kwargs)
+
+    async def delete_async(self, *args, **kwargs):
+        return await self.repository.delete_async(*args, **kwargs)
+
+    async def bulk_delete_async(self, *args, **kwargs):
+        return await self.repository.bulk_delete_async(*args, **kwargs)
+
+    async def read_summary_async(self, *args, **kwargs):
+        return await self.repository.read_summary_async(*args, **kwargs)
+
+    async def update_summary_async(self, *args, **kwargs):
+        return await self.repository.update_summary_async(*args, **kwargs)
+
+
+_repository: Optional[Repository] = None
+
+
+def _create() -> Repository:
+    backend = os.getenv("STORAGE_BACKEND", "firestore")
+    if backend == "sqlite":
+        from services.sqlite_repository import SQLiteRepository
+
+        return SQLiteRepository(os.getenv("SQLITE_STORAGE_PATH", "storage.db"))
+    if backend == "firestore":
+        from services.clients import get_async_db, get_db
+
+        return FirestoreRepository(get_db, get_async_db)
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}'")
+
+
+def get_repository() -> Repository:
+    """The configured repository, created on first use."""
+    global _repository
+    if _repository is None:
+        repository = _create()
+        if os.getenv("IMAGE_OFFLOAD") == "1":
+            from services.images import ImageRepository, offload_refusal
+
+            refusal = offload_refusal()
+            if refusal is None:
+                repository = ImageRepository(repository)
+            else:
+                print(f"IMAGE_OFFLOAD ignored, inline images stay in their documents: {refusal}")
+        from services.schedule import ScheduleRepository
+        from services.summary import NotificationSummaryRepository
+
+        _repository = ScheduleRepository(NotificationSummaryRepository(repository))
+    return _repository
+
+
+def set_repository(repository: Repository):
+    global _repository
+    _repository = repository
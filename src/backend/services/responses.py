@@ -0,0 +1,93 @@
+# Route Responses
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# The request and response handling shared by the threadpool routes in main.py and the
+# AsyncClient routes in async_router.py, so each route only performs its storage call.
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Iterator, Optional, Tuple, Union
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from models.request import EmergencyDeleteRequest
+from services.encoding import CompactJSONResponse, encoded_response
+
+
+@contextmanager
+def http_errors(bad_request: bool = True):
+    """Map failures onto HTTP errors: ValueError to 400 when the request can cause it, anything else to 500."""
+    try:
+        yield
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400 if bad_request else 500, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def list_result(request: Request, changes: dict, label: str):
+    if not changes["data"] and not changes["deleted"]:
+        return encoded_response(request, {"code": 0, "message": f"No {label} found", **changes})
+
+    return encoded_response(request, {"code": 0, **changes})
+
+
+def stream_result(lines: Union[Iterator[bytes], AsyncIterator[bytes]]) -> StreamingResponse:
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+def data_result(request: Request, data):
+    return encoded_response(request, {"code": 0, "data": data})
+
+
+def added_result(result: Tuple[str, bool]) -> dict:
+    document_id, _ = result
+    return {"code": 0, "document_id": document_id}
+
+
+def updated_result(name: str, result: Tuple[str, bool], with_id: bool = False) -> dict:
+    """Answer an update with code 1 when the document did not exist and was added instead."""
+    document_id, created = result
+    if created:
+        response = {"code": 1, "message": f"{name} not found, so it was added."}
+    else:
+        response = {"code": 0, "message": f"{name} updated successfully!"}
+    if with_id:
+        response["document_id"] = document_id
+    return response
+
+
+def bulk_result(report: dict, label: str) -> CompactJSONResponse:
+    if report.get("failed"):
+        return CompactJSONResponse({"code": 1, "message": f"Some {label} failed to update.", "report": report})
+    return CompactJSONResponse({"code": 0, "message": f"{label.capitalize()} updated successfully!", "report": report})
+
+
+def deleted_result(deleted: bool, name: str) -> dict:
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"{name} not found")
+
+    return {"code": 0, "message": f"{name} deleted successfully!"}
+
+
+def emergency_ids(request: EmergencyDeleteRequest) -> list:
+    # Convert the contactList string to a list of IDs
+    return [int(emergency_id) for emergency_id in request.contactList.split(",")]
+
+
+def bulk_deleted_result(report: dict, label: str) -> dict:
+    deleted_count = report.get("deleted", 0)
+    if deleted_count == 0:
+        raise HTTPException(status_code=404, detail=f"No matching {label} found to delete.")
+
+    return {"code": 0, "message": f"{deleted_count} {label} deleted successfully!", "report": report}
+
+
+def schedule_window(start: Optional[datetime], end: Optional[datetime]) -> Tuple[datetime, datetime]:
+    """Default a schedule query to the day starting now."""
+    start = start or datetime.now()
+    return start, end or start + timedelta(days=1)
@@ -0,0 +1,371 @@
+# Dose Schedule
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Every user's dose instants, expanded once from their frequencies and medications and kept in
+# memory, sorted, for a window of days around today. A write re-expands only the frequencies it
+# touched, and range queries are a bisect into the sorted instants.
+import asyncio
+import bisect
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from time import monotonic
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from services.repository import RepositoryWrapper
+
+FREQUENCY_FIELDS = {"id", "medication_id", "dosage", "dosage_unit", "cycle", "times"}
+MEDICATION_FIELDS = {"id", "start_date", "end_date"}
+
+
+def _pick(item: Dict[str, Any], fields: set) -> Dict[str, Any]:
+    return {key: value for key, value in item.items() if key in fields}
+
+
+def _date(value: Any) -> Optional[date]:
+    try:
+        return date.fromisoformat(value[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def _times(value: Any) -> List[time]:
+    if isinstance(value, str):
+        value = value.split(",")
+    parsed = set()
+    for text in value or []:
+        try:
+            parsed.add(time.fromisoformat(text.strip()))
+        except (AttributeError, ValueError):
+            continue
+    return sorted(parsed)
+
+
+def expand(frequency: Dict[str, Any], medication: Optional[Dict[str, Any]], first: date, last: date) -> List[datetime]:
+    """Dose instants of a frequency from `first` to `last`, both included.
+
+    Doses fall at each of `times` on every `cycle`-th day from the medication's `start_date`,
+    up to its `end_date`. Times are the user's local wall-clock times, so instants are naive.
+    """
+    cycle = frequency.get("cycle") or 0
+    start = _date((medication or {}).get("start_date"))
+    times = _times(frequency.get("times"))
+    if cycle <= 0 or start is None or not times:
+        return []
+    end = _date(medication.get("end_date"))
+    if end is not None:
+        last = min(last, end)
+
+    day = max(first, start)
+    offset = (day - start).days % cycle
+    if offset:
+        day += timedelta(days=cycle - offset)
+    doses = []
+    while day <= last:
+        doses.extend(datetime.combine(day, at) for at in times)
+        day += timedelta(days=cycle)
+    return doses
+
+
+class _UserSchedule:
+    def __init__(self, first: date, last: date):
+        self.first = first
+        self.last = last
+        self.loaded_at = monotonic()
+        self.frequencies: Dict[int, Dict[str, Any]] = {}
+        self.medications: Dict[int, Dict[str, Any]] = {}
+        self.doses: Dict[int, List[datetime]] = {}  # frequency id -> its sorted instants
+        # Every dose in order, merged from `doses` on the first query after a change
+        self.instants: Optional[List[datetime]] = None
+        self.owners: List[int] = []  # frequency id of each instant
+
+
+class ScheduleIndex:
+    """Dose instants per user, from `past_days` before today to `days` after, for up to `max_users` users (LRU).
+
+    A user's schedule is loaded from storage at their first query; after that, writes through
+    ScheduleRepository update it in place. Like the list cache it is per process, so a schedule
+    is also read from storage again `ttl` seconds after its load: with several workers, writes
+    handled by another worker show up within that time.
+    """
+
+    def __init__(self, past_days: int, days: int, max_users: int, ttl: float = 300):
+        self.past_days = past_days
+        self.days = days
+        self.max_users = max_users
+        self.ttl = ttl
+        self._users: "OrderedDict[str, _UserSchedule]" = OrderedDict()
+        self._loading: Dict[str, bool] = {}  # user id -> written to while loading
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.expirations = 0
+        self.expansions = 0
+        self.queries = 0
+
+    def window(self, today: Optional[date] = None) -> Tuple[date, date]:
+        today = today or date.today()
+        return today - timedelta(days=self.past_days), today + timedelta(days=self.days)
+
+    def _expand(self, schedule: _UserSchedule, frequency_id: int):
+        # Called under self._lock
+        frequency = schedule.frequencies.get(frequency_id)
+        doses = []
+        if frequency is not None:
+            medication = schedule.medications.get(frequency.get("medication_id"))
+            doses = expand(frequency, medication, schedule.first, schedule.last)
+            self.expansions += 1
+        if doses:
+            schedule.doses[frequency_id] = doses
+        else:
+            schedule.doses.pop(frequency_id, None)
+        schedule.instants = None
+
+    def _build(self, frequencies: List[Dict[str, Any]], medications: List[Dict[str, Any]]) -> _UserSchedule:
+        schedule = _UserSchedule(*self.window())
+        schedule.frequencies = {item["id"]: _pick(item, FREQUENCY_FIELDS) for item in frequencies}
+        schedule.medications = {item["id"]: _pick(item, MEDICATION_FIELDS) for item in medications}
+        for frequency_id in schedule.frequencies:
+            self._expand(schedule, frequency_id)
+        return schedule
+
+    def _cached(self, user_id: str) -> Optional[_UserSchedule]:
+        # Called under self._lock; a schedule from before today's window is expanded again
+        schedule = self._users.get(user_id)
+        if schedule is None:
+            return None
+        if self.ttl > 0 and monotonic() - schedule.loaded_at >= self.ttl:
+            del self._users[user_id]
+            self.expirations += 1
+            return None
+        self._users.move_to_end(user_id)
+        window = self.window()
+        if (schedule.first, schedule.last) != window:
+            schedule.first, schedule.last = window
+            schedule.doses = {}
+            for frequency_id in schedule.frequencies:
+                self._expand(schedule, frequency_id)
+        return schedule
+
+    def _begin_load(self, user_id: str):
+        with self._lock:
+            self.loads += 1
+            self._loading[user_id] = False
+
+    def _finish_load(self, user_id: str, frequencies, medications) -> _UserSchedule:
+        with self._lock:
+            schedule = self._build(frequencies, medications)
+            # A write during the load may be missing from what was read, so keep it for this query only
+            if not self._loading.pop(user_id, True):
+                self._users[user_id] = schedule
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            return schedule
+
+    def _schedule(self, repository, user_id: str) -> _UserSchedule:
+        with self._lock:
+            schedule = self._cached(user_id)
+        if schedule is not None:
+            return schedule
+        self._begin_load(user_id)
+        frequencies = repository.list_page("frequencies", user_id)["data"]
+        medications = repository.list_page("medications", user_id)["data"]
+        return self._finish_load(user_id, frequencies, medications)
+
+    async def _schedule_async(self, repository, user_id: str) -> _UserSchedule:
+        with self._lock:
+            schedule = self._cached(user_id)
+        if schedule is not None:
+            return schedule
+        self._begin_load(user_id)
+        frequencies, medications = await asyncio.gather(
+            repository.list_page_async("frequencies", user_id),
+            repository.list_page_async("medications", user_id),
+        )
+        return self._finish_load(user_id, frequencies["data"], medications["data"])
+
+    def _doses(self, schedule: _UserSchedule, start: datetime, end: datetime, first_only: bool) -> List[Dict[str, Any]]:
+        with self._lock:
+            self.queries += 1
+            if schedule.instants is None:
+                instants = [at for doses in schedule.doses.values() for at in doses]
+                owners = [frequency_id for frequency_id, doses in schedule.doses.items() for _ in doses]
+                order = sorted(range(len(instants)), key=instants.__getitem__)
+                schedule.instants = [instants[index] for index in order]
+                schedule.owners = [owners[index] for index in order]
+            # Writes replace these lists rather than change them, so they can be read outside the lock
+            instants, owners, frequencies = schedule.instants, schedule.owners, dict(schedule.frequencies)
+
+        doses, seen = [], set()
+        for index in range(bisect.bisect_left(instants, start), bisect.bisect_left(instants, end)):
+            frequency = frequencies[owners[index]]
+            if first_only:
+                if frequency.get("medication_id") in seen:
+                    continue
+                seen.add(frequency.get("medication_id"))
+            doses.append({
+                "time": instants[index].isoformat(timespec="minutes"),
+                "medication_id": frequency.get("medication_id"),
+                "frequency_id": owners[index],
+                "dosage": frequency.get("dosage"),
+                "dosage_unit": frequency.get("dosage_unit"),
+            })
+        return doses
+
+    def _range(self, start: datetime, end: Optional[datetime]) -> Tuple[datetime, datetime]:
+        first, last = self.window()
+        horizon = datetime.combine(last + timedelta(days=1), time())
+        # Instants are local wall-clock times, so an offset on the query is dropped rather than converted
+        start, end = start.replace(tzinfo=None), (end or horizon).replace(tzinfo=None)
+        if end <= start:
+            raise ValueError("'to' must be after 'from'")
+        if start.date() < first or end > horizon:
+            raise ValueError(f"The schedule covers {first.isoformat()} to {last.isoformat()}")
+        return start, end
+
+    def query(self, repository, user_id: str, start: datetime, end: Optional[datetime] = None,
+              first_only: bool = False) -> List[Dict[str, Any]]:
+        """The user's doses from `start` up to `end` (the end of the window if None), in order.
+
+        With `first_only`, only the first dose of each medication. Raises ValueError when the
+        range is empty or outside the window.
+        """
+        start, end = self._range(start, end)
+        return self._doses(self._schedule(repository, user_id), start, end, first_only)
+
+    async def query_async(self, repository, user_id: str, start: datetime, end: Optional[datetime] = None,
+                          first_only: bool = False) -> List[Dict[str, Any]]:
+        start, end = self._range(start, end)
+        return self._doses(await self._schedule_async(repository, user_id), start, end, first_only)
+
+    def _written(self, user_id: str) -> Optional[_UserSchedule]:
+        # Called under self._lock
+        if user_id in self._loading:
+            self._loading[user_id] = True
+        return self._users.get(user_id)
+
+    def update(self, collection: str, user_id: str, items: Iterable[Dict[str, Any]]):
+        """Apply written frequencies or medications to the user's schedule, if it is loaded."""
+        with self._lock:
+            schedule = self._written(user_id)
+            if schedule is None:
+                return
+            for item in items:
+                if collection == "frequencies":
+                    schedule.frequencies[item["id"]] = _pick(item, FREQUENCY_FIELDS)
+                    self._expand(schedule, item["id"])
+                else:
+                    schedule.medications[item["id"]] = _pick(item, MEDICATION_FIELDS)
+                    self._expand_medication(schedule, item["id"])
+
+    def remove(self, collection: str, user_id: str, ids: Iterable[int]):
+        """Drop deleted frequencies or medications from the user's schedule, if it is loaded."""
+        with self._lock:
+            schedule = self._written(user_id)
+            if schedule is None:
+                return
+            for item_id in ids:
+                if collection == "frequencies":
+                    schedule.frequencies.pop(item_id, None)
+                    self._expand(schedule, item_id)
+                else:
+                    schedule.medications.pop(item_id, None)
+                    self._expand_medication(schedule, item_id)
+
+    def _expand_medication(self, schedule: _UserSchedule, medication_id: int):
+        # Called under self._lock; a medication's dates bound the doses of its frequencies
+        for frequency_id, frequency in schedule.frequencies.items():
+            if frequency.get("medication_id") == medication_id:
+                self._expand(schedule, frequency_id)
+
+    def stats(self) -> Dict[str, Any]:
+        first, last = self.window()
+        with self._lock:
+            doses = sum(len(doses) for schedule in self._users.values() for doses in schedule.doses.values())
+            return {
+                "users": len(self._users),
+                "max_users": self.max_users,
+                "ttl": self.ttl,
+                "doses": doses,
+                "window": {"from": first.isoformat(), "to": last.isoformat()},
+                "loads": self.loads,
+                "expirations": self.expirations,
+                "expansions": self.expansions,
+                "queries": self.queries,
+            }
+
+
+schedule_index = ScheduleIndex(
+    past_days=int(os.getenv("SCHEDULE_PAST_DAYS", "1")),
+    days=int(os.getenv("SCHEDULE_DAYS", "31")),
+    max_users=int(os.getenv("SCHEDULE_MAX_USERS", "1000")),
+    ttl=float(os.getenv("SCHEDULE_TTL", "300")),
+)
+
+SCHEDULE_COLLECTIONS = {"frequencies", "medications"}
+
+
+def _succeeded(report: Dict[str, Any], statuses: set) -> set:
+    return {item["id"] for item in report.get("items", []) if item.get("status") in statuses}
+
+
+class ScheduleRepository(RepositoryWrapper):
+    """Repository wrapper keeping the schedule index in step with frequency and medication writes."""
+
+    def __init__(self, repository, index: ScheduleIndex = schedule_index):
+        super().__init__(repository)
+        self.index = index
+
+    def _upserted(self, collection, user_id, items, report):
+        written = _succeeded(report, {"created", "updated"})
+        self.index.update(collection, user_id, (item.model_dump() for item in items if item.id in written))
+
+    def upsert(self, collection, data):
+        result = self.repository.upsert(collection, data)
+        if collection in SCHEDULE_COLLECTIONS:
+            self.index.update(collection, data["user_id"], [data])
+        return result
+
+    def bulk_upsert(self, collection, user_id, items):
+        report = self.repository.bulk_upsert(collection, user_id, items)
+        if collection in SCHEDULE_COLLECTIONS:
+            self._upserted(collection, user_id, items, report)
+        return report
+
+    def delete(self, collection, user_id, item_id=None):
+        deleted = self.repository.delete(collection, user_id, item_id)
+        if collection in SCHEDULE_COLLECTIONS and deleted:
+            self.index.remove(collection, user_id, [item_id])
+        return deleted
+
+    def bulk_delete(self, collection, user_id, ids):
+        report = self.repository.bulk_delete(collection, user_id, ids)
+        if collection in SCHEDULE_COLLECTIONS:
+            self.index.remove(collection, user_id, _succeeded(report, {"deleted"}))
+        return report
+
+    async def upsert_async(self, collection, data):
+        result = await self.repository.upsert_async(collection, data)
+        if collection in SCHEDULE_COLLECTIONS:
+            self.index.update(collection, data["user_id"], [data])
+        return result
+
+    async def bulk_upsert_async(self, collection, user_id, items):
+        report = await self.repository.bulk_upsert_async(collection, user_id, items)
+        if collection in SCHEDULE_COLLECTIONS:
+            self._upserted(collection, user_id, items, report)
+        return report
+
+    async def delete_async(self, collection, user_id, item_id=None):
+        deleted = await self.repository.delete_async(collection, user_id, item_id)
+        if collection in SCHEDULE_COLLECTIONS and deleted:
+            self.index.remove(collection, user_id, [item_id])
+        return deleted
+
+    async def bulk_delete_async(self, collection, user_id, ids):
+        report = await self.repository.bulk_delete_async(collection, user_id, ids)
+        if collection in SCHEDULE_COLLECTIONS:
+            self.index.remove(collection, user_id, _succeeded(report, {"deleted"}))
+        return report
@@ -0,0 +1,108 @@
+# Single Flight
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Coalesces concurrent identical reads: the first caller for a key runs the loader and every
+# caller that arrives while it is in flight waits for that result instead of running its own.
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from services.metrics import SHARED_LOADS
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """At most one load in flight per key, shared by the threads or coroutines asking for it.
+
+    Threads and coroutines have separate flights, since a coroutine must not block its event
+    loop on a threading.Event. `forget` detaches in-flight loads, so callers arriving after a
+    write start a fresh one rather than receive a result read before it.
+    """
+
+    def __init__(self, name: str, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+        self.flights = 0
+        self.shared = 0
+
+    def _count(self, leader: bool):
+        # Called under self._lock
+        if leader:
+            self.flights += 1
+        else:
+            self.shared += 1
+            SHARED_LOADS.labels(self.name).inc()
+
+    def do(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        if not self.enabled:
+            return loader()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count(leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = loader()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await loader()
+        with self._lock:
+            task = self._tasks.get(key)
+            leader = task is None
+            if leader:
+                task = self._tasks[key] = asyncio.ensure_future(loader())
+                task.add_done_callback(lambda done: self._finish(key, done))
+            self._count(leader)
+        # Shielded so one caller going away does not cancel the load for the others
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every waiter was cancelled
+
+    def forget(self, match: Callable[[Hashable], bool]):
+        """Detach the in-flight loads whose key matches; their current waiters still get the result."""
+        with self._lock:
+            for calls in (self._calls, self._tasks):
+                for key in [key for key in calls if match(key)]:
+                    del calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "flights": self.flights,
+            "shared": self.shared,
+            "in_flight": len(self._calls) + len(self._tasks),
+        }
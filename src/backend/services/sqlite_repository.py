@@ -0,0 +1,342 @@
+# SQLite Repository
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# The user collections in one local SQLite file, for self-hosted or edge deployments where a
+# Firestore round trip costs more than the request itself. Each collection is a table keyed by
+# (user_id, id) with an index on updated_at for delta sync; deletions leave tombstones as they
+# do in Firestore, so `since`, cursors and the change notifications behave the same.
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from services.bulk import BATCH_LIMIT, bulk_report
+from services.delta import utc_since
+from services.documents import CREATED_AT_COLLECTIONS, document_id, notify_write
+from services.pages import MERGE_FIELDS, Page, decode_cursor, ndjson_line
+from services.repository import COLLECTIONS, Repository
+
+SINGLETON_ID = 0  # key of one-per-user documents such as settings
+
+_COLLECTION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    user_id TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (user_id, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS {table}_updated ON {table} (user_id, updated_at, id);
+"""
+
+_TOMBSTONE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tombstones (
+    collection TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    deleted_at TEXT NOT NULL,
+    PRIMARY KEY (collection, user_id, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tombstones_deleted ON tombstones (collection, user_id, deleted_at);
+CREATE TABLE IF NOT EXISTS summaries (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Rows written before created_at was kept take their last write time as their creation time
+_CREATED_AT_BACKFILL = """
+UPDATE {table} SET data = json_set(data, '$.created_at', updated_at) WHERE json_extract(data, '$.created_at') IS NULL;
+"""
+
+
+def _table(collection: str) -> str:
+    # Table names come from this whitelist only, never from the request
+    if collection not in COLLECTIONS:
+        raise ValueError(f"Unknown collection '{collection}'")
+    return collection
+
+
+def _key(item_id: Optional[int]) -> int:
+    return SINGLETON_ID if item_id is None else item_id
+
+
+def _timestamp(value: datetime) -> str:
+    # Fixed-width UTC ISO strings sort in time order, so the indexes can range over them
+    return value.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _chunks(items: List[Any]) -> Iterator[List[Any]]:
+    for start in range(0, len(items), BATCH_LIMIT):
+        yield items[start:start + BATCH_LIMIT]
+
+
+class SQLiteRepository(Repository):
+    """Repository over one SQLite file in WAL mode: readers never wait for the writer.
+
+    Each thread reads on its own connection and each stream on a connection of its own, since
+    a response stream moves between threads; writes take one process-wide lock and a
+    `BEGIN IMMEDIATE` transaction, so a bulk write commits all at once.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._last_stamp: Optional[datetime] = None
+
+    def _open(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=check_same_thread)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA busy_timeout=5000")
+        with self._schema_lock:
+            if not self._schema_ready:
+                connection.executescript(
+                    "".join(_COLLECTION_SCHEMA.format(table=table) for table in COLLECTIONS) + _TOMBSTONE_SCHEMA
+                    + "".join(_CREATED_AT_BACKFILL.format(table=table) for table in CREATED_AT_COLLECTIONS)
+                )
+                self._schema_ready = True
+        return connection
+
+    def start(self):
+        # Creates the schema up front, so the first request does not wait for it
+        try:
+            self._connection()
+        except sqlite3.Error as e:
+            print(f"SQLite storage at {self.path} failed to open: {e}")
+
+    def readiness(self):
+        try:
+            self._connection().execute("SELECT 1")
+        except sqlite3.Error as e:
+            return {"ready": False, "storage": "sqlite", "error": str(e)}
+        return {"ready": True, "storage": "sqlite", "error": None}
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._open()
+        return connection
+
+    @contextmanager
+    def _write(self):
+        with self._write_lock:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def _stamp(self) -> datetime:
+        # Called under the write lock; never goes backwards, so watermarks stay monotonic
+        now = datetime.now(timezone.utc)
+        if self._last_stamp is not None and now <= self._last_stamp:
+            now = self._last_stamp + timedelta(microseconds=1)
+        self._last_stamp = now
+        return now
+
+    def _existing(self, connection, table: str, user_id: str, keys: List[int]) -> Dict[int, Dict[str, Any]]:
+        existing = {}
+        for chunk in _chunks(keys):
+            rows = connection.execute(
+                f"SELECT id, data FROM {table} WHERE user_id = ? AND id IN ({','.join('?' * len(chunk))})",
+                [user_id, *chunk],
+            )
+            existing.update((row[0], json.loads(row[1])) for row in rows)
+        return existing
+
+    def _upsert_rows(self, connection, table: str, user_id: str, payload: Dict[int, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        existing = self._existing(connection, table, user_id, list(payload))
+        updated_at = _timestamp(self._stamp())
+        created = {"created_at": updated_at} if table in CREATED_AT_COLLECTIONS else {}
+        # Top-level fields merge into the stored document, as Firestore's set(merge=True) does
+        connection.executemany(
+            f"INSERT OR REPLACE INTO {table} (user_id, id, data, updated_at) VALUES (?, ?, ?, ?)",
+            [(user_id, key, json.dumps({**existing.get(key, created), **data}), updated_at) for key, data in payload.items()],
+        )
+        return [{"id": key, "status": "updated" if key in existing else "created"} for key in payload]
+
+    def _delete_rows(self, connection, collection: str, user_id: str, keys: List[int]) -> List[int]:
+        table = _table(collection)
+        existing = self._existing(connection, table, user_id, keys)
+        deleted_at = _timestamp(self._stamp())
+        connection.executemany(f"DELETE FROM {table} WHERE user_id = ? AND id = ?", [(user_id, key) for key in existing])
+        connection.executemany(
+            "INSERT OR REPLACE INTO tombstones (collection, user_id, id, deleted_at) VALUES (?, ?, ?, ?)",
+            [(collection, user_id, key, deleted_at) for key in existing],
+        )
+        return list(existing)
+
+    def upsert(self, collection, data):
+        table = _table(collection)
+        try:
+            with self._write() as connection:
+                [result] = self._upsert_rows(connection, table, data["user_id"], {_key(data.get("id")): data})
+        finally:
+            notify_write(collection, data["user_id"])
+        return document_id(data["user_id"], data.get("id")), result["status"] == "created"
+
+    def bulk_upsert(self, collection, user_id, items):
+        table = _table(collection)
+        # The last occurrence of a repeated id wins, as it would have in a sequential sync
+        payload = {item.id: item.model_dump() for item in items}
+        try:
+            with self._write() as connection:
+                results = self._upsert_rows(connection, table, user_id, payload)
+        except Exception as e:
+            print(f"Bulk commit failed: {e}")
+            results = [{"id": key, "status": "failed", "error": str(e)} for key in payload]
+        notify_write(collection, user_id)
+        return bulk_report(results)
+
+    def delete(self, collection, user_id, item_id=None):
+        try:
+            with self._write() as connection:
+                return bool(self._delete_rows(connection, collection, user_id, [_key(item_id)]))
+        finally:
+            notify_write(collection, user_id)
+
+    def bulk_delete(self, collection, user_id, ids):
+        keys = list(dict.fromkeys(ids))
+        try:
+            with self._write() as connection:
+                deleted = set(self._delete_rows(connection, collection, user_id, keys))
+        finally:
+            notify_write(collection, user_id)
+        return bulk_report(
+            [{"id": key, "status": "deleted"} for key in keys if key in deleted]
+            + [{"id": key, "status": "not_found"} for key in keys if key not in deleted]
+        )
+
+    def _start(self, connection, collection, user_id, since, limit, cursor, fields):
+        table = _table(collection)
+        since = utc_since(since)
+        after = decode_cursor(cursor) if cursor else None
+        page = Page(since, limit, after)
+
+        # Deletions are reported with the first page only
+        if since is not None and after is None:
+            rows = connection.execute(
+                "SELECT id, deleted_at FROM tombstones WHERE collection = ? AND user_id = ? AND deleted_at >= ?",
+                (collection, user_id, _timestamp(since)),
+            )
+            for item_id, deleted_at in rows:
+                page.tombstone({"id": item_id, "deleted_at": datetime.fromisoformat(deleted_at)})
+
+        sql, parameters = f"SELECT id, data, updated_at FROM {table} WHERE user_id = ?", [user_id]
+        if since is not None:
+            # `>=` re-delivers records stamped exactly at the watermark rather than risk skipping one
+            sql += " AND updated_at >= ?"
+            parameters.append(_timestamp(since))
+            if after is not None:
+                sql += " AND (updated_at, id) > (?, ?)"
+                parameters += [_timestamp(after["updated_at"]), int(after["name"])]
+            sql += " ORDER BY updated_at, id"
+        else:
+            if after is not None:
+                sql += " AND id > ?"
+                parameters.append(int(after["name"]))
+            sql += " ORDER BY id"
+        if limit:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+
+        selected = list(dict.fromkeys(fields + MERGE_FIELDS)) if fields else None
+        return connection.execute(sql, parameters), selected, page
+
+    @staticmethod
+    def _document(row, selected: Optional[List[str]]) -> Dict[str, Any]:
+        data = json.loads(row[1])
+        data["updated_at"] = datetime.fromisoformat(row[2])
+        if selected:
+            data = {field: data[field] for field in selected if field in data}
+        return data
+
+    def list_page(self, collection, user_id, since=None, limit=None, cursor=None, fields=None):
+        rows, selected, page = self._start(self._connection(), collection, user_id, since, limit, cursor, fields)
+        data = [item for item in (page.document(str(row[0]), self._document(row, selected)) for row in rows) if item is not None]
+        return {"data": data, **page.footer()}
+
+    def stream_page(self, collection, user_id, since=None, limit=None, cursor=None, fields=None):
+        connection = self._open(check_same_thread=False)
+        try:
+            rows, selected, page = self._start(connection, collection, user_id, since, limit, cursor, fields)
+        except Exception:
+            connection.close()
+            raise
+
+        def lines():
+            try:
+                for row in rows:
+                    item = page.document(str(row[0]), self._document(row, selected))
+                    if item is not None:
+                        yield ndjson_line({"data": item})
+                yield ndjson_line(page.footer())
+            except Exception as e:
+                print(f"Streaming {collection} of {user_id} failed: {e}")
+                yield ndjson_line({"code": -1, "message": str(e)})
+            finally:
+                connection.close()
+
+        return lines()
+
+    def scan(self, collection, fields):
+        rows = self._connection().execute(f"SELECT id, data, updated_at FROM {_table(collection)}")
+        return [self._document(row, fields) for row in rows]
+
+    def read_summary(self, user_id):
+        row = self._connection().execute("SELECT data FROM summaries WHERE user_id = ?", (user_id,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def update_summary(self, user_id, change):
+        # The read and the write share the write transaction, so no other update can land in between
+        with self._write() as connection:
+            row = connection.execute("SELECT data FROM summaries WHERE user_id = ?", (user_id,)).fetchone()
+            data = change(None if row is None else json.loads(row[0]))
+            if data is not None:
+                connection.execute("INSERT OR REPLACE INTO summaries (user_id, data) VALUES (?, ?)", (user_id, json.dumps(data)))
+        return data
+
+    def compact_notifications(self, retention_days=None, max_per_user=None, dry_run=False, on_dropped=None):
+        # Keys make duplicates impossible here, so compaction is the retention window and the cap
+        report = {"scanned": 0, "duplicates": 0, "moved": 0, "dated": 0, "expired": 0, "over_cap": 0}
+        cutoff = _timestamp(datetime.now(timezone.utc) - timedelta(days=retention_days)) if retention_days else None
+        dropped: Dict[str, List[int]] = {}
+        rows = self._connection().execute(
+            "SELECT user_id, id, json_extract(data, '$.created_at') AS created_at FROM notifications ORDER BY user_id, created_at DESC"
+        )
+        rank, previous = 0, None
+        for user_id, item_id, created_at in rows:
+            report["scanned"] += 1
+            rank = rank + 1 if user_id == previous else 0
+            previous = user_id
+            if cutoff is not None and created_at < cutoff:
+                report["expired"] += 1
+            elif max_per_user is not None and rank >= max_per_user:
+                report["over_cap"] += 1
+            else:
+                continue
+            dropped.setdefault(user_id, []).append(item_id)
+
+        report["reclaimed"] = report["expired"] + report["over_cap"]
+        report["dry_run"] = dry_run
+        if not dry_run and dropped:
+            with self._write() as connection:
+                for user_id, keys in dropped.items():
+                    self._delete_rows(connection, "notifications", user_id, keys)
+            for user_id in dropped:
+                notify_write("notifications", user_id)
+            if on_dropped is not None:
+                for user_id, keys in dropped.items():
+                    on_dropped(user_id, keys)
+        return report
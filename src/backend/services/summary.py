@@ -0,0 +1,205 @@
+# Notification Summary
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# One document per user with their notification counts, total and unread by type, and the
+# latest notifications, kept up to date by the notification writes so a badge costs one read
+# instead of the user's whole history. The document also maps every notification id to its
+# type and status, which is what lets a write move the counts without reading what it replaced.
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from models.request import Notification
+from services.repository import RepositoryWrapper
+
+COLLECTION = "notifications"
+UNREAD = 1  # NotificationStatus.PENDING on the devices
+FIELDS = list(Notification.model_fields)
+LATEST = int(os.getenv("NOTIFICATION_SUMMARY_LATEST", "10"))
+
+
+def _entry(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: item[field] for field in FIELDS if field in item}
+
+
+def _summarize(states: Dict[str, List[int]], entries: Dict[int, Dict[str, Any]], latest: int) -> Dict[str, Any]:
+    by_type: Dict[str, Dict[str, int]] = {}
+    for notification_type, status in states.values():
+        counts = by_type.setdefault(str(notification_type), {"total": 0, "unread": 0})
+        counts["total"] += 1
+        counts["unread"] += status == UNREAD
+    newest = [item_id for item_id in sorted((int(key) for key in states), reverse=True) if item_id in entries][:latest]
+    return {
+        "total": len(states),
+        "unread": sum(counts["unread"] for counts in by_type.values()),
+        "by_type": by_type,
+        # Type and status come from the states, which may be newer than an entry taken from a listing
+        "latest": [{**entries[item_id], "type": states[str(item_id)][0], "status": states[str(item_id)][1]} for item_id in newest],
+        "states": states,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def apply(current: Optional[Dict[str, Any]], upserts: Iterable[Dict[str, Any]], deleted: Iterable[int],
+          latest: int = LATEST) -> Optional[Dict[str, Any]]:
+    """The summary after notifications were written and deleted, or None while there is no summary.
+
+    A user without one gets it built from their notifications on the first read instead.
+    """
+    if current is None:
+        return None
+    states = dict(current["states"])
+    entries = {entry["id"]: entry for entry in current["latest"]}
+    for item in upserts:
+        states[str(item["id"])] = [item["type"], item["status"]]
+        entries[item["id"]] = _entry(item)
+    for item_id in deleted:
+        states.pop(str(item_id), None)
+        entries.pop(item_id, None)
+    return _summarize(states, entries, latest)
+
+
+def build(current: Optional[Dict[str, Any]], items: List[Dict[str, Any]], latest: int = LATEST) -> Dict[str, Any]:
+    """The summary of a user's listed notifications.
+
+    An existing summary keeps its states and entries, which may be newer than the listing; the
+    listing then only refills `latest` after deletions emptied it.
+    """
+    states = {str(item["id"]): [item["type"], item["status"]] for item in items}
+    entries = {item["id"]: _entry(item) for item in items}
+    if current is not None:
+        states = current["states"]
+        entries.update((entry["id"], entry) for entry in current["latest"])
+    return _summarize(states, entries, latest)
+
+
+def _short(summary: Dict[str, Any], latest: int) -> bool:
+    return len(summary["latest"]) < min(latest, summary["total"])
+
+
+def public(summary: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in summary.items() if key != "states"}
+
+
+def rebuild(repository, user_id: str, latest: int = LATEST) -> Dict[str, Any]:
+    items = repository.list_page(COLLECTION, user_id)["data"]
+    return repository.update_summary(user_id, lambda current: build(current, items, latest))
+
+
+async def rebuild_async(repository, user_id: str, latest: int = LATEST) -> Dict[str, Any]:
+    items = (await repository.list_page_async(COLLECTION, user_id))["data"]
+    return await repository.update_summary_async(user_id, lambda current: build(current, items, latest))
+
+
+def notification_summary(repository, user_id: str) -> Dict[str, Any]:
+    """The user's summary in one document read; built from their notifications the first time."""
+    summary = repository.read_summary(user_id)
+    if summary is None:
+        summary = rebuild(repository, user_id)
+    return public(summary)
+
+
+async def notification_summary_async(repository, user_id: str) -> Dict[str, Any]:
+    summary = await repository.read_summary_async(user_id)
+    if summary is None:
+        summary = await rebuild_async(repository, user_id)
+    return public(summary)
+
+
+def _written(items, report: Dict[str, Any]) -> List[Dict[str, Any]]:
+    written = {item["id"] for item in report.get("items", []) if item.get("status") in ("created", "updated")}
+    return [item.model_dump() for item in items if item.id in written]
+
+
+def _deleted(report: Dict[str, Any]) -> List[int]:
+    return [item["id"] for item in report.get("items", []) if item.get("status") == "deleted"]
+
+
+class NotificationSummaryRepository(RepositoryWrapper):
+    """Repository wrapper applying notification writes, deletions and compaction to the summaries.
+
+    The summary update follows the notification write rather than sharing its commit; if it
+    fails the summary lags until the next write of those notifications.
+    """
+
+    def __init__(self, repository, latest: int = LATEST):
+        super().__init__(repository)
+        self.latest = latest
+
+    def _changed(self, user_id, upserts, deleted=()):
+        if not upserts and not deleted:
+            return
+        try:
+            summary = self.repository.update_summary(user_id, lambda current: apply(current, upserts, deleted, self.latest))
+            if summary is not None and _short(summary, self.latest):
+                rebuild(self.repository, user_id, self.latest)
+        except Exception as e:
+            print(f"Notification summary of {user_id} not updated: {e}")
+
+    async def _changed_async(self, user_id, upserts, deleted=()):
+        if not upserts and not deleted:
+            return
+        try:
+            summary = await self.repository.update_summary_async(user_id, lambda current: apply(current, upserts, deleted, self.latest))
+            if summary is not None and _short(summary, self.latest):
+                await rebuild_async(self.repository, user_id, self.latest)
+        except Exception as e:
+            print(f"Notification summary of {user_id} not updated: {e}")
+
+    def upsert(self, collection, data):
+        result = self.repository.upsert(collection, data)
+        if collection == COLLECTION:
+            self._changed(data["user_id"], [data])
+        return result
+
+    def bulk_upsert(self, collection, user_id, items):
+        report = self.repository.bulk_upsert(collection, user_id, items)
+        if collection == COLLECTION:
+            self._changed(user_id, _written(items, report))
+        return report
+
+    def delete(self, collection, user_id, item_id=None):
+        deleted = self.repository.delete(collection, user_id, item_id)
+        if collection == COLLECTION and deleted:
+            self._changed(user_id, [], [item_id])
+        return deleted
+
+    def bulk_delete(self, collection, user_id, ids):
+        report = self.repository.bulk_delete(collection, user_id, ids)
+        if collection == COLLECTION:
+            self._changed(user_id, [], _deleted(report))
+        return report
+
+    def compact_notifications(self, retention_days=None, max_per_user=None, dry_run=False, on_dropped=None):
+        def dropped(user_id, ids):
+            self._changed(user_id, [], ids)
+            if on_dropped is not None:
+                on_dropped(user_id, ids)
+
+        return self.repository.compact_notifications(retention_days, max_per_user, dry_run, dropped)
+
+    async def upsert_async(self, collection, data):
+        result = await self.repository.upsert_async(collection, data)
+        if collection == COLLECTION:
+            await self._changed_async(data["user_id"], [data])
+        return result
+
+    async def bulk_upsert_async(self, collection, user_id, items):
+        report = await self.repository.bulk_upsert_async(collection, user_id, items)
+        if collection == COLLECTION:
+            await self._changed_async(user_id, _written(items, report))
+        return report
+
+    async def delete_async(self, collection, user_id, item_id=None):
+        deleted = await self.repository.delete_async(collection, user_id, item_id)
+        if collection == COLLECTION and deleted:
+            await self._changed_async(user_id, [], [item_id])
+        return deleted
+
+    async def bulk_delete_async(self, collection, user_id, ids):
+        report = await self.repository.bulk_delete_async(collection, user_id, ids)
+        if collection == COLLECTION:
+            await self._changed_async(user_id, [], _deleted(report))
+        return report
@@ -1,17 +1,47 @@
+import contextvars
 import os
-from twilio.rest import Client
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List
 from dotenv import load_dotenv
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, To
+
+from services.metrics import timed_external
 
 load_dotenv()
 account_sid = os.getenv("TWILIO_ACCOUNT_SID")
 auth_token = os.getenv("TWILIO_AUTH_TOKEN")
 twilio_number = os.getenv("TWILIO_PHONE_NUMBER")
+sms_timeout = float(os.getenv("SMS_TIMEOUT", "10"))
+sms_workers = int(os.getenv("SMS_WORKERS", "16"))
+
+# One Twilio client, HTTP session and fan-out pool for the whole process, so consecutive
+# sends reuse warm TLS connections instead of handshaking per message
+_twilio_client = None
+_twilio_lock = threading.Lock()
+_sms_executor = ThreadPoolExecutor(max_workers=sms_workers, thread_name_prefix="sms")
+
+
+def get_twilio_client():
+    global _twilio_client
+    with _twilio_lock:
+        if _twilio_client is None:
+            # The Twilio and SendGrid SDKs are imported on first send, not at startup
+            from twilio.rest import Client
+            from twilio.http.http_client import TwilioHttpClient
+
+            _twilio_client = Client(
+                account_sid,
+                auth_token,
+                http_client=TwilioHttpClient(pool_connections=True, timeout=sms_timeout),
+            )
+        return _twilio_client
+
+
+@timed_external("twilio")
 def send_sms(to_phone: str, message_body: str):
     try:
-        client = Client(account_sid, auth_token)
-        message = client.messages.create(
+        message = get_twilio_client().messages.create(
             body=message_body,
             from_=twilio_number,
             to=to_phone
@@ -22,7 +52,69 @@ def send_sms(to_phone: str, message_body: str):
         print(f"Error sending SMS: {e}")
         return {"code": 1, "message": str(e)}
 
+
+def send_sms_many(to_phones: List[str], message_body: str, timeout: float = sms_timeout):
+    """Send the same SMS to every number concurrently, returning one result per number in order.
+
+    A recipient still pending after `timeout` seconds is reported as failed; its request keeps
+    running in the background until the HTTP timeout ends it.
+    """
+    # Each send runs in a copy of the caller's context, so its time counts toward the request
+    futures = [_sms_executor.submit(contextvars.copy_context().run, send_sms, to_phone, message_body) for to_phone in to_phones]
+    started = time.monotonic()
+    wait(futures, timeout=timeout)
+    elapsed = time.monotonic() - started
+
+    results = []
+    for to_phone, future in zip(to_phones, futures):
+        if future.done():
+            result = future.result()
+        else:
+            print(f"Error sending SMS: timed out after {elapsed:.1f}s")
+            result = {"code": 1, "message": f"SMS timed out after {timeout}s"}
+        results.append({"to": to_phone, **result})
+    return results
+
+
+DIGEST_PLACEHOLDER = "-digest-"
+PERSONALIZATION_LIMIT = 1000  # SendGrid accepts at most 1000 personalizations per request
+
+
+@timed_external("sendgrid")
+def send_email_digest(recipients: List[dict]):
+    """Send one replenishment email per recipient in a single SendGrid request.
+
+    `recipients` holds up to 1000 `{"to": ..., "html_content": ...}` items; each body is
+    substituted into the shared content through its own personalization.
+    """
+    from sendgrid import SendGridAPIClient
+    from sendgrid.helpers.mail import Mail, Personalization, Substitution, To
+
+    message = Mail(
+        from_email = "noreply@ntro.io",
+        subject = "Medication Replenishment Alert",
+        html_content = DIGEST_PLACEHOLDER
+    )
+    for recipient in recipients[:PERSONALIZATION_LIMIT]:
+        personalization = Personalization()
+        personalization.add_to(To(recipient["to"]))
+        personalization.add_substitution(Substitution(DIGEST_PLACEHOLDER, recipient["html_content"]))
+        message.add_personalization(personalization)
+
+    try:
+        sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
+        sg.send(message)
+        return True
+    except Exception as e:
+        print(f"Error sending email digest: {e}")
+        return False
+
+
+@timed_external("sendgrid")
 def send_email(to_email: str, html_content: str):
+    from sendgrid import SendGridAPIClient
+    from sendgrid.helpers.mail import Mail
+
     api_key = os.getenv("SENDGRID_API_KEY")
     message = Mail(
         from_email = "noreply@ntro.io",
@@ -31,7 +123,7 @@ def send_email(to_email: str, html_content: str):
         is_multiple = True,
         html_content = html_content
     )
-    
+
     try:
         sg = SendGridAPIClient(api_key)
         sg.send(message)
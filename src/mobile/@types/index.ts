@@ -19,6 +19,12 @@ export interface ISetting {
   push: 'on'|'off'
 }
 
+export interface ISyncCollection {
+  code: number,
+  message?: string,
+  data: any[]
+}
+
 export interface IAppState {
   authenticated: boolean;
   user: IUser|null;
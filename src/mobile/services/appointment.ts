@@ -8,13 +8,13 @@ import dayjs from 'dayjs';
 import axiosInstance from './instance';
 
 import { addData, deleteData, getAllData, Tables, updateData } from './db';
-import { IAppointment } from '@/@types';
+import { IAppointment, ISyncCollection } from '@/@types';
 import { SyncStatus } from '@/config/constants';
 
-export const appointmentSyncWithServer = async (userId?: string): Promise<boolean> => {
-  return axiosInstance.get(
+export const appointmentSyncWithServer = async (userId?: string, snapshot?: ISyncCollection): Promise<boolean> => {
+  return (snapshot ? Promise.resolve({ data: snapshot }) : axiosInstance.get(
     `/appointment/${userId}`
-  )
+  ))
     .then(response => {
       if (response.data.code === 0) {
         for (let i = 0; i < response.data.data.length; i++) {
@@ -7,13 +7,13 @@
 import axiosInstance from './instance';
 
 import { addData, deleteDataGroup, getAllData, Tables, updateData } from './db';
-import { IEmergencyContact } from '@/@types';
+import { IEmergencyContact, ISyncCollection } from '@/@types';
 import { SyncStatus } from '@/config/constants';
 
-export const emergencyContactSyncWithServer = async (userId?: string): Promise<boolean> => {
-  return axiosInstance.get(
+export const emergencyContactSyncWithServer = async (userId?: string, snapshot?: ISyncCollection): Promise<boolean> => {
+  return (snapshot ? Promise.resolve({ data: snapshot }) : axiosInstance.get(
     `/emergency/contact/${userId}`
-  )
+  ))
     .then(response => {
       if (response.data.code === 0) {
         for (let i = 0; i < response.data.data.length; i++) {
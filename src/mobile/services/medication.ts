@@ -7,7 +7,7 @@
 import axiosInstance from './instance';
 import dayjs from 'dayjs';
 
-import { IFrequency, IMedication } from '@/@types';
+import { IFrequency, IMedication, ISyncCollection } from '@/@types';
 import { MedicationCycleType, SyncStatus } from '@/config/constants';
 import { addData, deleteData, getAllData, Tables, updateData } from '@/services/db';
 
@@ -33,10 +33,10 @@ export const sendEmail = async (medicationName: string, userEmail: string, userN
     });
 }
 
-export const frequencySyncWithServer = async (userId?: string): Promise<boolean> => {
-  return axiosInstance.get(
+export const frequencySyncWithServer = async (userId?: string, snapshot?: ISyncCollection): Promise<boolean> => {
+  return (snapshot ? Promise.resolve({ data: snapshot }) : axiosInstance.get(
     `/medication/frequency/${userId}`
-  )
+  ))
     .then(response => {
       if (response.data.code === 0) {
         for (let i = 0; i < response.data.data.length; i++) {
@@ -154,10 +154,10 @@ export const deleteFrequencySyncToServer = async (frequencyId: number, userId?:
       return false;
     });
 }
-export const medicationSyncWithServer = async (userId?: string): Promise<boolean> => {
-  return axiosInstance.get(
+export const medicationSyncWithServer = async (userId?: string, snapshot?: ISyncCollection): Promise<boolean> => {
+  return (snapshot ? Promise.resolve({ data: snapshot }) : axiosInstance.get(
     `/medication/${userId}`
-  )
+  ))
     .then(response => {
       if (response.data.code === 0) {
         for (let i = 0; i < response.data.data.length; i++) {         
@@ -8,12 +8,12 @@ import axiosInstance from './instance';
 
 import { addData, deleteDataGroup, getAllData, Tables, updateData } from './db';
 import { SyncStatus } from '@/config/constants';
-import { INotification } from '@/@types';
+import { INotification, ISyncCollection } from '@/@types';
 
-export const notificationSyncWithServer = async (userId?: string): Promise<boolean> => {
-  return axiosInstance.get(
+export const notificationSyncWithServer = async (userId?: string, snapshot?: ISyncCollection): Promise<boolean> => {
+  return (snapshot ? Promise.resolve({ data: snapshot }) : axiosInstance.get(
     `/notification/${userId}`
-  )
+  ))
     .then(response => {
       if (response.data.code === 0) {
         for (let i = 0; i < response.data.data.length; i++) {
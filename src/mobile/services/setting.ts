@@ -7,13 +7,13 @@
 import axiosInstance from './instance';
 
 import { addData, getAllData, Tables, updateAllData } from './db';
-import { ISetting } from '@/@types';
+import { ISetting, ISyncCollection } from '@/@types';
 import { InitialAppState, SyncStatus } from '@/config/constants';
 
-export const userSettingSyncWithServer = async (userId?: string): Promise<boolean> => {
-  return axiosInstance.get(
+export const userSettingSyncWithServer = async (userId?: string, snapshot?: ISyncCollection): Promise<boolean> => {
+  return (snapshot ? Promise.resolve({ data: snapshot }) : axiosInstance.get(
     `/user/setting/${userId}`
-  )
+  ))
   .then(response => {
     if (response.data.code === 0) {
       const data = {
@@ -21,39 +21,65 @@ import { frequencySyncWithServer, medicationSyncWithServer, medicationListSyncTo
 import { appointmentSyncWithServer, appointmentListSyncToServer } from './appointment';
 import { emergencyContactSyncWithServer, emergencyContactListSyncToServer } from './emergency';
 import { notificationSyncWithServer, notificationListSyncToServer } from './notification';
+import { ISyncCollection } from '@/@types';
+import axiosInstance from './instance';
+
+// Reads all six collections in one round trip; collections that failed on the server
+// are left out so their own endpoint is retried.
+const fetchSyncSnapshot = async (userId?: string): Promise<Record<string, ISyncCollection>> => {
+  return axiosInstance.get(
+    `/sync/${userId}`
+  )
+    .then(response => {
+      const snapshot: Record<string, ISyncCollection> = {};
+      for (const [collection, result] of Object.entries<ISyncCollection>(response.data.data || {})) {
+        if (result.code === 0) {
+          snapshot[collection] = result;
+        }
+      }
+      return snapshot;
+    })
+    .catch(error => {
+      console.log(error);
+      return {};
+    });
+}
+
 export const syncLocalDatabaseWithRemote = async (userId?: string) => {
+  const snapshot = await fetchSyncSnapshot(userId);
+
   const settingSyncedStatus = await getStorageItem(KEY_DB_SYNCED_SETTING);
   let retSetting = true;
   if (settingSyncedStatus !== 'true') {
-    retSetting = await userSettingSyncWithServer(userId);
+    retSetting = await userSettingSyncWithServer(userId, snapshot.settings);
     setStorageItem(KEY_DB_SYNCED_SETTING, retSetting ? 'true' : 'false');
   }
 
   const frequencySyncedStatus = await getStorageItem(KEY_DB_SYNCED_FREQUENCY);
   let retFrequency = true;
   if (frequencySyncedStatus !== 'true') {
-    retFrequency = await frequencySyncWithServer(userId);
+    retFrequency = await frequencySyncWithServer(userId, snapshot.frequencies);
     setStorageItem(KEY_DB_SYNCED_FREQUENCY, retFrequency ? 'true' : 'false');
   }
 
   const medicationSyncedStatus = await getStorageItem(KEY_DB_SYNCED_MEDICATION);
   let retMedication = true;
   if (medicationSyncedStatus !== 'true') {
-    retMedication = await medicationSyncWithServer(userId);
+    retMedication = await medicationSyncWithServer(userId, snapshot.medications);
     setStorageItem(KEY_DB_SYNCED_MEDICATION, retMedication ? 'true' : 'false');
   }
 
   const appointmentSyncedStatus = await getStorageItem(KEY_DB_SYNCED_APPOINTMENT);
   let retAppointment = true;
   if (appointmentSyncedStatus !== 'true') {
-    retAppointment = await appointmentSyncWithServer(userId);
+    retAppointment = await appointmentSyncWithServer(userId, snapshot.appointments);
     setStorageItem(KEY_DB_SYNCED_APPOINTMENT, retAppointment ? 'true' : 'false');
   }
 
   const emergencyContactSyncedStatus = await getStorageItem(KEY_DB_SYNCED_EMERGENCY_CONTACT);
   let retEmergencyContact = true;
   if (emergencyContactSyncedStatus !== 'true') {
-    retEmergencyContact = await emergencyContactSyncWithServer(userId);
+    retEmergencyContact = await emergencyContactSyncWithServer(userId, snapshot.emergencies);
     setStorageItem(KEY_DB_SYNCED_EMERGENCY_CONTACT, retEmergencyContact ? 'true' : 'false');
   }
 
@@ -61,7 +87,7 @@ export const syncLocalDatabaseWithRemote = async (userId?: string) => {
   let retNotification = true;
   
   if (notificationSyncedStatus === 'true') {
-    retNotification = await notificationSyncWithServer(userId);
+    retNotification = await notificationSyncWithServer(userId, snapshot.notifications);
     setStorageItem(KEY_DB_SYNCED_NOTIFICATION, retNotification ? 'true' : 'false');
   }
 
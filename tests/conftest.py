@@ -0,0 +1,44 @@
+# Test Fixtures
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Runs the backend against the in-memory Firestore from the benchmarks, so the tests need
+# neither a Firebase project nor a service-account key.
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "backend"))
+
+# Read when the services are imported, so they are set before any test module imports them
+os.environ["STORAGE_BACKEND"] = "firestore"
+os.environ["OUTBOX_PROVIDERS"] = "fake"
+os.environ["OUTBOX_PATH"] = os.path.join(tempfile.mkdtemp(), "outbox.db")
+os.environ["USER_DIRECTORY_REFRESH"] = "0"
+
+from benchmarks.fake_firestore import AsyncFakeFirestore, FakeFirestore  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    import services.clients
+    from services.cache import list_cache
+
+    db = FakeFirestore()
+    services.clients._db = db
+    services.clients._async_db = AsyncFakeFirestore.sharing(db)
+    list_cache.backend.clear()
+    yield db
+    list_cache.backend.clear()
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    return TestClient(main.app)
@@ -0,0 +1,97 @@
+# Compaction Tests
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Duplicate folding, retention from created_at, the per-user cap and paged scans.
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import services.compaction
+from services.compaction import compact_notifications
+
+
+def notification(item_id, user_id="u1"):
+    return {"id": item_id, "user_id": user_id, "type": 1, "var1": "", "var2": "", "var3": "", "status": 1, "target_id": 1}
+
+
+def ago(days):
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+
+def test_duplicates_fold_onto_their_key(db):
+    notifications = db.collection("notifications")
+    newest = ago(1)
+    for updated_at in (ago(3), ago(2), newest):
+        notifications.add({**notification(5), "updated_at": updated_at})
+
+    report = compact_notifications(db)
+
+    assert report["duplicates"] == 2
+    assert report["moved"] == 1
+    assert list(db.collections["notifications"]) == ["u1_5"]
+    assert db.collections["notifications"]["u1_5"]["created_at"] == newest
+
+
+def test_resyncs_do_not_renew_notifications(client, db):
+    client.put("/notification/update/list", params={"user_id": "u1"}, json=[notification(1), notification(2)])
+    db.collection("notifications").document("u1_1").update({"created_at": ago(200)})
+
+    client.put("/notification/update/list", params={"user_id": "u1"}, json=[notification(1), notification(2)])
+    report = compact_notifications(db, retention_days=90)
+
+    assert report["expired"] == 1
+    assert sorted(db.collections["notifications"]) == ["u1_2"]
+    assert "notifications_u1_1" in db.collections["tombstones"]
+
+
+def test_notifications_without_timestamps_expire(db):
+    db.collection("notifications").document("u1_1").set(notification(1))
+    db.collection("notifications").document("u1_2").set({**notification(2), "updated_at": ago(1)})
+
+    report = compact_notifications(db, retention_days=90)
+
+    assert report["expired"] == 1
+    assert report["dated"] == 1
+    assert list(db.collections["notifications"]) == ["u1_2"]
+    assert "created_at" in db.collections["notifications"]["u1_2"]
+
+
+def test_cap_keeps_the_newest(db):
+    for item_id in range(5):
+        db.collection("notifications").document(f"u1_{item_id}").set({**notification(item_id), "created_at": ago(10 - item_id)})
+    dropped = {}
+
+    report = compact_notifications(db, max_per_user=2, on_dropped=lambda user_id, ids: dropped.update({user_id: sorted(ids)}))
+
+    assert report["over_cap"] == 3
+    assert sorted(db.collections["notifications"]) == ["u1_3", "u1_4"]
+    assert dropped == {"u1": [0, 1, 2]}
+
+
+def test_dry_run_writes_nothing(db):
+    db.collection("notifications").document("u1_1").set(notification(1))
+    db.collection("notifications").add(notification(1))
+
+    report = compact_notifications(db, retention_days=90, dry_run=True)
+
+    assert report["reclaimed"] == 2
+    assert len(db.collections["notifications"]) == 2
+    assert not db.collections.get("tombstones")
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 1000])
+def test_users_split_across_pages(db, monkeypatch, page_size):
+    monkeypatch.setattr(services.compaction, "PAGE_SIZE", page_size)
+    for user_id in ("u1", "u2", "u3"):
+        for item_id in range(3):
+            db.collection("notifications").document(f"{user_id}_{item_id}").set({**notification(item_id, user_id), "created_at": ago(item_id)})
+        db.collection("notifications").add({**notification(0, user_id), "created_at": ago(0)})
+
+    report = compact_notifications(db, max_per_user=2)
+
+    assert report["scanned"] == 12
+    assert report["duplicates"] == 3
+    assert report["over_cap"] == 3
+    assert sorted(db.collections["notifications"]) == ["u1_0", "u1_1", "u2_0", "u2_1", "u3_0", "u3_1"]
@@ -0,0 +1,48 @@
+# Forecast Tests
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# A medication taken on several frequencies is consumed at the sum of their rates.
+from datetime import date
+
+import numpy as np
+
+from services.forecast import forecast
+
+TODAY = date(2026, 10, 18)
+
+
+def medication(id, stock=100, threshold=10):
+    return {"id": id, "user_id": "u1", "stock": stock, "threshold": threshold, "start_date": "2026-10-08", "end_date": "", "stock_date": ""}
+
+
+def frequency(medication_id, dosage, times, cycle=1, user_id="u1"):
+    return {"medication_id": medication_id, "user_id": user_id, "dosage": dosage, "cycle": cycle, "times": times}
+
+
+def test_daily_use_sums_every_frequency_of_a_medication():
+    medications = [medication(1), medication(2), medication(3)]
+    frequencies = [
+        frequency(1, 2, ["08:00"]),
+        frequency(1, 1, ["12:00", "20:00"]),
+        frequency(1, 7, ["09:00"], cycle=7),
+        frequency(2, 1, ["08:00"]),
+        # Another user's medication with the same id is not this one's
+        frequency(3, 5, ["08:00"], user_id="u2"),
+    ]
+    result = forecast(medications, frequencies, TODAY)
+
+    assert result["daily_use"].tolist() == [5.0, 1.0, 0.0]
+    # Ten days since the start date
+    assert result["projected_stock"].tolist() == [50.0, 90.0, 100.0]
+    assert result["run_out_date"][0] == np.datetime64("2026-10-28")
+    assert np.isnat(result["run_out_date"][2])
+
+
+def test_medication_below_threshold_only_with_all_frequencies_counted():
+    medications = [medication(1, stock=34, threshold=5)]
+    frequencies = [frequency(1, 1, ["08:00"]), frequency(1, 2, ["20:00"])]
+
+    assert not forecast(medications, frequencies[:1], TODAY)["below_threshold"][0]
+    assert forecast(medications, frequencies, TODAY)["below_threshold"][0]
@@ -0,0 +1,78 @@
+# Image Offload Tests
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Offloading is opt-in and only runs on a shared blob store with absolute URLs.
+import base64
+
+import pytest
+
+import services.images
+from services.blobs import LocalBlobStore, set_blob_store
+from services.repository import get_repository, set_repository
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+class SharedStore(LocalBlobStore):
+    shared = True
+
+
+def medication(image):
+    return {
+        "id": 1, "user_id": "u1", "name": "Medication 1", "image": image, "stock": 30,
+        "start_date": "2026-10-01", "end_date": "2027-03-31", "stock_date": "2026-10-18", "threshold": 5,
+        "push_alert": "on", "email_alert": "on",
+    }
+
+
+@pytest.fixture
+def offload(monkeypatch, tmp_path, db):
+    def configure(flag, store, base_url=""):
+        if flag is not None:
+            monkeypatch.setenv("IMAGE_OFFLOAD", flag)
+        else:
+            monkeypatch.delenv("IMAGE_OFFLOAD", raising=False)
+        monkeypatch.setattr(services.images, "IMAGE_BASE_URL", base_url)
+        set_blob_store(store(str(tmp_path / "blobs")))
+        set_repository(None)
+        return get_repository()
+    yield configure
+    set_blob_store(None)
+    set_repository(None)
+
+
+def stored_image(db):
+    return db.collections["medications"]["u1_1"]["image"]
+
+
+def test_inline_images_stay_by_default(offload, db):
+    inline = base64.b64encode(PNG).decode()
+    offload(None, SharedStore, "https://api.example.com").upsert("medications", medication(inline))
+
+    assert stored_image(db) == inline
+
+
+def test_offload_is_refused_on_a_local_store(offload, db):
+    inline = base64.b64encode(PNG).decode()
+    offload("1", LocalBlobStore, "https://api.example.com").upsert("medications", medication(inline))
+
+    assert stored_image(db) == inline
+
+
+def test_offload_is_refused_without_a_base_url(offload, db):
+    inline = base64.b64encode(PNG).decode()
+    offload("1", SharedStore).upsert("medications", medication(inline))
+
+    assert stored_image(db) == inline
+
+
+def test_offloaded_images_get_absolute_urls(offload, db):
+    repository = offload("1", SharedStore, "https://api.example.com")
+    repository.upsert("medications", medication(base64.b64encode(PNG).decode()))
+
+    url = stored_image(db)
+    assert url.startswith("https://api.example.com/image/")
+    repository.upsert("medications", medication(url))
+    assert stored_image(db) == url
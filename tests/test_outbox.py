@@ -0,0 +1,134 @@
+# Outbox Tests
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Retries with backoff, dead letters, leases and purging, driven one message at a time.
+import time
+
+import pytest
+
+from services.outbox import FakeProvider, Outbox
+
+
+class FlakyProvider(FakeProvider):
+    """Fails the first `failures` calls, then sends."""
+
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+
+    def __call__(self, payload):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("provider unavailable")
+        super().__call__(payload)
+
+
+@pytest.fixture
+def make_outbox(tmp_path):
+    def make(provider, **options):
+        options.setdefault("max_attempts", 3)
+        options.setdefault("base_delay", 0.0)
+        return Outbox(str(tmp_path / "outbox.db"), {"sms": provider}, **options)
+    return make
+
+
+def test_failed_sends_are_retried_until_sent(make_outbox):
+    provider = FlakyProvider(failures=2)
+    outbox = make_outbox(provider)
+    message_id = outbox.enqueue("sms", {"to": "+15555550100", "body": "hi"})
+
+    while outbox.process_one():
+        pass
+
+    state = outbox.status([message_id])[message_id]
+    assert state["status"] == "sent"
+    assert state["attempts"] == 3
+    assert provider.sent == [{"to": "+15555550100", "body": "hi"}]
+
+
+def test_retries_wait_for_their_backoff(make_outbox):
+    outbox = make_outbox(FlakyProvider(failures=1), base_delay=60.0)
+    message_id = outbox.enqueue("sms", {"to": "+15555550100", "body": "hi"})
+
+    assert outbox.process_one()
+    assert not outbox.process_one()
+    assert outbox.status([message_id])[message_id]["status"] == "pending"
+
+
+def test_messages_out_of_attempts_are_dead_lettered(make_outbox):
+    outbox = make_outbox(FakeProvider(failure_rate=1.0))
+    message_id = outbox.enqueue("sms", {"to": "+15555550100", "body": "hi"})
+
+    while outbox.process_one():
+        pass
+
+    [letter] = outbox.dead_letters()
+    assert letter["id"] == message_id
+    assert letter["attempts"] == 3
+    assert letter["last_error"] == "fake provider failure"
+    assert outbox.stats()["dead"] == 1
+
+
+def test_dead_letters_can_be_queued_again(make_outbox):
+    provider = FlakyProvider(failures=3)
+    outbox = make_outbox(provider)
+    message_id = outbox.enqueue("sms", {"to": "+15555550100", "body": "hi"})
+    while outbox.process_one():
+        pass
+
+    assert outbox.retry(message_id)
+    assert not outbox.retry(message_id)
+    assert outbox.process_one()
+    assert outbox.status([message_id])[message_id]["status"] == "sent"
+
+
+def test_expired_leases_are_claimed_again(make_outbox):
+    outbox = make_outbox(FakeProvider(), lease=0.0)
+    message_id = outbox.enqueue("sms", {"to": "+15555550100", "body": "hi"})
+    assert outbox._claim()[0] == message_id
+
+    # The first sender never finished; another worker takes the message over
+    other = make_outbox(FakeProvider(), lease=0.0)
+    assert other.process_one()
+    assert outbox.status([message_id])[message_id]["status"] == "sent"
+
+
+def test_live_leases_are_not_claimed_again(make_outbox):
+    outbox = make_outbox(FakeProvider())
+    message_id = outbox.enqueue("sms", {"to": "+15555550100", "body": "hi"})
+    assert outbox._claim()[0] == message_id
+
+    assert not make_outbox(FakeProvider()).process_one()
+
+
+def test_sent_messages_are_purged_after_retention(make_outbox):
+    outbox = make_outbox(FakeProvider(), sent_retention=60.0)
+    message_id = outbox.enqueue("sms", {"to": "+15555550100", "body": "hi"})
+    outbox.process_one()
+
+    assert outbox.purge() == 0
+    assert outbox.purge(now=time.time() + 120) == 1
+    assert outbox.status([message_id]) == {}
+
+
+def test_emergency_sms_are_sent_inline_and_failures_queued(client, monkeypatch):
+    import main
+    from services.outbox import outbox
+
+    sent = []
+
+    def send_sms_many(phones, body):
+        sent.extend(phones)
+        return [{"to": phone, "code": 0 if phone.endswith("1") else 1, "message": "ok" if phone.endswith("1") else "busy"} for phone in phones]
+
+    monkeypatch.setattr(main, "send_sms_many", send_sms_many)
+    body = client.post("/sendEmergency", json={"emergencyData": ["+15555550101", "+15555550102"], "currentAddress": [""]}).json()
+
+    assert sent == ["+15555550101", "+15555550102"]
+    assert body["code"] == 1
+    assert body["message"] == 1
+    [queued] = body["queued"]
+    assert body["details"][0]["queued"] == queued
+    assert outbox.status([queued])[queued]["status"] == "pending"
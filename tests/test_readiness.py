@@ -0,0 +1,27 @@
+# Readiness Tests
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Readiness follows the configured storage engine; SQLite never waits for Firebase.
+import services.clients
+from services.sqlite_repository import SQLiteRepository
+
+
+def test_sqlite_is_ready_without_firebase(tmp_path, monkeypatch):
+    monkeypatch.setattr(services.clients, "_db", None)
+    repository = SQLiteRepository(str(tmp_path / "storage.db"))
+
+    repository.start()
+
+    assert repository.readiness() == {"ready": True, "storage": "sqlite", "error": None}
+    assert services.clients._state["started_at"] is None
+
+
+def test_sqlite_reports_a_file_it_cannot_open(tmp_path):
+    repository = SQLiteRepository(str(tmp_path / "missing" / "storage.db"))
+
+    status = repository.readiness()
+
+    assert not status["ready"]
+    assert status["error"]
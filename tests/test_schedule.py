@@ -0,0 +1,45 @@
+# Schedule Tests
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# The dose index reloads a schedule after its TTL, so writes made by other workers show up.
+from datetime import date, datetime, timedelta
+
+import services.schedule
+from services.cache import list_cache
+from services.repository import FirestoreRepository
+from services.schedule import ScheduleIndex
+
+
+def seed(db, times):
+    today = date.today().isoformat()
+    db.collection("medications").document("u1_1").set({"id": 1, "user_id": "u1", "start_date": today, "end_date": ""})
+    db.collection("frequencies").document("u1_1").set(
+        {"id": 1, "user_id": "u1", "medication_id": 1, "dosage": 1, "dosage_unit": 0, "cycle": 1, "times": times}
+    )
+
+
+def doses(index, repository):
+    start = datetime.combine(date.today(), datetime.min.time())
+    return [dose["time"][11:] for dose in index.query(repository, "u1", start, start + timedelta(days=1))]
+
+
+def test_schedules_reload_after_their_ttl(db, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(services.schedule, "monotonic", lambda: clock[0])
+    repository = FirestoreRepository(lambda: db, lambda: None)
+    index = ScheduleIndex(past_days=1, days=7, max_users=10, ttl=60)
+    seed(db, ["08:00"])
+    assert doses(index, repository) == ["08:00"]
+
+    # Written by another worker: straight to storage, past this process's index and list cache
+    seed(db, ["08:00", "20:00"])
+    list_cache.backend.clear()
+    clock[0] += 30
+    assert doses(index, repository) == ["08:00"]
+
+    clock[0] += 30
+    assert doses(index, repository) == ["08:00", "20:00"]
+    assert index.stats()["expirations"] == 1
+    assert index.stats()["loads"] == 2
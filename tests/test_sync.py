@@ -0,0 +1,108 @@
+# Sync Tests
+# RTHA
+#
+# Created by Morgan on 10/18/2026
+#
+# Keyed upserts, tombstones and since deltas, list cache invalidation and ETag revalidation.
+
+
+def medication(item_id, stock=30, user_id="u1"):
+    return {
+        "id": item_id, "user_id": user_id, "name": f"Medication {item_id}", "image": "", "stock": stock,
+        "start_date": "2026-10-01", "end_date": "2027-03-31", "stock_date": "2026-10-18", "threshold": 5,
+        "push_alert": "on", "email_alert": "on",
+    }
+
+
+def test_upserts_are_keyed_by_user_and_id(client, db):
+    for _ in range(3):
+        response = client.put("/medication/update/list", params={"user_id": "u1"}, json=[medication(i) for i in range(3)])
+        assert response.json()["code"] == 0
+    client.put("/medication/update", json=medication(1, stock=7))
+
+    assert sorted(db.collections["medications"]) == ["u1_0", "u1_1", "u1_2"]
+    assert db.collections["medications"]["u1_1"]["stock"] == 7
+    assert response.json()["report"]["updated"] == 3
+
+
+def test_bulk_upsert_reports_created_and_updated(client):
+    client.put("/medication/update", json=medication(0))
+
+    report = client.put("/medication/update/list", params={"user_id": "u1"}, json=[medication(0), medication(1)]).json()["report"]
+
+    assert report["created"] == 1
+    assert report["updated"] == 1
+    assert {item["id"]: item["status"] for item in report["items"]} == {0: "updated", 1: "created"}
+
+
+def test_delete_leaves_a_tombstone(client, db):
+    client.put("/medication/update", json=medication(4))
+
+    assert client.delete("/medication/u1/4").json()["code"] == 0
+    assert "u1_4" not in db.collections["medications"]
+    assert db.collections["tombstones"]["medications_u1_4"]["id"] == 4
+    assert client.delete("/medication/u1/4").status_code == 404
+
+
+def test_since_returns_only_changes_and_deletions(client):
+    client.put("/medication/update/list", params={"user_id": "u1"}, json=[medication(i) for i in range(4)])
+    watermark = client.get("/medication/u1").json()["watermark"]
+
+    client.put("/medication/update", json=medication(1, stock=2))
+    client.delete("/medication/u1/3")
+    changes = client.get("/medication/u1", params={"since": watermark}).json()
+
+    assert [item["id"] for item in changes["data"]] == [1]
+    assert changes["deleted"] == [3]
+    assert changes["watermark"] >= watermark
+
+
+def test_full_reads_are_cached_until_a_write(client, db):
+    from services.cache import list_cache
+
+    client.put("/medication/update", json=medication(0))
+    client.get("/medication/u1")
+    reads = db.rpc_count
+    assert [item["stock"] for item in client.get("/medication/u1").json()["data"]] == [30]
+    assert db.rpc_count == reads
+    assert list_cache.backend.get(("medications", "u1")) is not None
+
+    client.put("/medication/update", json=medication(0, stock=12))
+
+    assert list_cache.backend.get(("medications", "u1")) is None
+    assert [item["stock"] for item in client.get("/medication/u1").json()["data"]] == [12]
+
+
+def test_cached_lists_are_copies(client):
+    from services.cache import list_cache
+
+    client.put("/medication/update", json=medication(0))
+    client.get("/medication/u1")
+    list_cache.backend.get(("medications", "u1"))["data"].clear()
+
+    assert len(client.get("/medication/u1").json()["data"]) == 1
+
+
+def test_unchanged_lists_revalidate_with_304(client):
+    client.put("/medication/update", json=medication(0))
+    first = client.get("/medication/u1")
+    tag = first.headers["etag"]
+
+    unchanged = client.get("/medication/u1", headers={"If-None-Match": tag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    assert client.get("/medication/u1", headers={"If-None-Match": f"W/{tag}"}).status_code == 304
+
+    client.put("/medication/update", json=medication(0, stock=1))
+    changed = client.get("/medication/u1", headers={"If-None-Match": tag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != tag
+
+
+def test_single_updates_report_an_insert_with_code_1(client, db):
+    added = client.put("/medication/update", json=medication(9)).json()
+    updated = client.put("/medication/update", json=medication(9, stock=3)).json()
+
+    assert added == {"code": 1, "message": "Medication not found, so it was added."}
+    assert updated == {"code": 0, "message": "Medication updated successfully!"}
+    assert db.collections["medications"]["u1_9"]["stock"] == 3